@@ -1 +1,3 @@
 from zfn_api import Client
+from zfn_async import AsyncClient
+from zfn_pool import pool_registry
@@ -0,0 +1,77 @@
+"""
+成绩列存表的统计耗时：加权绩点、名次与百分位、各类别学分完成度
+用法：python benchmarks/bench_analytics.py [--rows 100000 1000000] [--courses 60]
+build 为由课程元组构建列存表的耗时，其余列为在已构建的表上计算的耗时；需要安装 numpy
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zfn_analytics import GradeTable  # noqa: E402
+
+CATEGORIES = ["通识教育", "学科基础", "专业核心", "实践教学", "专业选修"]
+NATURES = ["必修", "选修", "限选"]
+REQUIRED = {"通识教育": 40, "学科基础": 50, "专业核心": 45, "实践教学": 25}
+
+
+def make_rows(rows, courses, seed=0):
+    """每名学生 courses 门课，约5%为重修的重复记录，成绩与绩点均为 align_floats 形式的字符串"""
+    rnd = random.Random(seed)
+    students = max(rows // courses, 1)
+    result = []
+    for i in range(rows):
+        student = i % students
+        course = i // students % courses
+        score = rnd.randint(40, 100)
+        result.append(
+            (
+                student,
+                rnd.choice(["1.0", "2.0", "2.5", "3.0", "4.0"]),
+                format(max(score - 50, 0) / 10, ".1f"),
+                score if rnd.random() > 0.05 else rnd.choice(["优秀", "不及格"]),
+                CATEGORIES[course % len(CATEGORIES)],
+                NATURES[course % len(NATURES)],
+                f"B{100000 + course}",
+            )
+        )
+    return [f"20210{i:05d}" for i in range(students)], result
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes=(100000, 1000000), courses=60):
+    print(
+        f"{'rows':>9}{'students':>10}{'build s':>9}{'dedupe':>9}{'gpa':>9}"
+        f"{'rank':>9}{'category':>10}{'summary':>9}"
+    )
+    for rows in sizes:
+        sids, data = make_rows(rows, courses)
+        table, build = timed(GradeTable.from_rows, sids, data)
+        best, dedupe = timed(table.best_attempts)
+        gpa, gpa_time = timed(best.weighted_gpa)
+        _, rank_time = timed(
+            lambda: (GradeTable.rank(gpa), GradeTable.percentile_rank(gpa))
+        )
+        _, category_time = timed(best.category_completion, REQUIRED)
+        _, summary_time = timed(best.summary)
+        print(
+            f"{rows:>9}{len(sids):>10}{build:>9.2f}{dedupe * 1e3:>7.1f}ms"
+            f"{gpa_time * 1e3:>7.1f}ms{rank_time * 1e3:>7.1f}ms"
+            f"{category_time * 1e3:>8.1f}ms{summary_time * 1e3:>7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--courses", type=int, default=60)
+    args = parser.parse_args()
+    main(args.rows, args.courses)
@@ -0,0 +1,53 @@
+"""
+登录失效检测的CPU开销对比：每次构建 pyquery DOM 与 Client.is_login_response
+用法：python benchmarks/bench_expiry.py
+"""
+import os
+import sys
+import timeit
+
+import requests
+from pyquery import PyQuery as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import payloads  # noqa: E402
+from zfn_api import Client  # noqa: E402
+
+
+def make_response(body, content_type="text/html;charset=UTF-8"):
+    resp = requests.models.Response()
+    resp.status_code = 200
+    resp._content = body.encode("utf-8")
+    resp.headers["Content-Type"] = content_type
+    resp.url = "http://jwglxt.example.edu.cn/jwglxt/cjcx/cjcx_cxXsgrcj.html"
+    resp.encoding = "utf-8"
+    return resp
+
+
+def legacy_check(resp):
+    return pq(resp.text)("h5").text() == "用户登录"
+
+
+def main(number=200):
+    cases = {
+        "grade(100)": make_response(payloads.grade_json(100)),
+        "grade(1000)": make_response(payloads.grade_json(1000)),
+        "schedule(60)": make_response(payloads.schedule_json(60)),
+        "selected(40)": make_response(payloads.selected_json(40)),
+        "login_page": make_response(payloads.LOGIN_PAGE),
+    }
+    print(f"{'payload':<14}{'bytes':>10}{'legacy µs':>12}{'fast µs':>12}{'saved µs':>12}")
+    for name, resp in cases.items():
+        assert legacy_check(resp) == Client.is_login_response(resp)
+        legacy = timeit.timeit(lambda: legacy_check(resp), number=number) / number
+        fast = timeit.timeit(lambda: Client.is_login_response(resp), number=number)
+        fast /= number
+        print(
+            f"{name:<14}{len(resp.content):>10}{legacy * 1e6:>12.1f}"
+            f"{fast * 1e6:>12.1f}{(legacy - fast) * 1e6:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
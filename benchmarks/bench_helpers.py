@@ -0,0 +1,268 @@
+"""
+解析辅助函数及条目转换的微基准：每秒处理条目数与单条分配的内存
+用法：python benchmarks/bench_helpers.py [--sizes 10,100,1000] [--filter weeks]
+            [--fixtures fixtures.json] [--save base.json] [--compare base.json --threshold 0.2]
+输入默认由 payloads 合成，--fixtures 传入 zfn_replay.Recorder 录制的文件时额外以其中的真实数据测试（size 为 rec）
+ops/s 为每秒处理的条目数（周次字符串、课表行、学业类别等），均按条目计：alloc 为 tracemalloc 统计的单次调用峰值内存（字节），
+blocks 为调用结束时结果等仍存活的新分配内存块数
+--save 保存结果，--compare 与保存的结果对比，ops/s 下降或 alloc 上升超过 --threshold 时标记 REGRESSION 并以状态码1退出
+基线只应与同一台机器、同一 Python 版本的结果对比
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import payloads  # noqa: E402
+from benchmarks.bench_schedule import make_schedule  # noqa: E402
+from zfn_api import RASPIANIE, Client  # noqa: E402
+
+NUMBERS = ["3.5", "0", "&nbsp;", "20.0", "优秀", "", "12a", "四"]
+
+
+def each(func):
+    def run(batch):
+        return [func(item) for item in batch]
+
+    return run
+
+
+def format_grades(items):
+    return [Client.format_grade(i) for i in items]
+
+
+def format_schedules(items):
+    return [Client.format_schedule(i) for i in items]
+
+
+def schedule_field(name):
+    return lambda size: [i[name] for i in payloads.schedule_items(size)]
+
+
+# (名称, 处理一个批次的函数, 按条目数生成合成输入的函数, 是否会修改输入)
+CASES = [
+    ("list_weeks", each(Client.list_weeks), schedule_field("zcd"), False),
+    ("list_sessions", each(Client.list_sessions), schedule_field("jc"), False),
+    (
+        "display_course_time",
+        each(Client.display_course_time),
+        schedule_field("jc"),
+        False,
+    ),
+    ("split_merge_display", Client.split_merge_display, make_schedule, True),
+    (
+        "get_academia_statistics",
+        each(Client.get_academia_statistics),
+        lambda size: [payloads.academia_statistics(i) for i in range(size)],
+        False,
+    ),
+    (
+        "get_academia_type_statistics",
+        Client.get_academia_type_statistics,
+        payloads.academia_page,
+        False,
+    ),
+    (
+        "split_notifications",
+        each(Client.split_notifications),
+        payloads.notification_items,
+        False,
+    ),
+    (
+        "is_number",
+        each(Client.is_number),
+        lambda size: [NUMBERS[i % len(NUMBERS)] for i in range(size)],
+        False,
+    ),
+    ("format_grade", format_grades, payloads.grade_items, False),
+    ("format_schedule", format_schedules, payloads.schedule_items, False),
+]
+
+
+def items_in(batch):
+    """批次中的条目数：列表长度、课表课程数或学业页面中的类别数"""
+    if isinstance(batch, dict):
+        return len(batch["courses"])
+    if isinstance(batch, str):
+        return max(batch.count("showKc"), 1)
+    return len(batch)
+
+
+def recorded_inputs(path):
+    """从录制的 fixtures 中取出各用例的真实输入"""
+    from pyquery import PyQuery as pq
+
+    from zfn_replay import FixtureStore
+
+    store = FixtureStore.load(path)
+    grades, schedules, notifications, pages = [], [], [], []
+    for entry in store.entries:
+        if entry["base64"] or not entry["body"]:
+            continue
+        name = entry["path"].rsplit("/", 1)[-1]
+        if name == "xsxyqk_cxXsxyqkIndex.html":
+            pages.append(entry["body"])
+            continue
+        try:
+            data = json.loads(entry["body"])
+        except ValueError:
+            continue
+        if name in ("cjcx_cxXsgrcj.html", "cjcx_cxDgXscj.html"):
+            grades.extend(data.get("items") or [])
+        elif name == "xskbcx_cxXsKb.html":
+            schedules.extend(data.get("kbList") or [])
+        elif name == "index_cxDbsy.html":
+            notifications.extend(data.get("items") or [])
+    inputs = {}
+    if schedules:
+        inputs["list_weeks"] = [i.get("zcd") for i in schedules]
+        inputs["list_sessions"] = [i.get("jc") for i in schedules]
+        inputs["display_course_time"] = [i.get("jc") for i in schedules]
+        inputs["split_merge_display"] = {"courses": format_schedules(schedules)}
+        inputs["format_schedule"] = schedules
+    if grades:
+        inputs["format_grade"] = grades
+    if notifications:
+        inputs["split_notifications"] = notifications
+    if pages:
+        inputs["get_academia_type_statistics"] = pages[0]
+        inputs["get_academia_statistics"] = [
+            pq(page)("div#alertBox").text().replace(" ", "").replace("\n", "")
+            for page in pages
+        ]
+    return inputs
+
+
+def timed(run, batch, mutates, number):
+    if mutates:
+        batches = [copy.deepcopy(batch) for _ in range(number)]
+    else:
+        batches = [batch] * number
+    gc.collect()
+    start = time.perf_counter()
+    for item in batches:
+        run(item)
+    return time.perf_counter() - start
+
+
+def measure(run, batch, mutates, min_time=0.2, repeat=5):
+    """返回 (单次调用的最短秒数, 单次调用的峰值分配字节数, 调用结束时仍存活的新分配内存块数)"""
+    number = 1
+    elapsed = timed(run, batch, mutates, number)
+    while elapsed < min_time / repeat:
+        number *= 2
+        elapsed = timed(run, batch, mutates, number)
+    best = min(
+        [elapsed] + [timed(run, batch, mutates, number) for _ in range(repeat - 1)]
+    )
+    data = copy.deepcopy(batch) if mutates else batch
+    gc.collect()
+    tracemalloc.start()
+    result = run(data)
+    _, peak = tracemalloc.get_traced_memory()
+    blocks = sum(i.count for i in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del result
+    return best / number, peak, blocks
+
+
+def compare(result, base, threshold):
+    """返回 (ops 变化比例, 是否回退)，没有基线时为 (None, False)"""
+    if base is None:
+        return None, False
+    change = result["ops"] / base["ops"] - 1
+    slower = change < -threshold
+    heavier = result["alloc"] > base["alloc"] * (1 + threshold)
+    return change, slower or heavier
+
+
+def main(
+    sizes=(10, 100, 1000),
+    name_filter=None,
+    fixtures=None,
+    save=None,
+    baseline=None,
+    threshold=0.2,
+    min_time=0.2,
+):
+    Client.raspisanie = RASPIANIE
+    Client.ignore_type = []
+    recorded = recorded_inputs(fixtures) if fixtures else {}
+    base = {}
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            base = json.load(f)["results"]
+    results = {}
+    regressions = []
+    print(
+        f"{'case':<30}{'size':>6}{'ops/s':>13}{'us/call':>11}"
+        f"{'alloc B':>10}{'blocks':>8}{'vs base':>9}"
+    )
+    for name, run, make, mutates in CASES:
+        if name_filter and name_filter not in name:
+            continue
+        inputs = [(str(size), make(size)) for size in sizes]
+        if name in recorded:
+            inputs.append(("rec", recorded[name]))
+        for size, batch in inputs:
+            per_call, peak, blocks = measure(run, batch, mutates, min_time)
+            items = items_in(batch)
+            key = f"{name}[{size}]"
+            result = results[key] = {
+                "ops": items / per_call,
+                "alloc": peak / items,
+                "blocks": blocks / items,
+            }
+            change, regressed = compare(result, base.get(key), threshold)
+            if regressed:
+                regressions.append(key)
+            print(
+                f"{name:<30}{size:>6}{result['ops']:>13,.0f}{per_call * 1e6:>11.1f}"
+                f"{result['alloc']:>10.0f}{result['blocks']:>8.1f}"
+                f"{'' if change is None else f'{change:+.0%}':>9}"
+                f"{'  REGRESSION' if regressed else ''}"
+            )
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "results": results,
+                },
+                f,
+                indent=1,
+            )
+    if regressions:
+        print(f"超过 {threshold:.0%} 的回退：{', '.join(regressions)}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--filter")
+    parser.add_argument("--fixtures", help="zfn_replay.Recorder 保存的文件")
+    parser.add_argument("--save", help="保存结果为基线")
+    parser.add_argument("--compare", help="与保存的基线对比")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    args = parser.parse_args()
+    regressions = main(
+        tuple(int(i) for i in args.sizes.split(",")),
+        args.filter,
+        args.fixtures,
+        args.save,
+        args.compare,
+        args.threshold,
+        args.min_time,
+    )
+    sys.exit(1 if regressions else 0)
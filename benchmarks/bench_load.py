@@ -0,0 +1,310 @@
+"""
+端到端压测：N 名学生并发访问本地模拟教务系统（zfn_replay.MockServer），统计单个进程每秒能服务多少学生
+用法：python benchmarks/bench_load.py [--students 20] [--duration 10] [--scenario mixed|all|browse,pdf]
+            [--mix get_grade=3,get_schedule=1] [--latency 0.01-0.05] [--error-rate 0.01]
+            [--login-page-rate 0.01] [--fixtures fixtures.json] [--async]
+每名学生循环进行"访问"：新建 Client 登录，再按场景的权重随机调用 --ops-per-visit 个方法
+模拟服务器在独立进程中运行，CPU 与峰值 RSS 只统计压测进程（即 Client 一侧）
+visits/s 为每秒完成的访问数，即每秒服务的学生数；err 为 code 不为1000的调用数
+注入错误时 Client 会打印异常堆栈，可加 2>/dev/null 只看结果
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import payloads  # noqa: E402
+from zfn_api import Client  # noqa: E402
+from zfn_async import AsyncClient  # noqa: E402
+from zfn_cache import MemoryCache  # noqa: E402
+from zfn_replay import FixtureStore, MockServer  # noqa: E402
+
+# 方法名及调用参数
+OPERATIONS = {
+    "get_info": (),
+    "get_grade": (2023, 1),
+    "get_schedule": (2023, 1),
+    "get_academia": (),
+    "get_academia_pdf": (),
+    "get_schedule_pdf": (2023, 1),
+}
+# 场景：各方法的权重，为空时每次访问只登录
+SCENARIOS = {
+    "login": {},
+    "browse": {"get_info": 1, "get_grade": 3, "get_schedule": 3},
+    "academia": {"get_academia": 1},
+    "pdf": {"get_academia_pdf": 1, "get_schedule_pdf": 1},
+    "mixed": {
+        "get_info": 2,
+        "get_grade": 4,
+        "get_schedule": 4,
+        "get_academia": 1,
+        "get_academia_pdf": 0.5,
+        "get_schedule_pdf": 0.5,
+    },
+}
+
+
+def serve(queue, stop, fixtures, rows, options):
+    """模拟服务器进程"""
+    store = FixtureStore.load(fixtures) if fixtures else payloads.fixtures(rows)
+    server = MockServer(store, **options).start()
+    queue.put(server.base_url)
+    stop.wait()
+    server.stop()
+
+
+class RSSSampler:
+    """后台线程定期采样当前进程的 RSS，记录峰值（字节），不支持的平台为 None"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @classmethod
+    def rss(cls):
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        try:
+            import resource
+        except ImportError:
+            return None
+        # ru_maxrss 为进程生命周期内的峰值，Linux 以 KB 计，macOS 以字节计
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = self.rss()
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def choose(weights, count, rnd):
+    if not weights:
+        return []
+    return rnd.choices(list(weights), list(weights.values()), k=count)
+
+
+def visit(base_url, student, weights, ops_per_visit, rnd, samples, timeout):
+    client = Client(base_url=base_url, timeout=timeout, session_store=MemoryCache())
+    start = time.perf_counter()
+    result = client.login(f"2021{student:06d}", "password")
+    samples.append(("login", time.perf_counter() - start, result["code"]))
+    if result["code"] != 1000:
+        return
+    for name in choose(weights, ops_per_visit, rnd):
+        start = time.perf_counter()
+        result = getattr(client, name)(*OPERATIONS[name])
+        samples.append((name, time.perf_counter() - start, result["code"]))
+
+
+async def async_visit(base_url, student, weights, ops_per_visit, rnd, samples, timeout):
+    async with AsyncClient(
+        base_url=base_url, timeout=timeout, session_store=MemoryCache()
+    ) as client:
+        start = time.perf_counter()
+        result = await client.login(f"2021{student:06d}", "password")
+        samples.append(("login", time.perf_counter() - start, result["code"]))
+        if result["code"] != 1000:
+            return
+        for name in choose(weights, ops_per_visit, rnd):
+            start = time.perf_counter()
+            result = await getattr(client, name)(*OPERATIONS[name])
+            samples.append((name, time.perf_counter() - start, result["code"]))
+
+
+def run_threads(base_url, weights, students, duration, ops_per_visit, seed, timeout):
+    """每名学生一个线程，返回 (调用记录, 完成的访问数)"""
+    samples = []
+    visits = [0] * students
+    end = time.perf_counter() + duration
+
+    def student_loop(index):
+        rnd = random.Random(seed + index)
+        while time.perf_counter() < end:
+            visit(base_url, index, weights, ops_per_visit, rnd, samples, timeout)
+            visits[index] += 1
+
+    threads = [
+        threading.Thread(target=student_loop, args=(i,)) for i in range(students)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, sum(visits)
+
+
+async def run_tasks(base_url, weights, students, duration, ops_per_visit, seed, timeout):
+    """每名学生一个协程，返回值同 run_threads"""
+    samples = []
+    visits = [0] * students
+    end = time.perf_counter() + duration
+
+    async def student_loop(index):
+        rnd = random.Random(seed + index)
+        while time.perf_counter() < end:
+            await async_visit(
+                base_url, index, weights, ops_per_visit, rnd, samples, timeout
+            )
+            visits[index] += 1
+
+    await asyncio.gather(*(student_loop(i) for i in range(students)))
+    return samples, sum(visits)
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(name, samples, visits, wall, cpu, peak_rss):
+    print(
+        f"\n[{name}] visits/s {visits / wall:.1f}  ops/s {len(samples) / wall:.1f}  "
+        f"cpu {cpu:.1f}s ({cpu / wall:.0%} of one core)  "
+        f"peak RSS {'n/a' if peak_rss is None else f'{peak_rss / 2**20:.0f} MB'}"
+    )
+    print(
+        f"{'operation':<20}{'calls':>8}{'err':>6}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    groups = {}
+    for operation, elapsed, code in samples:
+        groups.setdefault(operation, []).append((elapsed, code))
+    groups["all"] = [(elapsed, code) for _, elapsed, code in samples]
+    for operation, calls in groups.items():
+        ordered = sorted(elapsed for elapsed, _ in calls)
+        errors = sum(1 for _, code in calls if code != 1000)
+        print(
+            f"{operation:<20}{len(calls):>8}{errors:>6}"
+            f"{percentile(ordered, 0.50) * 1e3:>10.1f}"
+            f"{percentile(ordered, 0.95) * 1e3:>10.1f}"
+            f"{percentile(ordered, 0.99) * 1e3:>10.1f}"
+        )
+
+
+def parse_mix(text):
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"未知的方法：{name}，可选 {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def parse_latency(text):
+    low, _, high = text.partition("-")
+    return (float(low), float(high)) if high else float(low)
+
+
+def main(
+    scenarios,
+    students=20,
+    duration=10,
+    ops_per_visit=5,
+    use_async=False,
+    fixtures=None,
+    rows=40,
+    server_options=None,
+    seed=0,
+    timeout=10,
+):
+    context = multiprocessing.get_context("spawn")
+    queue, stop = context.Queue(), context.Event()
+    server = context.Process(
+        target=serve, args=(queue, stop, fixtures, rows, server_options or {})
+    )
+    server.start()
+    try:
+        base_url = queue.get(timeout=30)
+        print(
+            f"{students} students, {duration}s per scenario, {ops_per_visit} ops/visit, "
+            f"{'AsyncClient' if use_async else 'Client'}, server {base_url}"
+        )
+        for name, weights in scenarios.items():
+            args = (base_url, weights, students, duration, ops_per_visit, seed, timeout)
+            with RSSSampler() as sampler:
+                cpu = time.process_time()
+                start = time.perf_counter()
+                if use_async:
+                    samples, visits = asyncio.run(run_tasks(*args))
+                else:
+                    samples, visits = run_threads(*args)
+                wall = time.perf_counter() - start
+                cpu = time.process_time() - cpu
+            report(name, samples, visits, wall, cpu, sampler.peak)
+    finally:
+        stop.set()
+        server.join(5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=20, help="并发学生数")
+    parser.add_argument("--duration", type=float, default=10, help="每个场景的秒数")
+    parser.add_argument("--ops-per-visit", type=int, default=5)
+    parser.add_argument(
+        "--scenario", default="mixed", help=f"all 或逗号分隔的 {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument("--mix", help="自定义场景，如 get_grade=3,get_schedule=1")
+    parser.add_argument("--async", dest="use_async", action="store_true")
+    parser.add_argument("--fixtures", help="zfn_replay.Recorder 保存的文件")
+    parser.add_argument("--rows", type=int, default=40, help="合成数据的条目数")
+    parser.add_argument("--latency", default="0", help="注入延迟秒数，如 0.02 或 0.01-0.05")
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--login-page-rate", type=float, default=0)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.mix:
+        selected = {"custom": parse_mix(args.mix)}
+    elif args.scenario == "all":
+        selected = SCENARIOS
+    else:
+        names = args.scenario.split(",")
+        unknown = [i for i in names if i not in SCENARIOS]
+        if unknown:
+            raise SystemExit(f"未知的场景：{', '.join(unknown)}")
+        selected = {name: SCENARIOS[name] for name in names}
+    main(
+        selected,
+        args.students,
+        args.duration,
+        args.ops_per_visit,
+        args.use_async,
+        args.fixtures,
+        args.rows,
+        {
+            "latency": parse_latency(args.latency),
+            "error_rate": args.error_rate,
+            "login_page_rate": args.login_page_rate,
+            "seed": args.seed,
+        },
+        args.seed,
+        args.timeout,
+    )
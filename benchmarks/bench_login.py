@@ -0,0 +1,166 @@
+"""
+登录吞吐量对比：原登录流程（每次解析完整 DOM、获取并解析公钥）与缓存公钥、轻量提取 csrftoken 后的登录
+模拟的登录接口运行在子进程中，client cpu 为本进程每次登录消耗的CPU时间，无需连接教务系统
+用法：python benchmarks/bench_login.py [--logins 300] [--threads 8] [--session-bound]
+--session-bound 模拟公钥与会话绑定的教务系统，验证复用公钥失败后自动退回每次获取，有登录失败时以状态码 1 退出
+"""
+import argparse
+import base64
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urljoin
+
+import requests
+import rsa
+from pyquery import PyQuery as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import payloads  # noqa: E402
+from zfn_api import Client  # noqa: E402
+from zfn_cache import PublicKeyCache  # noqa: E402
+
+INDEX_PAGE = "<html><body>" + "<div class='item'>首页</div>\n" * 400 + "</body></html>"
+
+
+def encode_int(value):
+    return base64.b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+class LoginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    public_key = private_key = None
+    session_bound = False
+    session_keys = {}
+
+    def respond(self, body, content_type="text/html;charset=utf-8", cookie=None):
+        body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cookie:
+            self.send_header("Set-Cookie", f"JSESSIONID={cookie}; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def session(self):
+        cookie = self.headers.get("Cookie", "")
+        return cookie.partition("JSESSIONID=")[2].partition(";")[0]
+
+    def do_GET(self):
+        if "login_getPublicKey" in self.path:
+            public_key = self.public_key
+            if self.session_bound:
+                public_key, private_key = rsa.newkeys(512)
+                self.session_keys[self.session()] = private_key
+            n, e = encode_int(public_key.n), encode_int(public_key.e)
+            body = f'{{"modulus":"{n.decode()}","exponent":"{e.decode()}"}}'
+            return self.respond(body, "application/json;charset=utf-8")
+        self.respond(payloads.LOGIN_PAGE, cookie=uuid.uuid4().hex)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if self.session_bound:
+            try:
+                rsa.decrypt(
+                    base64.b64decode(form["mm"][0]),
+                    self.session_keys.pop(self.session()),
+                )
+            except (KeyError, rsa.DecryptionError):
+                return self.respond('<p id="tips">用户名或密码不正确</p>')
+        self.respond(INDEX_PAGE, cookie=uuid.uuid4().hex)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_login(base_url, sid, password):
+    """原登录流程，仅用于对比"""
+    sess = requests.Session()
+    login_url = urljoin(base_url, "xtgl/login_slogin.html")
+    doc = pq(sess.get(login_url, timeout=5).text)
+    csrf_token = doc("#csrftoken").attr("value")
+    req_pubkey = sess.get(urljoin(base_url, "xtgl/login_getPublicKey.html")).json()
+    assert str(doc("input#yzm")) == ""
+    encrypt_password = Client.encrypt_password(
+        password, req_pubkey["modulus"], req_pubkey["exponent"]
+    )
+    req_login = sess.post(
+        login_url,
+        data={"csrftoken": csrf_token, "yhm": sid, "mm": encrypt_password},
+        timeout=5,
+    )
+    tips = pq(req_login.text)("p#tips")
+    return 1000 if str(tips) == "" else 1002
+
+
+def cached_login(base_url, sid, password, cache):
+    client = Client({}, base_url=base_url, public_key_cache=cache, timeout=5)
+    return client.login(sid, password)["code"]
+
+
+def run(name, login, logins, threads):
+    start = time.perf_counter()
+    cpu = time.process_time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        codes = list(executor.map(login, range(logins)))
+    cpu = time.process_time() - cpu
+    elapsed = time.perf_counter() - start
+    failed = sum(code != 1000 for code in codes)
+    print(
+        f"{name:<10}{logins / elapsed:>12.1f}{elapsed * 1e3 / logins:>12.2f}"
+        f"{cpu * 1e3 / logins:>14.2f}{failed:>8}"
+    )
+    return failed
+
+
+def serve(session_bound, ports):
+    LoginHandler.public_key, LoginHandler.private_key = rsa.newkeys(1024)
+    LoginHandler.session_bound = session_bound
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LoginHandler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def main(logins=300, threads=8, session_bound=False):
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve, args=(session_bound, ports), daemon=True
+    )
+    server.start()
+    base_url = f"http://127.0.0.1:{ports.get()}/jwglxt/"
+    cache = PublicKeyCache(ttl=60)
+    print(
+        f"{'flow':<10}{'logins/s':>12}{'ms/login':>12}"
+        f"{'client cpu ms':>14}{'failed':>8}"
+    )
+    try:
+        run("legacy", lambda i: legacy_login(base_url, str(i), "pw"), logins, threads)
+        cached_failed = run(
+            "cached",
+            lambda i: cached_login(base_url, str(i), "pw", cache),
+            logins,
+            threads,
+        )
+    finally:
+        server.terminate()
+    if session_bound:
+        print("session_bound:", base_url in cache.session_bound)
+        # 复用的公钥失败后应重新获取公钥重试，而不是直接返回1002
+        if cached_failed or base_url not in cache.session_bound:
+            sys.exit("FAILED: 公钥与会话绑定时缓存公钥的登录未能退回每次获取")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--session-bound", action="store_true")
+    args = parser.parse_args()
+    main(args.logins, args.threads, args.session_bound)
@@ -0,0 +1,75 @@
+"""
+结果记录的内存占用对比：每行一个字典（默认）与 records=True 时的 __slots__ 记录
+用法：python benchmarks/bench_records.py [--rows 100000]
+memory 为 tracemalloc 统计的结果列表常驻内存，包括字段值本身，原始接口数据预先生成不计入
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import payloads  # noqa: E402
+from zfn_api import RASPIANIE, Client  # noqa: E402
+from zfn_records import Grade, ScheduleEntry, SelectedCourse  # noqa: E402
+
+
+def measure(build, items):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build(items)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(rows) == len(items)
+    return current, peak, elapsed
+
+
+def main(rows=100000):
+    Client.raspisanie = RASPIANIE
+    cases = [
+        ("grade", Client.format_grade, Grade, payloads.grade_items(rows)),
+        (
+            "schedule",
+            Client.format_schedule,
+            ScheduleEntry,
+            payloads.schedule_items(rows),
+        ),
+        (
+            "selected",
+            Client.format_selected,
+            SelectedCourse,
+            payloads.selected_items(rows),
+        ),
+    ]
+    print(
+        f"{'result':<10}{'mode':<8}{'memory MB':>11}{'peak MB':>10}"
+        f"{'B/row':>8}{'build s':>9}{'saved':>8}"
+    )
+    for name, format_row, record_type, items in cases:
+        baseline = None
+        for mode, build in (
+            ("dict", lambda items: [format_row(i) for i in items]),
+            (
+                "record",
+                lambda items: [record_type.from_dict(format_row(i)) for i in items],
+            ),
+        ):
+            current, peak, elapsed = measure(build, items)
+            baseline = baseline or current
+            print(
+                f"{name:<10}{mode:<8}{current / 2**20:>11.1f}{peak / 2**20:>10.1f}"
+                f"{current / rows:>8.0f}{elapsed:>9.2f}"
+                f"{1 - current / baseline:>8.0%}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    main(parser.parse_args().rows)
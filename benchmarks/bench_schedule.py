@@ -0,0 +1,107 @@
+"""
+课表合并时段拆分的CPU开销对比：原嵌套循环实现与按 (课程号, 星期, 周次) 分组的单次遍历
+用法：python benchmarks/bench_schedule.py [--legacy-max 500]
+原实现为 O(n³)，超过 --legacy-max 行时按 n³ 由最大实测规模外推，结果标注 est.
+"""
+import argparse
+import copy
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import payloads  # noqa: E402
+from zfn_api import RASPIANIE, Client  # noqa: E402
+
+
+def legacy_split_merge_display(schedule):
+    """原实现，仅用于对比"""
+    repetIndex = []
+    count = 0
+    for items in schedule["courses"]:
+        for index in range(len(schedule["courses"])):
+            if (schedule["courses"]).index(items) == count:
+                continue
+            elif (
+                items["course_id"] == schedule["courses"][index]["course_id"]
+                and items["weekday"] == schedule["courses"][index]["weekday"]
+                and items["weeks"] == schedule["courses"][index]["weeks"]
+            ):
+                repetIndex.append(index)
+        count += 1
+    if len(repetIndex) % 2 != 0:
+        return schedule
+    for r in range(0, len(repetIndex), 2):
+        fir = repetIndex[r]
+        sec = repetIndex[r + 1]
+        if len(re.findall(r"(\d+)", schedule["courses"][fir]["sessions"])) == 4:
+            args = re.findall(r"(\d+)", schedule["courses"][fir]["sessions"])
+            schedule["courses"][fir]["sessions"] = args[0] + "-" + args[1] + "节"
+            schedule["courses"][fir]["list_sessions"] = Client.list_sessions(
+                schedule["courses"][fir]["sessions"]
+            )
+            schedule["courses"][fir]["time"] = Client.display_course_time(
+                schedule["courses"][fir]["sessions"]
+            )
+            args = re.findall(r"(\d+)", schedule["courses"][sec]["sessions"])
+            schedule["courses"][sec]["sessions"] = args[2] + "-" + args[3] + "节"
+            schedule["courses"][sec]["list_sessions"] = Client.list_sessions(
+                schedule["courses"][sec]["sessions"]
+            )
+            schedule["courses"][sec]["time"] = Client.display_course_time(
+                schedule["courses"][sec]["sessions"]
+            )
+    return schedule
+
+
+def make_schedule(rows):
+    """约每10行中有一组两条相同的合并时段记录，与教务系统返回一致"""
+    items = []
+    for i, item in enumerate(payloads.schedule_items(rows)):
+        if i % 10 == 9:
+            item = dict(items[-1], jc="1-2节,5-6节")
+            items[-1] = dict(item)
+        items.append(item)
+    return {"courses": [Client.format_schedule(i) for i in items]}
+
+
+def measure(func, schedule, number):
+    best = None
+    for _ in range(number):
+        data = copy.deepcopy(schedule)
+        start = time.perf_counter()
+        func(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes=(50, 500, 5000), legacy_max=500, number=5):
+    Client.raspisanie = RASPIANIE
+    baseline = None
+    print(f"{'rows':>6}{'legacy ms':>16}{'grouped ms':>14}{'speed-up':>12}")
+    for rows in sizes:
+        schedule = make_schedule(rows)
+        grouped = measure(Client.split_merge_display, schedule, number)
+        if rows <= legacy_max:
+            expected = legacy_split_merge_display(copy.deepcopy(schedule))
+            assert expected == Client.split_merge_display(copy.deepcopy(schedule))
+            repeat = 1 if rows > 200 else number
+            legacy = measure(legacy_split_merge_display, schedule, repeat)
+            baseline = (rows, legacy)
+            legacy_text = f"{legacy * 1e3:.2f}"
+        else:
+            legacy = baseline[1] * (rows / baseline[0]) ** 3
+            legacy_text = f"{legacy * 1e3:.0f} est."
+        print(
+            f"{rows:>6}{legacy_text:>16}{grouped * 1e3:>14.3f}"
+            f"{legacy / grouped:>11.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--legacy-max", type=int, default=500)
+    main(legacy_max=parser.parse_args().legacy_max)
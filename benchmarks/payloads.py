@@ -0,0 +1,247 @@
+"""
+基准测试用的模拟响应数据，字段与教务系统接口返回保持一致
+"""
+import json
+import random
+
+from zfn_replay import FixtureStore
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>教学管理信息服务平台</title></head>
+<body>
+<div class="login-box">
+  <h5>用户登录</h5>
+  <form id="form1" action="/jwglxt/xtgl/login_slogin.html" method="post">
+    <input type="hidden" id="csrftoken" name="csrftoken" value="1c2b3a4d-5e6f-7a8b-9c0d-e1f2a3b4c5d6,1c2b3a4d5e6f7a8b9c0de1f2a3b4c5d6"/>
+    <input type="text" id="yhm" name="yhm" placeholder="用户名"/>
+    <input type="password" id="mm" name="mm" placeholder="密码"/>
+    <p id="tips" class="bg_danger sl_danger"></p>
+    <button type="button" id="dl">登 录</button>
+  </form>
+</div>
+""" + "<script type=\"text/javascript\">var _t = 0;</script>\n" * 40 + "</body></html>"
+
+WEEKS = ["1-16周", "1-8周", "9-16周", "1-15周(单)", "2-16周(双)", "1-4周,6-12周", "3周"]
+SESSIONS = ["1-2节", "3-4节", "5-6节", "7-8节", "9-11节"]
+
+
+def grade_items(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            "xh": "2021123456",
+            "xm": "张三",
+            "kch_id": f"B{100000 + i}",
+            "kcmc": f"课程{i}",
+            "jsxm": f"教师{i % 50}",
+            "jxbmc": f"({2023 - i % 4}-{2024 - i % 4}-{i % 2 + 1})-B{100000 + i}-01",
+            "xf": rnd.choice(["1.0", "2.0", "2.5", "3.0", "4.0"]),
+            "kclbmc": rnd.choice(["通识教育", "学科基础", "专业核心", "实践教学"]),
+            "kcxzmc": rnd.choice(["必修", "选修", "限选"]),
+            "cj": str(rnd.randint(45, 100)),
+            "jd": f"{rnd.uniform(0, 5):.2f}",
+            "ksxz": rnd.choice(["正常考试", "补考一", "重修"]),
+            "kkbmmc": rnd.choice(["信息工程学院", "数理学院", "外国语学院"]),
+            "kcbj": "主修",
+            "xnm": str(2020 + i % 4),
+            "xqm": rnd.choice(["3", "12"]),
+        }
+        for i in range(count)
+    ]
+
+
+def schedule_items(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            "kch_id": f"B{100000 + i // 2}",
+            "kcmc": f"课程{i // 2}",
+            "xm": f"教师{i % 50}",
+            "jxbmc": f"B{100000 + i // 2}-01",
+            "xf": rnd.choice(["1.0", "2.0", "3.0"]),
+            "xqj": str(rnd.randint(1, 7)),
+            "jc": rnd.choice(SESSIONS),
+            "zcd": rnd.choice(WEEKS),
+            "khfsmc": rnd.choice(["考试", "考查"]),
+            "xqmc": "主校区",
+            "cdmc": f"教{rnd.randint(1, 9)}-{rnd.randint(101, 512)}",
+            "kcxszc": "理论:32",
+            "zhxs": "2",
+            "zxs": "32",
+        }
+        for i in range(count)
+    ]
+
+
+def selected_items(count, seed=0):
+    rnd = random.Random(seed)
+    return [
+        {
+            "kch": f"B{100000 + i}",
+            "jxb_id": f"{i:032X}",
+            "do_jxb_id": f"{i:064x}",
+            "kcmc": f"课程{i}",
+            "jsxx": f"2019{i:04d}/教师{i % 50}/副教授",
+            "xf": rnd.choice(["1", "2", "3"]),
+            "kklxmc": "主修课程",
+            "jxbrs": "120",
+            "yxzrs": str(rnd.randint(0, 120)),
+            "jxdd": "教1-101<br/>教1-102",
+            "sksj": "星期一第1-2节{1-16周}<br/>星期三第3-4节{1-16周}",
+            "zixf": "0",
+            "sxbj": "1",
+        }
+        for i in range(count)
+    ]
+
+
+def notification_items(count):
+    return [
+        {
+            "xxnr": f"调课提醒:课程{i}由星期一第1-2节调至星期三第5-6节",
+            "cjsj": f"2024-03-{1 + i % 28:02d} 10:{i % 60:02d}:00",
+            "xxdm": f"{i:032x}",
+        }
+        for i in range(count)
+    ]
+
+
+def grade_json(count, seed=0):
+    return json.dumps(
+        {"items": grade_items(count, seed), "totalResult": count}, ensure_ascii=False
+    )
+
+
+def schedule_json(count, seed=0):
+    return json.dumps(
+        {
+            "xsxx": {"XH": "2021123456", "XM": "张三"},
+            "kbList": schedule_items(count, seed),
+            "sjkList": [{"qtkcgs": "课程X 1-16周 无"}],
+        },
+        ensure_ascii=False,
+    )
+
+
+def selected_json(count, seed=0):
+    return json.dumps(selected_items(count, seed), ensure_ascii=False)
+
+
+ACADEMIA_TYPES = ["通识教育", "学科基础", "专业核心", "专业选修", "实践教学", "创新创业"]
+
+
+def academia_statistics(seed=0):
+    """学业情况页 div#alertBox 的文本（已去除空白）"""
+    rnd = random.Random(seed)
+    passed, failed, missed, reading = (
+        rnd.randint(20, 60),
+        rnd.randint(0, 5),
+        rnd.randint(0, 20),
+        rnd.randint(0, 8),
+    )
+    return (
+        f"平均学分绩点(GPA)：{rnd.uniform(1, 4.5):.2f}"
+        f"计划总课程{passed + failed + missed + reading}门通过{passed}门，"
+        f"未通过{failed}门，未修{missed}门，在读{reading}门，"
+        f"计划外通过{rnd.randint(0, 6)}门，未通过{rnd.randint(0, 2)}门"
+    )
+
+
+def academia_page(types, seed=0):
+    """学业情况主页面中各类别的学分要求部分，types 为类别数"""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(types):
+        name = ACADEMIA_TYPES[i % len(ACADEMIA_TYPES)]
+        if i >= len(ACADEMIA_TYPES):
+            name += str(i // len(ACADEMIA_TYPES))
+        required = rnd.choice([10, 20, 30, 40])
+        earned = rnd.randint(0, required)
+        rows.append(
+            f'<a title="{name}&nbsp;要求学分:{required}.0&nbsp;获得学分:{earned}.0'
+            f'&nbsp;未获得学分:{required - earned}.0&nbsp;">{name}</a>\n'
+            f'<div class="panel-body">\n'
+            f"<span id='showKc{i:04d}{rnd.randint(0, 9999):04d}'></span>\n</div>"
+        )
+    return (
+        '<html><body><input type="hidden" id="xh_id" value="2021123456"/>\n'
+        + '<div id="alertBox">'
+        + academia_statistics(seed)
+        + "</div>\n"
+        + "\n".join(rows)
+        + "</body></html>"
+    )
+
+
+def academia_items(count, seed=0):
+    """学业情况某一类别的课程列表"""
+    rnd = random.Random(seed)
+    return [
+        {
+            "KCH": f"B{100000 + i}",
+            "KCMC": f"课程{i}",
+            "XDZT": rnd.choice(["1", "2", "3", "4"]),
+            "JYXDXNM": str(2021 + i % 4),
+            "JYXDXQMC": rnd.choice(["1", "2"]),
+            "XF": rnd.choice(["1.0", "2.0", "3.0"]),
+            "KCLBMC": rnd.choice(["通识教育", "学科基础", "专业核心"]),
+            "KCXZMC": rnd.choice(["必修", "选修"]),
+            "MAXCJ": str(rnd.randint(45, 100)),
+            "JD": f"{rnd.uniform(0, 5):.2f}",
+        }
+        for i in range(count)
+    ]
+
+
+PDF = b"%PDF-1.4\n" + b"0" * 200 * 1024 + b"\n%%EOF\n"
+
+
+def fixtures(rows=40, types=6, pdf=PDF):
+    """
+    zfn_replay.MockServer 使用的合成记录，覆盖个人信息、成绩、课表、学业情况及两种 pdf 导出
+    rows 为成绩、课表及学业情况每个类别的条目数，types 为学业情况的类别数
+    """
+    store = FixtureStore()
+    store.add_response(
+        "GET",
+        "xsxxxggl/xsxxwh_cxCkDgxsxx.html",
+        json.dumps(
+            {"xh": "2021123456", "xm": "张三", "zsjg_id": "信息工程学院"},
+            ensure_ascii=False,
+        ),
+        "application/json;charset=utf-8",
+    )
+    store.add_response(
+        "POST", "cjcx/cjcx_cxXsgrcj.html", grade_json(rows), "application/json"
+    )
+    store.add_response(
+        "POST", "kbcx/xskbcx_cxXsKb.html", schedule_json(rows), "application/json"
+    )
+    store.add_response(
+        "GET", "xsxy/xsxyqk_cxXsxyqkIndex.html", academia_page(types)
+    )
+    store.add_response(
+        "POST",
+        "xsxy/xsxyqk_cxJxzxjhxfyqKcxx.html",
+        json.dumps(academia_items(rows), ensure_ascii=False),
+        "application/json",
+    )
+    for path in (
+        "bysxxcx/xscjzbdy_dyXscjzbView.html",
+        "bysxxcx/xscjzbdy_dyCjdyszxView.html",
+        "xtgl/bysxxcx/xscjzbdy_cxXsCount.html",
+        "bysxxcx/xscjzbdy_cxGswjlx.html",
+        "common/common_cxJwxtxx.html",
+        "xtgl/progress_cxProgressStatus.html",
+        "kbdy/bjkbdy_cxXnxqsfkz.html",
+    ):
+        store.add_response("POST", path, "1")
+    store.add_response(
+        "POST",
+        "bysxxcx/xscjzbdy_dyList.html",
+        '"\\\\jwglxt\\\\templete\\\\scoreprint\\\\score.pdf#成功"',
+    )
+    store.add_response("GET", "templete/scoreprint/score.pdf", pdf, "application/pdf")
+    store.add_response("POST", "kbcx/xskbcx_cxXsShcPdf.html", pdf, "application/pdf")
+    return store
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zfn_api import Client  # noqa: E402
+from zfn_replay import FixtureStore, MockServer, Recorder  # noqa: E402
+
+SECRETS = {
+    "学号：": "2021123456",
+    "姓名：": "张三丰",
+    "证件号码：": "320102200301011234",
+    "出生日期：": "2003-01-01",
+    "手机号码：": "13912345678",
+    "电子邮箱：": "zhangsf@example.com",
+    "家庭地址：": "江苏省徐州市某某路88号",
+}
+INFO_PAGE = (
+    "<html><body><div class='col-sm-6'>"
+    + "".join(
+        "<div class='form-group'>"
+        f"<label class='col-sm-4 control-label'>{label}</label>"
+        f"<div class='col-sm-8'><p class='form-control-static'>{value}</p></div>"
+        "</div>"
+        for label, value in SECRETS.items()
+    )
+    + "</div></body></html>"
+)
+INFO_JSON = {
+    "xh": "2021123456",
+    "xm": "张三丰",
+    "zjhm": "320102200301011234",
+    "sjhm": "13912345678",
+    "dzyx": "zhangsf@example.com",
+}
+
+
+def test_recorded_info_pages_keep_no_personal_values():
+    store = FixtureStore()
+    store.add_response("GET", "xsxxxggl/xsgrxxwh_cxXsgrxx.html", INFO_PAGE)
+    store.add_response(
+        "GET",
+        "xsxxxggl/xsxxwh_cxCkDgxsxx.html",
+        json.dumps(INFO_JSON, ensure_ascii=False),
+        "application/json;charset=utf-8",
+    )
+    with MockServer(store) as server:
+        client = Client(base_url=server.base_url, metrics=None, response_cache=None)
+        recorder = Recorder()
+        recorder.attach(client)
+        assert client.login("2021123456", "secret-password")["code"] == 1000
+        client._get_info()
+        client.get_info()
+    saved = json.dumps(recorder.fixtures().entries, ensure_ascii=False)
+    assert "form-control-static" in saved
+    for value in [*SECRETS.values(), "secret-password"]:
+        assert value not in saved
@@ -0,0 +1,276 @@
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅本模块需要
+    np = None
+
+
+class GradeTable:
+    """
+    成绩列存表，用于整个专业/年级的绩点与学分统计
+    每行一门课程，student 为学生序号（对应 sids），credit、grade_point、score 为浮点数（缺失为 nan），
+    category、nature、course 为编码后的整数，对应的取值分别在 categories、natures、courses 中
+    """
+
+    # 等级制成绩换算的百分制分数，只用于判断是否及格
+    LEVEL_SCORES = {
+        "优秀": 95,
+        "良好": 85,
+        "中等": 75,
+        "及格": 65,
+        "合格": 60,
+        "不及格": 0,
+        "不合格": 0,
+    }
+    PASS_SCORE = 60
+
+    def __init__(self, sids, columns, categories, natures, courses):
+        if np is None:
+            raise ImportError("GradeTable 需要安装 numpy")
+        self.sids = sids
+        self.categories = categories
+        self.natures = natures
+        self.courses = courses
+        self.student = columns["student"]
+        self.credit = columns["credit"]
+        self.grade_point = columns["grade_point"]
+        self.score = columns["score"]
+        self.category = columns["category"]
+        self.nature = columns["nature"]
+        self.course = columns["course"]
+
+    @classmethod
+    def _float(cls, value):
+        """align_floats 返回的字符串等转换为浮点数，无法转换时为 nan"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return float("nan")
+
+    @classmethod
+    def _score(cls, value):
+        if value in cls.LEVEL_SCORES:
+            return float(cls.LEVEL_SCORES[value])
+        return cls._float(value)
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        由多名学生的 get_grade 或 get_academia 结果构建，code 不为1000的结果跳过
+        课程可以是字典或 zfn_records 中的记录；学业情况中类别为空的课程以所属的 type 作为类别
+        """
+        if np is None:
+            raise ImportError("GradeTable 需要安装 numpy")
+        sids, rows = [], []
+        for result in results:
+            if result.get("code") != 1000:
+                continue
+            data = result["data"]
+            student = len(sids)
+            sids.append(data.get("sid"))
+            if "details" in data:
+                for detail in data["details"]:
+                    for course in detail["courses"]:
+                        rows.append(
+                            (
+                                student,
+                                course.get("credit"),
+                                course.get("grade_point"),
+                                course.get("max_grade"),
+                                course.get("category") or detail["type"],
+                                course.get("nature"),
+                                course.get("course_id"),
+                            )
+                        )
+            else:
+                for course in data["courses"]:
+                    rows.append(
+                        (
+                            student,
+                            course.get("credit"),
+                            course.get("grade_point"),
+                            course.get("grade"),
+                            course.get("category"),
+                            course.get("nature"),
+                            course.get("course_id"),
+                        )
+                    )
+        return cls.from_rows(sids, rows)
+
+    @classmethod
+    def _encode(cls, values, convert=None):
+        """
+        按取值去重后逐个转换，再按下标映射回整列，避免对每一行调用 Python 函数
+        convert 为空时返回 (编码数组, 取值列表)，否则返回转换后的浮点数组
+        """
+        index = dict.fromkeys(values)
+        if convert is None:
+            for code, value in enumerate(index):
+                index[value] = code
+            dtype = np.int64
+        else:
+            for value in index:
+                index[value] = convert(value)
+            dtype = np.float64
+        column = np.fromiter(map(index.__getitem__, values), dtype, len(values))
+        return (column, list(index)) if convert is None else column
+
+    @classmethod
+    def from_rows(cls, sids, rows):
+        """rows 为 (学生序号, 学分, 绩点, 成绩, 类别, 性质, 课程号) 元组"""
+        # 逐列用 itemgetter 取值，比 zip(*rows) 少创建百万级的参数元组
+        student, credit, grade_point, score, category, nature, course = (
+            list(map(itemgetter(i), rows)) for i in range(7)
+        )
+        columns = {
+            "student": np.fromiter(student, np.int64, len(rows)),
+            "credit": cls._encode(credit, cls._float),
+            "grade_point": cls._encode(grade_point, cls._float),
+            "score": cls._encode(score, cls._score),
+        }
+        columns["category"], categories = cls._encode(category)
+        columns["nature"], natures = cls._encode(nature)
+        columns["course"], courses = cls._encode(course)
+        return cls(list(sids), columns, categories, natures, courses)
+
+    def __len__(self):
+        return len(self.student)
+
+    def select(self, mask):
+        """按布尔数组或下标筛选行，学生及编码表保持不变"""
+        columns = {
+            name: getattr(self, name)[mask]
+            for name in (
+                "student",
+                "credit",
+                "grade_point",
+                "score",
+                "category",
+                "nature",
+                "course",
+            )
+        }
+        return type(self)(
+            self.sids, columns, self.categories, self.natures, self.courses
+        )
+
+    def nature_in(self, *natures):
+        """课程性质为给定值之一的行，如 table.select(table.nature_in("必修"))"""
+        codes = [self.natures.index(i) for i in natures if i in self.natures]
+        return np.isin(self.nature, codes)
+
+    def category_in(self, *categories):
+        codes = [self.categories.index(i) for i in categories if i in self.categories]
+        return np.isin(self.category, codes)
+
+    @property
+    def passed(self):
+        return self.score >= self.PASS_SCORE
+
+    @property
+    def failed(self):
+        return self.score < self.PASS_SCORE
+
+    def best_attempts(self):
+        """同一学生同一课程有多条记录（重修、补考）时只保留绩点最高的一条"""
+        key = self.student * len(self.courses) + self.course
+        grade_point = np.nan_to_num(self.grade_point, nan=-1.0)
+        order = np.lexsort((-grade_point, key))
+        first = np.ones(len(order), bool)
+        first[1:] = key[order][1:] != key[order][:-1]
+        return self.select(np.sort(order[first]))
+
+    def _per_student(self, weights):
+        return np.bincount(self.student, weights, minlength=len(self.sids))
+
+    def weighted_gpa(self):
+        """按学分加权的平均绩点，每名学生一个值，没有有效课程时为 nan"""
+        valid = ~np.isnan(self.grade_point) & (self.credit > 0)
+        credit = np.where(valid, self.credit, 0.0)
+        points = self._per_student(credit * np.where(valid, self.grade_point, 0.0))
+        credits = self._per_student(credit)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(credits > 0, points / credits, np.nan)
+
+    def credit_totals(self, passed_only=True):
+        """每名学生的学分合计，默认只计已及格的课程"""
+        credit = np.nan_to_num(self.credit)
+        if passed_only:
+            credit = np.where(self.passed, credit, 0.0)
+        return self._per_student(credit)
+
+    def failure_counts(self):
+        return self._per_student(self.failed.astype(np.float64)).astype(np.int64)
+
+    def category_credits(self, passed_only=True):
+        """(学生数, 类别数) 的已获学分矩阵，列顺序同 categories"""
+        credit = np.nan_to_num(self.credit)
+        if passed_only:
+            credit = np.where(self.passed, credit, 0.0)
+        size = len(self.sids) * len(self.categories)
+        cells = self.student * len(self.categories) + self.category
+        return np.bincount(cells, credit, minlength=size).reshape(
+            len(self.sids), len(self.categories)
+        )
+
+    def category_completion(self, required, passed_only=True):
+        """
+        各类别的学分完成度，required 为 {类别: 要求学分}
+        返回 (类别列表, (学生数, 类别数) 的完成比例矩阵)，完成比例上限为1
+        """
+        names = list(required)
+        earned = self.category_credits(passed_only)
+        columns = [
+            earned[:, self.categories.index(name)]
+            if name in self.categories
+            else np.zeros(len(self.sids))
+            for name in names
+        ]
+        earned = np.stack(columns, axis=1) if columns else earned[:, :0]
+        need = np.array([required[name] for name in names], np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            completion = np.where(need > 0, earned / need, 1.0)
+        return names, np.minimum(completion, 1.0)
+
+    @classmethod
+    def percentile_rank(cls, values):
+        """百分位排名（0~100），相同值取中间位置，nan 不参与排名且结果为 nan"""
+        values = np.asarray(values, np.float64)
+        valid = ~np.isnan(values)
+        ordered = np.sort(values[valid])
+        below = np.searchsorted(ordered, values, "left")
+        equal = np.searchsorted(ordered, values, "right") - below
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rank = (below + 0.5 * equal) / len(ordered) * 100
+        return np.where(valid, rank, np.nan)
+
+    @classmethod
+    def rank(cls, values):
+        """从高到低的名次，并列取相同名次（1, 2, 2, 4），nan 的名次为0"""
+        values = np.asarray(values, np.float64)
+        valid = ~np.isnan(values)
+        ordered = np.sort(values[valid])
+        higher = len(ordered) - np.searchsorted(ordered, values, "right")
+        return np.where(valid, higher + 1, 0)
+
+    def summary(self):
+        """每名学生的加权绩点、名次、百分位、已获学分及不及格门数"""
+        gpa = self.weighted_gpa()
+        rank = self.rank(gpa)
+        percentile = self.percentile_rank(gpa)
+        credits = self.credit_totals()
+        failures = self.failure_counts()
+        return [
+            {
+                "sid": sid,
+                "gpa": None if np.isnan(gpa[i]) else round(float(gpa[i]), 4),
+                "rank": int(rank[i]),
+                "percentile": None
+                if np.isnan(percentile[i])
+                else round(float(percentile[i]), 2),
+                "credits": float(credits[i]),
+                "failures": int(failures[i]),
+            }
+            for i, sid in enumerate(self.sids)
+        ]
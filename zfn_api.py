@@ -1,17 +1,40 @@
 import base64
 import binascii
+import contextvars
+import hashlib
+import hmac
+import html
+import inspect
 import json
+import os
 import re
 import time
 import traceback
 import unicodedata
-from urllib.parse import urljoin
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial, wraps
+from itertools import chain
+from urllib.parse import urljoin, urlsplit
 
 import requests
 import rsa
 from pyquery import PyQuery as pq
 from requests import exceptions
 
+from zfn_cache import course_category_cache, public_key_cache
+from zfn_classroom import classroom_index
+from zfn_metrics import MeteredSession, current_operation, metrics
+from zfn_pool import pool_registry
+from zfn_records import (
+    AcademiaCourse,
+    ExamEntry,
+    Grade,
+    ScheduleEntry,
+    SelectedCourse,
+    to_records,
+)
+
 RASPIANIE = [
     ["8:00", "8:45"],
     ["8:55", "9:40"],
@@ -31,6 +54,96 @@ RASPIANIE = [
 ]
 
 
+def relogin_on_expiry(method):
+    """配置了会话存储并调用过 login 时，返回1006后重新登录并重试一次"""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if (
+            isinstance(result, dict)
+            and result.get("code") == 1006
+            and self._credentials is not None
+            and self._relogin()
+        ):
+            return method(self, *args, **kwargs)
+        return result
+
+    return wrapper
+
+
+def response_cache_key(client, signature, name, args, kwargs, ignore=()):
+    """由调用参数生成 response_cache 的键，学年、学期以外的参数按名称附加在末尾"""
+    bound = signature.bind(client, *args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(list(bound.arguments.items())[1:])
+    year = arguments.pop("year", None)
+    term = arguments.pop("term", None)
+    extra = [f"{k}={v}" for k, v in arguments.items() if k not in ignore]
+    return client.response_cache.key(
+        client.base_url, client.sid, name, year, term, extra
+    )
+
+
+def cached_response(ignore=()):
+    """配置了 response_cache 且学号已知时缓存查询结果，ignore 为不影响结果、不计入键的参数"""
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.response_cache is None or self.sid is None:
+                return method(self, *args, **kwargs)
+            key = response_cache_key(
+                self, signature, method.__name__, args, kwargs, ignore
+            )
+            return self.response_cache.get_or_fetch(
+                key, method.__name__, partial(method, self, *args, **kwargs)
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def metered(method):
+    """记录调用耗时及返回的 code，调用期间发出的请求以方法名作为 operation 标签"""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return method(self, *args, **kwargs)
+        token = current_operation.set(method.__name__)
+        start = time.perf_counter()
+        code = "exception"
+        try:
+            result = method(self, *args, **kwargs)
+            code = result.get("code") if isinstance(result, dict) else "ok"
+            return result
+        finally:
+            self.metrics.observe_result(
+                self.sess.school, method.__name__, code, time.perf_counter() - start
+            )
+            current_operation.reset(token)
+
+    return wrapper
+
+
+def typed_records(record_type):
+    """开启 records 时将结果中的课程转换为 zfn_records 中的 __slots__ 记录"""
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            result = method(self, *args, **kwargs)
+            return to_records(result, record_type) if self.records else result
+
+        return wrapper
+
+    return decorator
+
+
 class Client:
     raspisanie = []
     ignore_type = []
@@ -42,6 +155,28 @@ class Client:
         self.ignore_type = kwargs.get("ignore_type", [])
         self.detail_category_type = kwargs.get("detail_category_type", [])
         self.timeout = kwargs.get("timeout", 3)
+        # 学业情况子请求的最大并发数及整个调用的默认截止秒数
+        self.fan_out = kwargs.get("fan_out", 8)
+        self.academia_deadline = kwargs.get("academia_deadline")
+        # 课程类别缓存，传入None关闭
+        self.category_cache = kwargs.get("category_cache", course_category_cache)
+        # 空教室位图索引，默认在所有 Client 间共享
+        self.classroom_index = kwargs.get("classroom_index", classroom_index)
+        # 会话存储（zfn_cache 中的 MemoryCache/SQLiteCache/DirectoryCache），按学号保存 cookies
+        self.session_store = kwargs.get("session_store")
+        self._credentials = None
+        # 登录公钥缓存，传入None时每次登录都获取并解析公钥
+        self.public_key_cache = kwargs.get("public_key_cache", public_key_cache)
+        # 板块课 head_data 缓存，与当前会话绑定，键为 (学年, 学期[, 板块])
+        self._block_heads = {}
+        # 成绩、考试、课表、学业情况的结果缓存（zfn_cache.ResponseCache），键中包含学号，
+        # 直接传入 cookies 时需同时传入 sid，login 成功后自动设置
+        self.response_cache = kwargs.get("response_cache")
+        self.sid = kwargs.get("sid")
+        # 为True时成绩、考试、课表、已选课程、学业情况中的课程以 __slots__ 记录返回，节省内存
+        self.records = kwargs.get("records", False)
+        # 请求及调用指标（zfn_metrics.Metrics），默认在所有 Client 间共享，传入None关闭
+        self.metrics = kwargs.get("metrics", metrics)
         Client.raspisanie = self.raspisanie
         Client.ignore_type = self.ignore_type
 
@@ -56,12 +191,52 @@ class Client:
         self.headers[
             "Accept"
         ] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3"
-        self.sess = requests.Session()
-        self.sess.keep_alive = False
+        self.sess = MeteredSession(self.metrics, urlsplit(self.base_url or "").netloc)
+        # 连接按主机在所有 Client 间复用，cookies 仍由各自的 Session 隔离
+        pool_registry.mount(self.sess, self.base_url)
         self.cookies = cookies
 
+    @metered
     def login(self, sid, password):
-        """登录教务系统"""
+        """
+        登录教务系统
+        配置了 session_store 时，密码与保存会话时一致则复用已保存的 cookies 而不请求教务系统，
+        之后的查询首次返回1006时才重新登录
+        """
+        if self.session_store is not None:
+            self._credentials = (sid, password)
+            key = self.session_key(self.base_url, sid)
+            cookies = self.stored_cookies(self.session_store.get(key, None), password)
+            if cookies:
+                self.cookies = cookies
+                self.sid = sid
+                return {"code": 1000, "msg": "登录成功", "data": {"cookies": self.cookies}}
+        result = self._login(sid, password)
+        if result["code"] != 1000:
+            self._credentials = None
+        return result
+
+    def _relogin(self):
+        """使用 login 时的账号密码重新登录，成功返回True"""
+        sid, password = self._credentials
+        self.session_store.delete(self.session_key(self.base_url, sid))
+        return self._login(sid, password)["code"] == 1000
+
+    def _logged_in(self, sid, password):
+        """登录成功后保存会话，并清除与旧会话绑定的缓存"""
+        self.sid = sid
+        self._block_heads.clear()
+        if self.session_store is not None:
+            self.session_store.set(
+                self.session_key(self.base_url, sid),
+                self.session_entry(self.cookies, password),
+            )
+
+    def _login(self, sid, password, fresh_key=False):
+        """
+        登录教务系统
+        fresh_key: 忽略缓存的公钥，复用的公钥登录失败后重试时使用
+        """
         need_verify = False
         try:
             # 登录页
@@ -71,18 +246,16 @@ class Client:
             if req_csrf.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
             # 获取csrf_token
-            doc = pq(req_csrf.text)
-            csrf_token = doc("#csrftoken").attr("value")
+            csrf_token = self.get_csrf_token(req_csrf.text)
+            need_kaptcha = self.need_kaptcha(req_csrf.text)
             pre_cookies = self.sess.cookies.get_dict()
-            # 获取publicKey并加密密码
-            req_pubkey = self.sess.get(
-                self.key_url, headers=self.headers, timeout=self.timeout
-            ).json()
-            modulus = req_pubkey["modulus"]
-            exponent = req_pubkey["exponent"]
-            if str(doc("input#yzm")) == "":
+            # 获取publicKey并加密密码，需要验证码时始终重新获取
+            modulus, exponent, cached_key = self._get_public_key(
+                fresh_key or need_kaptcha
+            )
+            if not need_kaptcha:
                 # 不需要验证码
-                encrypt_password = self.encrypt_password(password, modulus, exponent)
+                encrypt_password = self._encrypt_password(password, modulus, exponent)
                 # 登录数据
                 login_data = {
                     "csrftoken": csrf_token,
@@ -96,13 +269,20 @@ class Client:
                     data=login_data,
                     timeout=self.timeout,
                 )
-                doc = pq(req_login.text)
-                tips = doc("p#tips")
-                if str(tips) != "":
-                    if "用户名或密码" in tips.text():
+                tips = self.get_login_tips(req_login.text)
+                if tips is not None:
+                    if cached_key:
+                        # 公钥与会话绑定的系统用错公钥时同样提示用户名或密码不正确，
+                        # 因此复用的公钥登录失败时先重新获取公钥重试一次，新公钥的结果才是最终结果
+                        self.public_key_cache.invalidate(self.base_url)
+                        return self._login(sid, password, fresh_key=True)
+                    if "用户名或密码" in tips:
                         return {"code": 1002, "msg": "用户名或密码不正确"}
-                    return {"code": 998, "msg": tips.text()}
+                    return {"code": 998, "msg": tips}
+                if fresh_key and self.public_key_cache is not None:
+                    self.public_key_cache.mark_session_bound(self.base_url)
                 self.cookies = self.sess.cookies.get_dict()
+                self._logged_in(sid, password)
                 return {"code": 1000, "msg": "登录成功", "data": {"cookies": self.cookies}}
             # 需要验证码，返回相关页面验证信息给用户，TODO: 增加更多验证方式
             need_verify = True
@@ -139,12 +319,36 @@ class Client:
             msg = "获取验证码时未记录的错误" if need_verify else "登录时未记录的错误"
             return {"code": 999, "msg": f"{msg}：{str(e)}"}
 
+    def _get_public_key(self, fresh=False):
+        """返回 (modulus, exponent, 是否来自缓存)"""
+        if self.public_key_cache is not None and not fresh:
+            latest = self.public_key_cache.latest(self.base_url)
+            if latest is not None:
+                return (*latest, True)
+        req_pubkey = self.sess.get(
+            self.key_url, headers=self.headers, timeout=self.timeout
+        ).json()
+        modulus = req_pubkey["modulus"]
+        exponent = req_pubkey["exponent"]
+        if self.public_key_cache is not None:
+            self.public_key_cache.remember(self.base_url, modulus, exponent)
+        return modulus, exponent, False
+
+    def _encrypt_password(self, password, modulus, exponent):
+        if self.public_key_cache is None:
+            return self.encrypt_password(password, modulus, exponent)
+        key = self.public_key_cache.parsed(
+            self.base_url, modulus, exponent, self.parse_public_key
+        )
+        return self.encrypt_password(password, modulus, exponent, key)
+
+    @metered
     def login_with_kaptcha(
         self, sid, csrf_token, cookies, password, modulus, exponent, kaptcha, **kwargs
     ):
         """需要验证码的登陆"""
         try:
-            encrypt_password = self.encrypt_password(password, modulus, exponent)
+            encrypt_password = self._encrypt_password(password, modulus, exponent)
             login_data = {
                 "csrftoken": csrf_token,
                 "yhm": sid,
@@ -161,14 +365,13 @@ class Client:
             if req_login.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
             # 请求登录
-            doc = pq(req_login.text)
-            tips = doc("p#tips")
-            if str(tips) != "":
-                if "验证码" in tips.text():
+            tips = self.get_login_tips(req_login.text)
+            if tips is not None:
+                if "验证码" in tips:
                     return {"code": 1004, "msg": "验证码输入错误"}
-                if "用户名或密码" in tips.text():
+                if "用户名或密码" in tips:
                     return {"code": 1002, "msg": "用户名或密码不正确"}
-                return {"code": 998, "msg": tips.text()}
+                return {"code": 998, "msg": tips}
             self.cookies = self.sess.cookies.get_dict()
             # 不同学校系统兼容差异
             if not self.cookies.get("route") and cookies.get("route"):
@@ -177,8 +380,8 @@ class Client:
                     "route": cookies["route"],
                 }
                 self.cookies = route_cookies
-            else:
-                return {"code": 1000, "msg": "登录成功", "data": {"cookies": self.cookies}}
+            self._logged_in(sid, password)
+            return {"code": 1000, "msg": "登录成功", "data": {"cookies": self.cookies}}
         except exceptions.Timeout:
             return {"code": 1003, "msg": "登录超时"}
         except (
@@ -192,6 +395,8 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": "验证码登录时未记录的错误：" + str(e)}
 
+    @metered
+    @relogin_on_expiry
     def get_info(self):
         """获取个人信息"""
         url = urljoin(self.base_url, "xsxxxggl/xsxxwh_cxCkDgxsxx.html?gnmkdm=N100801")
@@ -204,33 +409,12 @@ class Client:
             )
             if req_info.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_info.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_info):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             info = req_info.json()
             if info is None:
                 return self._get_info()
-            result = {
-                "sid": info.get("xh"),
-                "name": info.get("xm"),
-                "college_name": info.get("zsjg_id", info.get("jg_id")),
-                "major_name": info.get("zszyh_id", info.get("zyh_id")),
-                "class_name": info.get("bh_id", info.get("xjztdm")),
-                "status": info.get("xjztdm"),
-                "enrollment_date": info.get("rxrq"),
-                "candidate_number": info.get("ksh"),
-                "graduation_school": info.get("byzx"),
-                "domicile": info.get("jg"),
-                "postal_code": info.get("yzbm"),
-                "politics_status": info.get("zzmmm"),
-                "nationality": info.get("mzm"),
-                "education": info.get("pyccdm"),
-                "phone_number": info.get("sjhm"),
-                "parents_number": info.get("gddh"),
-                "email": info.get("dzyx"),
-                "birthday": info.get("csrq"),
-                "id_number": info.get("zjhm"),
-            }
+            result = self.format_info(info)
             return {"code": 1000, "msg": "获取个人信息成功", "data": result}
         except exceptions.Timeout:
             return {"code": 1003, "msg": "获取个人信息超时"}
@@ -254,75 +438,17 @@ class Client:
             )
             if req_info.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_info.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_info):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
-            pending_result = {}
-            # 学生基本信息
-            for ul_item in doc.find("div.col-sm-6").items():
-                content = pq(ul_item).find("div.form-group")
-                # key = re.findall(r'^[\u4E00-\u9FA5A-Za-z0-9]+', pq(content).find('label.col-sm-4.control-label').text())[0]
-                key = pq(content).find("label.col-sm-4.control-label").text()
-                value = pq(content).find("div.col-sm-8 p.form-control-static").text()
-                # 到这一步，解析到的数据基本就是一个键值对形式的html数据了，比如"[学号：]:123456"
-                pending_result[key] = value
-            # 学生学籍信息，其他信息，联系方式
-            for ul_item in doc.find("div.col-sm-4").items():
-                content = pq(ul_item).find("div.form-group")
-                key = pq(content).find("label.col-sm-4.control-label").text()
-                value = pq(content).find("div.col-sm-8 p.form-control-static").text()
-                # 到这一步，解析到的数据基本就是一个键值对形式的html数据了，比如"[学号：]:123456"
-                pending_result[key] = value
+            doc = pq(req_info.text)
+            pending_result = self.get_personal_fields(doc)
             if pending_result.get("学号：") == "":
                 return {
                     "code": 1014,
                     "msg": "当前学年学期无学生时盒数据，您可能已经毕业了。\n\n如果是专升本同学，请使用专升本后的新学号登录～",
                 }
-            result = {
-                "sid": pending_result["学号："],
-                "name": pending_result["姓名："],
-                # "birthday": "无" if pending_result.get("出生日期：") == '' else pending_result["出生日期："],
-                # "id_number": "无" if pending_result.get("证件号码：") == '' else pending_result["证件号码："],
-                # "candidate_number": "无" if pending_result.get("考生号：") == '' else pending_result["考生号："],
-                # "status": "无" if pending_result.get("学籍状态：") == '' else pending_result["学籍状态："],
-                # "entry_date": "无" if pending_result.get("入学日期：") == '' else pending_result["入学日期："],
-                # "graduation_school": "无" if pending_result.get("毕业中学：") == '' else pending_result["毕业中学："],
-                "domicile": "无"
-                if pending_result.get("籍贯：") == ""
-                else pending_result["籍贯："],
-                "phone_number": "无"
-                if pending_result.get("手机号码：") == ""
-                else pending_result["手机号码："],
-                "parents_number": "无",
-                "email": "无"
-                if pending_result.get("电子邮箱：") == ""
-                else pending_result["电子邮箱："],
-                "political_status": "无"
-                if pending_result.get("政治面貌：") == ""
-                else pending_result["政治面貌："],
-                "national": "无"
-                if pending_result.get("民族：") == ""
-                else pending_result["民族："],
-                # "education": "无" if pending_result.get("培养层次：") == '' else pending_result["培养层次："],
-                # "postal_code": "无" if pending_result.get("邮政编码：") == '' else pending_result["邮政编码："],
-                # "grade": int(pending_result["学号："][0:4]),
-            }
-            if pending_result.get("学院名称：") is not None:
-                # 如果在个人信息页面获取到了学院班级
-                result.update(
-                    {
-                        "college_name": "无"
-                        if pending_result.get("学院名称：") == ""
-                        else pending_result["学院名称："],
-                        "major_name": "无"
-                        if pending_result.get("专业名称：") == ""
-                        else pending_result["专业名称："],
-                        "class_name": "无"
-                        if pending_result.get("班级名称：") == ""
-                        else pending_result["班级名称："],
-                    }
-                )
-            else:
+            result = self.format_personal_info(pending_result)
+            if pending_result.get("学院名称：") is None:
                 # 如果个人信息页面获取不到学院班级，则此处需要请求另外一个地址以获取学院、专业、班级等信息
                 _url = urljoin(
                     self.base_url,
@@ -338,30 +464,7 @@ class Client:
                 _doc = pq(_req_info.text)
                 if _doc("p.error_title").text() != "无功能权限，":
                     # 通过学生证补办申请入口，来补全部分信息
-                    for ul_item in _doc.find("div.col-sm-6").items():
-                        content = pq(ul_item).find("div.form-group")
-                        key = (
-                            pq(content).find("label.col-sm-4.control-label").text()
-                            + "："
-                        )  # 为了保持格式一致，这里加个冒号
-                        value = (
-                            pq(content).find("div.col-sm-8 label.control-label").text()
-                        )
-                        # 到这一步，解析到的数据基本就是一个键值对形式的html数据了，比如"[学号：]:123456"
-                        pending_result[key] = value
-                    result.update(
-                        {
-                            "college_name": "无"
-                            if pending_result.get("学院：") is None
-                            else pending_result["学院："],
-                            "major_name": "无"
-                            if pending_result.get("专业：") is None
-                            else pending_result["专业："],
-                            "class_name": "无"
-                            if pending_result.get("班级：") is None
-                            else pending_result["班级："],
-                        }
-                    )
+                    result.update(self.format_supplement_info(_doc))
             return {"code": 1000, "msg": "获取个人信息成功", "data": result}
         except exceptions.Timeout:
             return {"code": 1003, "msg": "获取个人信息超时"}
@@ -376,164 +479,153 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": "获取个人信息时未记录的错误：" + str(e)}
 
+    @typed_records(Grade)
+    @cached_response()
+    @metered
+    @relogin_on_expiry
     def get_grade(self, year: int, term: int = 0, use_personal_info: bool = False):
         """
         获取成绩
         use_personal_info: 是否使用获取个人信息接口获取成绩
         """
+        return self._collect_pages(
+            self.iter_grade(year, term, use_personal_info), year, term, "获取成绩成功"
+        )
+
+    def iter_grade(
+        self,
+        year: int,
+        term: int = 0,
+        use_personal_info: bool = False,
+        page_size: int = 100,
+    ):
+        """
+        分页获取成绩，逐页产出，直到取完 totalResult 条
+        每页为 {"code": 1000, "data": {"sid", "name", "page", "total", "courses"}}，出错时产出错误信息后结束
+        """
         url = urljoin(
             self.base_url,
             "cjcx/cjcx_cxDgXscj.html?doType=query&gnmkdm=N305005"
             if use_personal_info
             else "cjcx/cjcx_cxXsgrcj.html?doType=query&gnmkdm=N305005",
         )
-        temp_term = term
-        term = term**2 * 3
-        term = "" if term == 0 else term
-        data = {
-            "xnm": str(year),  # 学年数
-            "xqm": str(term),  # 学期数，第一学期为3，第二学期为12, 整个学年为空''
-            "_search": "false",
-            "nd": int(time.time() * 1000),
-            "queryModel.showCount": "100",  # 每页最多条数
-            "queryModel.currentPage": "1",
-            "queryModel.sortName": "",
-            "queryModel.sortOrder": "asc",
-            "time": "0",  # 查询次数
-        }
-        try:
-            req_grade = self.sess.post(
-                url,
-                headers=self.headers,
-                data=data,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            if req_grade.status_code != 200:
-                return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_grade.text)
-            if doc("h5").text() == "用户登录":
-                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
-            grade = req_grade.json()
-            grade_items = grade.get("items")
-            if not grade_items:
-                return {"code": 1005, "msg": "获取内容为空"}
-            result = {
-                "sid": grade_items[0]["xh"],
-                "name": grade_items[0]["xm"],
-                "year": year,
-                "term": temp_term,
-                "count": len(grade_items),
-                "courses": [
-                    {
-                        "course_id": i.get("kch_id"),
-                        "title": i.get("kcmc"),
-                        "teacher": i.get("jsxm"),
-                        "class_name": i.get("jxbmc"),
-                        "credit": self.align_floats(i.get("xf")),
-                        "category": i.get("kclbmc"),
-                        "nature": i.get("kcxzmc"),
-                        "grade": self.parse_int(i.get("cj")),
-                        "grade_point": self.align_floats(i.get("jd")),
-                        "grade_nature": i.get("ksxz"),
-                        "start_college": i.get("kkbmmc"),
-                        "mark": i.get("kcbj"),
-                    }
-                    for i in grade_items
-                ],
-            }
-            return {"code": 1000, "msg": "获取成绩成功", "data": result}
-        except exceptions.Timeout:
-            return {"code": 1003, "msg": "获取成绩超时"}
-        except (
-            exceptions.RequestException,
-            json.decoder.JSONDecodeError,
-            AttributeError,
-        ):
-            traceback.print_exc()
-            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
-        except Exception as e:
-            traceback.print_exc()
-            return {"code": 999, "msg": "获取成绩时未记录的错误：" + str(e)}
+        yield from self._iter_query_pages(
+            url, year, term, page_size, "成绩", self.format_grade
+        )
 
+    @typed_records(ExamEntry)
+    @cached_response()
+    @metered
+    @relogin_on_expiry
     def get_exam_schedule(self, year: int, term: int = 0):
         """获取考试信息"""
+        return self._collect_pages(
+            self.iter_exam_schedule(year, term), year, term, "获取考试信息成功"
+        )
+
+    def iter_exam_schedule(self, year: int, term: int = 0, page_size: int = 100):
+        """分页获取考试信息，格式同 iter_grade"""
         url = urljoin(
             self.base_url,
             "kwgl/kscx_cxXsksxxIndex.html?doType=query&gnmkdm=N358105",
         )
-        temp_term = term
+        yield from self._iter_query_pages(
+            url, year, term, page_size, "考试信息", self.format_exam
+        )
+
+    def _iter_query_pages(self, url, year, term, page_size, name, format_item):
+        """按 queryModel.currentPage 逐页请求分页查询接口，每页条目经 format_item 转换后产出"""
         term = term**2 * 3
         term = "" if term == 0 else term
-        data = {
-            "xnm": str(year),  # 学年数
-            "xqm": str(term),  # 学期数，第一学期为3，第二学期为12, 整个学年为空''
-            "_search": "false",
-            "nd": int(time.time() * 1000),
-            "queryModel.showCount": "100",  # 每页最多条数
-            "queryModel.currentPage": "1",
-            "queryModel.sortName": "",
-            "queryModel.sortOrder": "asc",
-            "time": "0",  # 查询次数
-        }
+        current_page = 1
+        fetched = 0
         try:
-            req_grade = self.sess.post(
-                url,
-                headers=self.headers,
-                data=data,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            if req_grade.status_code != 200:
-                return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_grade.text)
-            if doc("h5").text() == "用户登录":
-                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
-            grade = req_grade.json()
-            grade_items = grade.get("items")
-            if not grade_items:
-                return {"code": 1005, "msg": "获取内容为空"}
-            result = {
-                "sid": grade_items[0]["xh"],
-                "name": grade_items[0]["xm"],
-                "year": year,
-                "term": temp_term,
-                "count": len(grade_items),
-                "courses": [
-                    {
-                        "course_id": i.get("kch"), # 课程代码
-                        "title": i.get("kcmc"), # 课程名称
-                        "time": i.get("kssj"), # 考试时间
-                        "location": i.get("cdmc"), # 考试地点
-                        "xq": i.get("cdxqmc"), # 考试校区
-                        "zwh": i.get("zwh"), # 考试座号
-                        "cxbj": i.get("cxbj", ""), # 重修标记
-                        "exam_name": i.get("ksmc"), # 考试批次名
-                        "teacher": i.get("jsxx"), # 任课教师(含教师id)
-                        "class_name": i.get("jxbmc"), # 教学班名称
-                        "kkxy": i.get("kkxy"), # 开课学院
-                        "credit": self.align_floats(i.get("xf")), # 课程学分数
-                        "ksfs": i.get("ksfs"), # 考试方式, ep: 笔试 & 开卷 & 机考
-                        "sjbh": i.get("sjbh"), # 试卷编号
-                        "bz": i.get("bz1", ""), # 备注, ep: 免监考班级
-                    }
-                    for i in grade_items
-                ],
-            }
-            return {"code": 1000, "msg": "获取考试信息成功", "data": result}
+            while True:
+                data = {
+                    "xnm": str(year),  # 学年数
+                    "xqm": str(term),  # 学期数，第一学期为3，第二学期为12, 整个学年为空''
+                    "_search": "false",
+                    "nd": int(time.time() * 1000),
+                    "queryModel.showCount": str(page_size),  # 每页最多条数
+                    "queryModel.currentPage": str(current_page),
+                    "queryModel.sortName": "",
+                    "queryModel.sortOrder": "asc",
+                    "time": "0",  # 查询次数
+                }
+                req_page = self.sess.post(
+                    url,
+                    headers=self.headers,
+                    data=data,
+                    cookies=self.cookies,
+                    timeout=self.timeout,
+                )
+                if req_page.status_code != 200:
+                    yield {"code": 2333, "msg": "教务系统挂了"}
+                    return
+                if self.is_login_response(req_page):
+                    yield {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+                    return
+                page = req_page.json()
+                items = page.get("items")
+                if not items:
+                    if current_page == 1:
+                        yield {"code": 1005, "msg": "获取内容为空"}
+                    return
+                fetched += len(items)
+                reported = page.get("totalResult")
+                total = int(reported or fetched)
+                yield {
+                    "code": 1000,
+                    "msg": f"获取{name}成功",
+                    "data": {
+                        "sid": items[0]["xh"],
+                        "name": items[0]["xm"],
+                        "page": current_page,
+                        "total": total,
+                        "courses": [format_item(i) for i in items],
+                    },
+                }
+                # 有的系统会把 showCount 限制在更小的值，有 totalResult 时只按总数判断是否取完
+                if fetched >= total or (not reported and len(items) < page_size):
+                    return
+                current_page += 1
         except exceptions.Timeout:
-            return {"code": 1003, "msg": "获取考试信息超时"}
+            yield {"code": 1003, "msg": f"获取{name}超时"}
         except (
             exceptions.RequestException,
             json.decoder.JSONDecodeError,
             AttributeError,
         ):
             traceback.print_exc()
-            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+            yield {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
         except Exception as e:
             traceback.print_exc()
-            return {"code": 999, "msg": "获取考试信息时未记录的错误：" + str(e)}
+            yield {"code": 999, "msg": f"获取{name}时未记录的错误：" + str(e)}
+
+    @classmethod
+    def _collect_pages(cls, pages, year, term, msg):
+        """将分页结果合并为一次性返回的结构"""
+        result = None
+        for page in pages:
+            if page["code"] != 1000:
+                return page
+            if result is None:
+                result = {
+                    "sid": page["data"]["sid"],
+                    "name": page["data"]["name"],
+                    "year": year,
+                    "term": term,
+                    "count": 0,
+                    "courses": [],
+                }
+            result["courses"].extend(page["data"]["courses"])
+        result["count"] = len(result["courses"])
+        return {"code": 1000, "msg": msg, "data": result}
 
+    @typed_records(ScheduleEntry)
+    @cached_response()
+    @metered
+    @relogin_on_expiry
     def get_schedule(self, year: int, term: int):
         """获取课程表信息"""
         url = urljoin(self.base_url, "kbcx/xskbcx_cxXsKb.html?gnmkdm=N2151")
@@ -550,8 +642,7 @@ class Client:
             )
             if req_schedule.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_schedule.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_schedule):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             schedule = req_schedule.json()
             if not schedule.get("kbList"):
@@ -562,28 +653,7 @@ class Client:
                 "year": year,
                 "term": temp_term,
                 "count": len(schedule["kbList"]),
-                "courses": [
-                    {
-                        "course_id": i.get("kch_id"),
-                        "title": i.get("kcmc"),
-                        "teacher": i.get("xm"),
-                        "class_name": i.get("jxbmc"),
-                        "credit": self.align_floats(i.get("xf")),
-                        "weekday": self.parse_int(i.get("xqj")),
-                        "time": self.display_course_time(i.get("jc")),
-                        "sessions": i.get("jc"),
-                        "list_sessions": self.list_sessions(i.get("jc")),
-                        "weeks": i.get("zcd"),
-                        "list_weeks": self.list_weeks(i.get("zcd")),
-                        "evaluation_mode": i.get("khfsmc"),
-                        "campus": i.get("xqmc"),
-                        "place": i.get("cdmc"),
-                        "hours_composition": i.get("kcxszc"),
-                        "weekly_hours": self.parse_int(i.get("zhxs")),
-                        "total_hours": self.parse_int(i.get("zxs")),
-                    }
-                    for i in schedule["kbList"]
-                ],
+                "courses": [self.format_schedule(i) for i in schedule["kbList"]],
                 "extra_courses": [i.get("qtkcgs") for i in schedule.get("sjkList")],
             }
             result = self.split_merge_display(result)
@@ -601,8 +671,113 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": "获取课表时未记录的错误：" + str(e)}
 
-    def get_academia(self):
-        """获取学业生涯情况"""
+    @metered
+    @relogin_on_expiry
+    def get_empty_classrooms(
+        self,
+        year: int,
+        term: int,
+        week: int,
+        weekday: int,
+        sessions,
+        campus="1",
+        refresh=False,
+    ):
+        """
+        查询空教室
+        sessions: 节次整数、节次列表或 "3-4节" 形式的字符串，返回这些节次均空闲的教室
+        campus: 校区id（xqh_id）
+        首次查询某天时并发获取当天每一节的空闲教室写入位图索引，之后在本地查询
+        """
+        sessions = self.parse_sessions(sessions)
+        key = self.classroom_index.key(self.base_url, year, term, campus)
+        try:
+            if refresh or not self.classroom_index.is_fresh(
+                key, week, weekday, sessions
+            ):
+                day_sessions = list(
+                    range(1, max([len(self.raspisanie) or 12] + sessions) + 1)
+                )
+                day = self._fan_out(
+                    [
+                        partial(
+                            self._get_free_classrooms,
+                            year,
+                            term,
+                            week,
+                            weekday,
+                            session,
+                            campus,
+                        )
+                        for session in day_sessions
+                    ]
+                )
+                if None in day:
+                    return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+                self.classroom_index.update(
+                    key, week, weekday, dict(zip(day_sessions, day))
+                )
+            classrooms = self.classroom_index.query(key, week, weekday, sessions)
+            result = {
+                "year": year,
+                "term": term,
+                "week": week,
+                "weekday": weekday,
+                "sessions": sessions,
+                "campus": campus,
+                "count": len(classrooms),
+                "classrooms": classrooms,
+            }
+            return {"code": 1000, "msg": "获取空教室成功", "data": result}
+        except exceptions.Timeout:
+            return {"code": 1003, "msg": "获取空教室超时"}
+        except (
+            exceptions.RequestException,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取空教室时未记录的错误：" + str(e)}
+
+    def _get_free_classrooms(self, year, term, week, weekday, session, campus):
+        """获取某周某天某一节的全部空闲教室，登录失效时返回None"""
+        url = urljoin(
+            self.base_url, "cdjy/cdjy_cxKxcdlb.html?doType=query&gnmkdm=N2155"
+        )
+        classrooms = []
+        current_page = 1
+        while True:
+            req_classroom = self.sess.post(
+                url,
+                headers=self.headers,
+                data=self.get_classroom_data(
+                    year, term, week, weekday, session, campus, current_page
+                ),
+                cookies=self.cookies,
+                timeout=self.timeout,
+            )
+            req_classroom.raise_for_status()
+            if self.is_login_response(req_classroom):
+                return None
+            page = req_classroom.json()
+            items = page.get("items") or []
+            classrooms.extend(self.format_classroom(i) for i in items)
+            if not items or len(classrooms) >= int(page.get("totalResult") or 0):
+                return classrooms
+            current_page += 1
+
+    @typed_records(AcademiaCourse)
+    @cached_response(ignore=("deadline",))
+    @metered
+    @relogin_on_expiry
+    def get_academia(self, deadline=None):
+        """
+        获取学业生涯情况
+        deadline: 整个调用的截止秒数，默认使用初始化时的 academia_deadline，None 表示不限制
+        """
         url_main = urljoin(
             self.base_url,
             "xsxy/xsxyqk_cxXsxyqkIndex.html?gnmkdm=N105515&layout=default",
@@ -610,6 +785,8 @@ class Client:
         url_info = urljoin(
             self.base_url, "xsxy/xsxyqk_cxJxzxjhxfyqKcxx.html?gnmkdm=N105515"
         )
+        deadline = self.academia_deadline if deadline is None else deadline
+        deadline_at = None if deadline is None else time.monotonic() + deadline
         try:
             req_main = self.sess.get(
                 url_main,
@@ -620,28 +797,44 @@ class Client:
             )
             if req_main.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc_main = pq(req_main.text)
-            if doc_main("h5").text() == "用户登录":
+            if self.is_login_response(req_main):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            doc_main = pq(req_main.text)
             if str(doc_main("div.alert-danger")) != "":
                 return {"code": 998, "msg": doc_main("div.alert-danger").text()}
-            sid = doc_main("form#form input#xh_id").attr("value")
+            sid = doc_main("input#xh_id").attr("value")
             display_statistics = (
                 doc_main("div#alertBox").text().replace(" ", "").replace("\n", "")
             )
-            sid = doc_main("input#xh_id").attr("value")
             statistics = self.get_academia_statistics(display_statistics)
             type_statistics = self.get_academia_type_statistics(req_main.text)
-            details = {}
-            for type in type_statistics.keys():
-                details[type] = self.sess.post(
-                    url_info,
-                    headers=self.headers,
-                    data={"xfyqjd_id": type_statistics[type]["id"]},
-                    cookies=self.cookies,
-                    timeout=self.timeout,
-                    stream=True,
-                ).json()
+            type_list = list(type_statistics.keys())
+            # 各类别的课程列表并发获取，结果按类别原顺序组装
+            detail_list = self._fan_out(
+                [
+                    partial(
+                        self._get_academia_detail, url_info, type_statistics[type]["id"]
+                    )
+                    for type in type_list
+                ],
+                deadline_at,
+            )
+            details = dict(zip(type_list, detail_list))
+            categories = {
+                type: [i.get("KCLBMC") for i in details[type]] for type in type_list
+            }
+            pending = [
+                (type, index, i)
+                for type in type_list
+                if type in self.detail_category_type
+                for index, i in enumerate(details[type])
+            ]
+            fetched = self._fan_out(
+                [partial(self.get_course_category, type, i) for type, _, i in pending],
+                deadline_at,
+            )
+            for (type, index, _), category in zip(pending, fetched):
+                categories[type][index] = category
             result = {
                 "sid": sid,
                 "statistics": statistics,
@@ -650,23 +843,11 @@ class Client:
                         "type": type,
                         "credits": type_statistics[type]["credits"],
                         "courses": [
-                            {
-                                "course_id": i.get("KCH"),
-                                "title": i.get("KCMC"),
-                                "situation": self.parse_int(i.get("XDZT")),
-                                "display_term": self.get_display_term(
-                                    sid, i.get("JYXDXNM"), i.get("JYXDXQMC")
-                                ),
-                                "credit": self.align_floats(i.get("XF")),
-                                "category": self.get_course_category(type, i),
-                                "nature": i.get("KCXZMC"),
-                                "max_grade": self.parse_int(i.get("MAXCJ")),
-                                "grade_point": self.align_floats(i.get("JD")),
-                            }
-                            for i in details[type]
+                            self.format_academia(sid, i, categories[type][index])
+                            for index, i in enumerate(details[type])
                         ],
                     }
-                    for type in type_statistics.keys()
+                    for type in type_list
                     if len(details[type]) > 0
                 ],
             }
@@ -684,8 +865,51 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": "获取学业情况时未记录的错误：" + str(e)}
 
-    def get_academia_pdf(self):
-        """获取学业生涯（学生成绩总表）pdf"""
+    def _get_academia_detail(self, url_info, type_id):
+        """获取学业情况某一类别的课程列表"""
+        return self.sess.post(
+            url_info,
+            headers=self.headers,
+            data={"xfyqjd_id": type_id},
+            cookies=self.cookies,
+            timeout=self.timeout,
+            stream=True,
+        ).json()
+
+    def _fan_out(self, calls, deadline_at=None):
+        """
+        以最多 fan_out 个线程并发执行无参调用，结果按原顺序返回
+        任一调用出错时抛出该异常，超过截止时间时抛出超时
+        """
+        if not calls:
+            return []
+        executor = ThreadPoolExecutor(max_workers=min(self.fan_out, len(calls)))
+        try:
+            # 子请求沿用调用方的 operation 标签
+            futures = [
+                executor.submit(contextvars.copy_context().run, call) for call in calls
+            ]
+            timeout = (
+                None if deadline_at is None else max(deadline_at - time.monotonic(), 0)
+            )
+            done, not_done = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+            for future in done:
+                if future.exception() is not None:
+                    raise future.exception()
+            if not_done:
+                raise exceptions.Timeout("超过截止时间")
+            return [future.result() for future in futures]
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @metered
+    @relogin_on_expiry
+    def get_academia_pdf(self, sink=None, chunk_size=64 * 1024):
+        """
+        获取学业生涯（学生成绩总表）pdf
+        sink 为空时 data 为pdf二进制内容；sink 为文件路径或可写的二进制文件对象时，
+        pdf按 chunk_size 分块写入 sink，data 只含 size（字节数）和 elapsed（秒）
+        """
         url_view = urljoin(self.base_url, "bysxxcx/xscjzbdy_dyXscjzbView.html")
         url_window = urljoin(self.base_url, "bysxxcx/xscjzbdy_dyCjdyszxView.html")
         url_policy = urljoin(self.base_url, "xtgl/bysxxcx/xscjzbdy_cxXsCount.html")
@@ -693,120 +917,55 @@ class Client:
         url_common = urljoin(self.base_url, "common/common_cxJwxtxx.html")
         url_file = urljoin(self.base_url, "bysxxcx/xscjzbdy_dyList.html")
         url_progress = urljoin(self.base_url, "xtgl/progress_cxProgressStatus.html")
-        data = {
-            "gsdygx": "10628-zw-mrgs",
-            "ids": "",
-            "bdykcxzDms": "",
-            "cytjkcxzDms": "",
-            "cytjkclbDms": "",
-            "cytjkcgsDms": "",
-            "bjgbdykcxzDms": "",
-            "bjgbdyxxkcxzDms": "",
-            "djksxmDms": "",
-            "cjbzmcDms": "",
-            "cjdySzxs": "",
-            "wjlx": "pdf",
-        }
+        data = self.get_academia_pdf_data()
+        # 许可、文件类型及文件列表接口均不携带 wjlx
+        del data["wjlx"]
+        post = partial(
+            self.sess.post,
+            headers=self.headers,
+            cookies=self.cookies,
+            timeout=self.timeout,
+        )
 
         try:
-            data_view = {"time": str(round(time.time() * 1000)), "gnmkdm": "N558020"}
-            data_params = data_view
-            del data_params["time"]
+            start = time.perf_counter()
+            data_params = {"gnmkdm": "N558020"}
             # View接口
-            req_view = self.sess.post(
-                url_view,
-                headers=self.headers,
-                data=data_view,
-                params=data_view,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
+            req_view = post(url_view, data=data_params, params=data_params)
             if req_view.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_view.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_view):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
-            # Window接口
-            data_window = {"xh": ""}
-            self.sess.post(
-                url_window,
-                headers=self.headers,
-                data=data_window,
-                params=data_params,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            # 许可接口
-            data_policy = data
-            del data_policy["wjlx"]
-            self.sess.post(
-                url_policy,
-                headers=self.headers,
-                data=data_policy,
-                params=data_params,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            # 文件类型接口
-            data_filetype = data_policy
-            self.sess.post(
-                url_filetype,
-                headers=self.headers,
-                data=data_filetype,
-                params=data_params,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            # Common接口
-            self.sess.post(
-                url_common,
-                headers=self.headers,
-                data=data_params,
-                params=data_params,
-                cookies=self.cookies,
-                timeout=self.timeout,
+            # Window、许可、文件类型、Common接口互不依赖，并发发出
+            self._fan_out(
+                [
+                    partial(post, url_window, data={"xh": ""}, params=data_params),
+                    partial(post, url_policy, data=data, params=data_params),
+                    partial(post, url_filetype, data=data, params=data_params),
+                    partial(post, url_common, data=data_params, params=data_params),
+                ]
             )
             # 获取PDF文件URL
-            req_file = self.sess.post(
-                url_file,
-                headers=self.headers,
-                data=data,
-                params=data_params,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
+            req_file = post(url_file, data=data, params=data_params)
             doc = pq(req_file.text)
             if "错误" in doc("title").text():
                 error = doc("p.error_title").text()
                 return {"code": 998, "msg": error}
-            # 进度接口
+            # 生成PDF文件URL
+            pdf = self.get_pdf_path(req_file.text)
+            # 进度接口完成后在当前线程下载，出错返回时不会留下仍在写入 sink 的线程
             data_progress = {
                 "key": "score_print_processed",
                 "gnmkdm": "N558020",
             }
-            self.sess.post(
-                url_progress,
-                headers=self.headers,
-                data=data_progress,
-                params=data_progress,
-                cookies=self.cookies,
-                timeout=self.timeout,
+            post(url_progress, data=data_progress, params=data_progress)
+            error, result = self._download(
+                urljoin(self.base_url, pdf), sink, chunk_size
             )
-            # 生成PDF文件URL
-            pdf = (
-                req_file.text.replace("#成功", "")
-                .replace('"', "")
-                .replace("/", "\\")
-                .replace("\\\\", "/")
-            )
-            # 下载PDF文件
-            req_pdf = self.sess.get(
-                urljoin(self.base_url, pdf),
-                headers=self.headers,
-                cookies=self.cookies,
-                timeout=self.timeout + 2,
-            )
-            result = req_pdf.content  # 二进制内容
+            if error is not None:
+                return error
+            if sink is not None:
+                result = {"size": result, "elapsed": time.perf_counter() - start}
             return {"code": 1000, "msg": "获取学生成绩总表pdf成功", "data": result}
         except exceptions.Timeout:
             return {"code": 1003, "msg": "获取成绩总表pdf超时"}
@@ -821,36 +980,70 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": "获取成绩总表pdf时未记录的错误：" + str(e)}
 
-    def get_schedule_pdf(self, year: int, term: int, name: str = "导出"):
-        """获取课表pdf"""
+    def _download(self, url, sink, chunk_size):
+        """
+        下载pdf，返回 (错误信息, 内容)，不是pdf时错误信息见 pdf_error
+        sink 为空时内容为二进制，否则分块写入 sink，内容为字节数
+        """
+        if sink is None:
+            resp = self.sess.get(
+                url,
+                headers=self.headers,
+                cookies=self.cookies,
+                timeout=self.timeout + 2,
+            )
+            error = self.pdf_error(
+                resp.status_code,
+                resp.url,
+                resp.headers.get("Content-Type"),
+                resp.content,
+                resp.encoding,
+            )
+            if error is not None:
+                return error, None
+            return None, resp.content
+        with self.sess.get(
+            url,
+            headers=self.headers,
+            cookies=self.cookies,
+            timeout=self.timeout + 2,
+            stream=True,
+        ) as resp:
+            chunks = resp.iter_content(chunk_size)
+            head = self.read_pdf_head(chunks)
+            error = self.pdf_error(
+                resp.status_code,
+                resp.url,
+                resp.headers.get("Content-Type"),
+                head,
+                resp.encoding,
+            )
+            if error is not None:
+                return error, None
+            return None, self.write_chunks(chain([head], chunks), sink)
+
+    @metered
+    @relogin_on_expiry
+    def get_schedule_pdf(
+        self,
+        year: int,
+        term: int,
+        name: str = "导出",
+        sink=None,
+        chunk_size: int = 64 * 1024,
+    ):
+        """
+        获取课表pdf
+        sink 为空时 data 为pdf二进制内容；sink 为文件路径或可写的二进制文件对象时，
+        pdf按 chunk_size 分块写入 sink，data 为 {"size", "elapsed", "file"}，
+        file 为可读的文件对象（路径时为新打开的文件，可直接用于 os.sendfile），由调用方关闭
+        """
         url_policy = urljoin(self.base_url, "kbdy/bjkbdy_cxXnxqsfkz.html")
         url_file = urljoin(self.base_url, "kbcx/xskbcx_cxXsShcPdf.html")
-        origin_term = term
-        term = term**2 * 3
-        data = {
-            "xm": name,
-            "xnm": str(year),
-            "xqm": str(term),
-            "xnmc": f"{year}-{year + 1}",
-            "xqmmc": str(origin_term),
-            "jgmc": "undefined",
-            "xxdm": "",
-            "xszd.sj": "true",
-            "xszd.cd": "true",
-            "xszd.js": "true",
-            "xszd.jszc": "false",
-            "xszd.jxb": "true",
-            "xszd.xkbz": "true",
-            "xszd.kcxszc": "true",
-            "xszd.zhxs": "true",
-            "xszd.zxs": "true",
-            "xszd.khfs": "true",
-            "xszd.xf": "true",
-            "xszd.skfsmc": "false",
-            "kzlx": "dy",
-        }
+        data = self.get_schedule_pdf_data(year, term, name)
 
         try:
+            start = time.perf_counter()
             # 许可接口
             pilicy_params = {"gnmkdm": "N2151"}
             req_policy = self.sess.post(
@@ -863,8 +1056,7 @@ class Client:
             )
             if req_policy.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_policy.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_policy):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             # 获取PDF文件URL
             file_params = {"doType": "table"}
@@ -875,12 +1067,33 @@ class Client:
                 params=file_params,
                 cookies=self.cookies,
                 timeout=self.timeout,
+                stream=sink is not None,
             )
-            doc = pq(req_file.text)
-            if "错误" in doc("title").text():
-                error = doc("p.error_title").text()
-                return {"code": 998, "msg": error}
-            result = req_file.content  # 二进制内容
+            if sink is None:
+                doc = pq(req_file.text)
+                if "错误" in doc("title").text():
+                    error = doc("p.error_title").text()
+                    return {"code": 998, "msg": error}
+                result = req_file.content  # 二进制内容
+                return {"code": 1000, "msg": "获取课程表pdf成功", "data": result}
+            with req_file:
+                chunks = req_file.iter_content(chunk_size)
+                head = self.read_pdf_head(chunks)
+                error = self.pdf_error(
+                    req_file.status_code,
+                    req_file.url,
+                    req_file.headers.get("Content-Type"),
+                    head,
+                    req_file.encoding,
+                )
+                if error is not None:
+                    return error
+                size = self.write_chunks(chain([head], chunks), sink)
+            result = {
+                "size": size,
+                "elapsed": time.perf_counter() - start,
+                "file": self.reopen_sink(sink),
+            }
             return {"code": 1000, "msg": "获取课程表pdf成功", "data": result}
         except exceptions.Timeout:
             return {"code": 1003, "msg": "获取课程表pdf超时"}
@@ -895,38 +1108,27 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": "获取课程表pdf时未记录的错误：" + str(e)}
 
+    @metered
+    @relogin_on_expiry
     def get_notifications(self):
         """获取通知消息"""
         url = urljoin(self.base_url, "xtgl/index_cxDbsy.html?doType=query")
-        data = {
-            "sfyy": "0",  # 是否已阅，未阅未1，已阅为2
-            "flag": "1",
-            "_search": "false",
-            "nd": int(time.time() * 1000),
-            "queryModel.showCount": "1000",  # 最多条数
-            "queryModel.currentPage": "1",  # 当前页数
-            "queryModel.sortName": "cjsj",
-            "queryModel.sortOrder": "desc",  # 时间倒序, asc正序
-            "time": "0",
-        }
         try:
             req_notification = self.sess.post(
                 url,
                 headers=self.headers,
-                data=data,
+                data=self.get_notification_data(1, 1000),
                 cookies=self.cookies,
                 timeout=self.timeout,
             )
             if req_notification.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_notification.text)
-            if doc("h5").text() == "用户登录" or "错误" in doc("title").text():
+            if self.is_login_response(req_notification) or self.is_error_response(
+                req_notification
+            ):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             notifications = req_notification.json()
-            result = [
-                {**self.split_notifications(i), "create_time": i.get("cjsj")}
-                for i in notifications.get("items")
-            ]
+            result = [self.format_notification(i) for i in notifications.get("items")]
             return {"code": 1000, "msg": "获取消息成功", "data": result}
         except exceptions.Timeout:
             return {"code": 1003, "msg": "获取消息超时"}
@@ -941,6 +1143,59 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": "获取消息时未记录的错误：" + str(e)}
 
+    @metered
+    @relogin_on_expiry
+    def sync_notifications(self, watermark=None, page_size=20, max_pages=10):
+        """
+        增量获取通知消息
+        watermark: 上次返回的水位，为空时获取最近 max_pages 页
+        按创建时间倒序小页获取，越过水位即停止，只返回新消息及新的水位
+        """
+        url = urljoin(self.base_url, "xtgl/index_cxDbsy.html?doType=query")
+        items = []
+        complete = False
+        try:
+            for current_page in range(1, max_pages + 1):
+                req_notification = self.sess.post(
+                    url,
+                    headers=self.headers,
+                    data=self.get_notification_data(current_page, page_size),
+                    cookies=self.cookies,
+                    timeout=self.timeout,
+                )
+                if req_notification.status_code != 200:
+                    return {"code": 2333, "msg": "教务系统挂了"}
+                if self.is_login_response(req_notification) or self.is_error_response(
+                    req_notification
+                ):
+                    return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+                page = req_notification.json().get("items") or []
+                fresh, crossed = self.filter_new_notifications(page, watermark)
+                items.extend(fresh)
+                if crossed or len(page) < page_size:
+                    complete = True
+                    break
+            return {
+                "code": 1000,
+                "msg": "获取新消息成功",
+                "data": self.format_notification_sync(items, watermark, complete),
+            }
+        except exceptions.Timeout:
+            return {"code": 1003, "msg": "获取消息超时"}
+        except (
+            exceptions.RequestException,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取消息时未记录的错误：" + str(e)}
+
+    @typed_records(SelectedCourse)
+    @metered
+    @relogin_on_expiry
     def get_selected_courses(self, year: int, term: int):
         """获取已选课程信息"""
         try:
@@ -960,33 +1215,14 @@ class Client:
             )
             if req_selected.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_selected.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_selected):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             selected = req_selected.json()
             result = {
                 "year": year,
                 "term": temp_term,
                 "count": len(selected),
-                "courses": [
-                    {
-                        "course_id": i.get("kch"),
-                        "class_id": i.get("jxb_id"),
-                        "do_id": i.get("do_jxb_id"),
-                        "title": i.get("kcmc"),
-                        "teacher_id": (re.findall(r"(.*?\d+)/", i.get("jsxx")))[0],
-                        "teacher": (re.findall(r"/(.*?)/", i.get("jsxx")))[0],
-                        "credit": float(i.get("xf", 0)),
-                        "category": i.get("kklxmc"),
-                        "capacity": int(i.get("jxbrs", 0)),
-                        "selected_number": int(i.get("yxzrs", 0)),
-                        "place": self.get_place(i.get("jxdd")),
-                        "time": self.get_course_time(i.get("sksj")),
-                        "optional": int(i.get("zixf", 0)),
-                        "waiting": i.get("sxbj"),
-                    }
-                    for i in selected
-                ],
+                "courses": [self.format_selected(i) for i in selected],
             }
             return {"code": 1000, "msg": "获取已选课程成功", "data": result}
         except exceptions.Timeout:
@@ -1002,6 +1238,8 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": f"获取已选课程时未记录的错误：{str(e)}"}    
 
+    @metered
+    @relogin_on_expiry
     def get_selected_courses2(self, year: int = 0, term: int = 0):
         """获取已选课程信息2"""
         try:
@@ -1034,26 +1272,14 @@ class Client:
             )
             if req_selected.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_selected.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_selected):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             selected = req_selected.json()
             result = {
                 "year": year,
                 "term": temp_term,
                 "count": len(selected["items"]),
-                "courses": [
-                    {
-                        "course_id": i.get("kch"),
-                        "class_id": i.get("jxb_id"),
-                        "title": i.get("kcmc"),
-                        "credit": float(i.get("xf", 0)),
-                        "teacher": i.get("jsxm"),
-                        "category": i.get("kclbmc"),
-                        "place": i.get("jxdd"),
-                    }
-                    for i in selected["items"]
-                ],
+                "courses": [self.format_selected2(i) for i in selected["items"]],
             }
             return {"code": 1000, "msg": "获取已选课程2成功", "data": result}
         except exceptions.Timeout:
@@ -1072,163 +1298,69 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": f"获取已选课程2时未记录的错误：{str(e)}"}
 
-    def get_block_courses(self, year: int, term: int, block: int):
-        """获取板块课选课列表"""
-        # TODO: 优化代码
+    @metered
+    @relogin_on_expiry
+    def get_block_courses(self, year: int, term: int, block: int, page_size: int = 10):
+        """
+        获取板块课选课列表
+        head_data 按学期缓存在当前会话中，选课轮次变化后可调用 clear_block_cache 重新获取
+        """
         try:
-            # 获取head_data
-            url_head = urljoin(
-                self.base_url,
-                "xsxk/zzxkyzb_cxZzxkYzbIndex.html?gnmkdm=N253512&layout=default",
+            error, head_data = self._get_block_head(year, term)
+            if error is not None:
+                return error
+            error, courses = self._get_block_courses(
+                head_data, year, term, block, page_size
             )
-            req_head_data = self.sess.get(
-                url_head,
-                headers=self.headers,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            if req_head_data.status_code != 200:
-                return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_head_data.text)
-            if doc("h5").text() == "用户登录":
-                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
-            if str(doc("div.nodata")) != "":
-                return {"code": 998, "msg": doc("div.nodata").text()}
-            got_credit_list = [i for i in doc("font[color='red']").items()]
-            if len(got_credit_list) == 0:
+            if error is not None:
+                return error
+            if not courses:
                 return {"code": 1005, "msg": "板块课内容为空"}
-            head_data = {"got_credit": got_credit_list[2].string}
-
-            kklxdm_list = []
-            xkkz_id_list = []
-            for tab_content in doc("a[role='tab']").items():
-                onclick_content = tab_content.attr("onclick")
-                r = re.findall(r"'(.*?)'", str(onclick_content))
-                kklxdm_list.append(r[0].strip())
-                xkkz_id_list.append(r[1].strip())
-            head_data["bkk1_kklxdm"] = kklxdm_list[0]
-            head_data["bkk2_kklxdm"] = kklxdm_list[1]
-            head_data["bkk3_kklxdm"] = kklxdm_list[2]
-            head_data["bkk1_xkkz_id"] = xkkz_id_list[0]
-            head_data["bkk2_xkkz_id"] = xkkz_id_list[1]
-            head_data["bkk3_xkkz_id"] = xkkz_id_list[2]
-
-            for head_data_content in doc("input[type='hidden']"):
-                name = head_data_content.attr("name")
-                value = head_data_content.attr("value")
-                head_data[str(name)] = str(value)
-
-            url_display = urljoin(
-                self.base_url, "xsxk/zzxkyzb_cxZzxkYzbDisplay.html?gnmkdm=N253512"
-            )
-            display_req_data = {
-                "xkkz_id": head_data[f"bkk{block}_xkkz_id"],
-                "xszxzt": "1",
-                "kspage": "0",
-            }
-            req_display_data = self.sess.post(
-                url_display,
-                headers=self.headers,
-                data=display_req_data,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            doc_display = pq(req_display_data.text)
-            display_data = {}
-            for display_data_content in doc_display("input[type='hidden']").items():
-                name = display_data_content.get("name")
-                value = display_data_content.get("value")
-                display_data[str(name)] = str(value)
-            head_data.update(display_data)
-
-            # 获取课程列表
-            url_kch = urljoin(
-                self.base_url, "xsxk/zzxkyzb_cxZzxkYzbPartDisplay.html?gnmkdm=N253512"
-            )
-            url_bkk = urljoin(
-                self.base_url, "xsxk/zzxkyzb_cxJxbWithKchZzxkYzb.html?gnmkdm=N253512"
-            )
-            term = term**2 * 3
-            kch_data = {
-                "bklx_id": head_data["bklx_id"],
-                "xqh_id": head_data["xqh_id"],
-                "zyfx_id": head_data["zyfx_id"],
-                "njdm_id": head_data["njdm_id"],
-                "bh_id": head_data["bh_id"],
-                "xbm": head_data["xbm"],
-                "xslbdm": head_data["xslbdm"],
-                "ccdm": head_data["ccdm"],
-                "xsbj": head_data["xsbj"],
-                "xkxnm": str(year),
-                "xkxqm": str(term),
-                "kklxdm": head_data[f"bkk{block}_kklxdm"],
-                "kkbk": head_data["kkbk"],
-                "rwlx": head_data["rwlx"],
-                "kspage": "1",
-                "jspage": "10",
-            }
-            kch_res = self.sess.post(
-                url_kch,
-                headers=self.headers,
-                data=kch_data,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            jkch_res = kch_res.json()
-            bkk_data = {
-                "bklx_id": head_data["bklx_id"],
-                "xkxnm": str(year),
-                "xkxqm": str(term),
-                "xkkz_id": head_data[f"bkk{block}_xkkz_id"],
-                "xqh_id": head_data["xqh_id"],
-                "zyfx_id": head_data["zyfx_id"],
-                "njdm_id": head_data["njdm_id"],
-                "bh_id": head_data["bh_id"],
-                "xbm": head_data["xbm"],
-                "xslbdm": head_data["xslbdm"],
-                "ccdm": head_data["ccdm"],
-                "xsbj": head_data["xsbj"],
-                "kklxdm": head_data[f"bkk{block}_kklxdm"],
-                "kch_id": jkch_res["tmpList"][0]["kch_id"],
-                "kkbk": head_data["kkbk"],
-                "rwlx": head_data["rwlx"],
-                "zyh_id": head_data["zyh_id"],
-            }
-            bkk_res = self.sess.post(
-                url_bkk,
-                headers=self.headers,
-                data=bkk_data,
-                cookies=self.cookies,
-                timeout=self.timeout,
-            )
-            jbkk_res = bkk_res.json()
-            if block != 3 and (len(jkch_res["tmpList"]) != len(jbkk_res)):
-                return {"code": 999, "msg": "板块课编号及长度错误"}
-            temp_list = jkch_res["tmpList"]
-            block_list = jbkk_res
-            for i in range(len(temp_list)):
-                temp_list[i].update(block_list[i])
+            result = {"count": len(courses), "courses": courses}
+            return {"code": 1000, "msg": "获取板块课信息成功", "data": result}
+        except exceptions.Timeout:
+            return {"code": 1003, "msg": "获取板块课信息超时"}
+        except (
+            exceptions.RequestException,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"获取板块课信息时未记录的错误：{str(e)}"}
 
-            result = {
-                "count": len(temp_list),
-                "courses": [
+    @metered
+    @relogin_on_expiry
+    def get_all_block_courses(self, year: int, term: int, page_size: int = 10):
+        """并发获取所有板块的选课列表"""
+        try:
+            error, head_data = self._get_block_head(year, term)
+            if error is not None:
+                return error
+            blocks = self.list_blocks(head_data)
+            fetched = self._fan_out(
+                [
+                    partial(
+                        self._get_block_courses, head_data, year, term, block, page_size
+                    )
+                    for block in blocks
+                ]
+            )
+            result = {"count": 0, "blocks": []}
+            for block, (error, courses) in zip(blocks, fetched):
+                if error is not None:
+                    return error
+                result["count"] += len(courses)
+                result["blocks"].append(
                     {
-                        "course_id": j["kch_id"],
-                        "class_id": j.get("jxb_id"),
-                        "do_id": j.get("do_jxb_id"),
-                        "title": j.get("kcmc"),
-                        "teacher_id": (re.findall(r"(.*?\d+)/", j.get("jsxx")))[0],
-                        "teacher": (re.findall(r"/(.*?)/", j.get("jsxx")))[0],
-                        "credit": float(j.get("xf"), 0),
+                        "block": block,
                         "kklxdm": head_data[f"bkk{block}_kklxdm"],
-                        "capacity": int(i.get("jxbrl", 0)),
-                        "selected_number": int(i.get("yxzrs", 0)),
-                        "place": self.get_place(i.get("jxdd")),
-                        "time": self.get_course_time(i.get("sksj")),
+                        "count": len(courses),
+                        "courses": courses,
                     }
-                    for j in temp_list
-                ],
-            }
+                )
             return {"code": 1000, "msg": "获取板块课信息成功", "data": result}
         except exceptions.Timeout:
             return {"code": 1003, "msg": "获取板块课信息超时"}
@@ -1243,6 +1375,167 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": f"获取板块课信息时未记录的错误：{str(e)}"}
 
+    @metered
+    @relogin_on_expiry
+    def get_block_classes(self, year: int, term: int, block: int, course_id: str):
+        """获取板块课中某门课程的教学班列表（含已选人数），只请求 JxbWithKch 接口"""
+        try:
+            error, head_data = self._get_block_head(year, term)
+            if error is not None:
+                return error
+            head_data = self._get_block_display(head_data, year, term, block)
+            classes = self._get_block_classes(head_data, year, term, block, course_id)
+            if classes is None:
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            kklxdm = head_data[f"bkk{block}_kklxdm"]
+            result = {
+                "count": len(classes),
+                "classes": [
+                    self.format_block({**j, "kch_id": course_id}, kklxdm)
+                    for j in classes
+                ],
+            }
+            return {"code": 1000, "msg": "获取教学班信息成功", "data": result}
+        except exceptions.Timeout:
+            return {"code": 1003, "msg": "获取教学班信息超时"}
+        except (
+            exceptions.RequestException,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"获取教学班信息时未记录的错误：{str(e)}"}
+
+    def _get_block_classes(self, head_data, year, term, block, kch_id):
+        """JxbWithKch 接口返回的教学班列表，登录失效时返回None"""
+        url_bkk = urljoin(
+            self.base_url, "xsxk/zzxkyzb_cxJxbWithKchZzxkYzb.html?gnmkdm=N253512"
+        )
+        bkk_res = self.sess.post(
+            url_bkk,
+            headers=self.headers,
+            data=self.get_block_bkk_data(head_data, year, term, block, kch_id),
+            cookies=self.cookies,
+            timeout=self.timeout,
+        )
+        if self.is_login_response(bkk_res):
+            return None
+        return bkk_res.json()
+
+    def clear_block_cache(self):
+        """清除缓存的板块课 head_data"""
+        self._block_heads.clear()
+
+    def _get_block_head(self, year, term):
+        """获取自主选课首页的 head_data，返回 (错误结果, head_data)"""
+        head_data = self._block_heads.get((year, term))
+        if head_data is not None:
+            return None, head_data
+        url_head = urljoin(
+            self.base_url,
+            "xsxk/zzxkyzb_cxZzxkYzbIndex.html?gnmkdm=N253512&layout=default",
+        )
+        req_head_data = self.sess.get(
+            url_head,
+            headers=self.headers,
+            cookies=self.cookies,
+            timeout=self.timeout,
+        )
+        if req_head_data.status_code != 200:
+            return {"code": 2333, "msg": "教务系统挂了"}, None
+        if self.is_login_response(req_head_data):
+            return {"code": 1006, "msg": "未登录或已过期，请重新登录"}, None
+        doc = pq(req_head_data.text)
+        if str(doc("div.nodata")) != "":
+            return {"code": 998, "msg": doc("div.nodata").text()}, None
+        head_data = self.get_block_head_data(doc)
+        if head_data is None:
+            return {"code": 1005, "msg": "板块课内容为空"}, None
+        self._block_heads[(year, term)] = head_data
+        return None, head_data
+
+    def _get_block_display(self, head_data, year, term, block):
+        """获取某一板块的 head_data（首页数据加上板块页面的隐藏字段）"""
+        block_head = self._block_heads.get((year, term, block))
+        if block_head is not None:
+            return block_head
+        url_display = urljoin(
+            self.base_url, "xsxk/zzxkyzb_cxZzxkYzbDisplay.html?gnmkdm=N253512"
+        )
+        display_req_data = {
+            "xkkz_id": head_data[f"bkk{block}_xkkz_id"],
+            "xszxzt": "1",
+            "kspage": "0",
+        }
+        req_display_data = self.sess.post(
+            url_display,
+            headers=self.headers,
+            data=display_req_data,
+            cookies=self.cookies,
+            timeout=self.timeout,
+        )
+        block_head = {
+            **head_data,
+            **self.get_hidden_inputs(pq(req_display_data.text)),
+        }
+        self._block_heads[(year, term, block)] = block_head
+        return block_head
+
+    def _get_block_courses(
+        self, head_data, year, term, block, page_size=10, max_pages=100
+    ):
+        """
+        按 kspage/jspage 翻页获取某一板块的全部课程，返回 (错误结果, 课程列表)
+        教务系统忽略翻页参数时每次返回相同的课程，与上一页课程号相同或达到 max_pages 时停止
+        """
+        url_kch = urljoin(
+            self.base_url, "xsxk/zzxkyzb_cxZzxkYzbPartDisplay.html?gnmkdm=N253512"
+        )
+        head_data = self._get_block_display(head_data, year, term, block)
+        temp_list = []
+        previous = None
+        start = 1
+        for _ in range(max_pages):
+            kch_res = self.sess.post(
+                url_kch,
+                headers=self.headers,
+                data=self.get_block_kch_data(
+                    head_data, year, term, block, start, start + page_size - 1
+                ),
+                cookies=self.cookies,
+                timeout=self.timeout,
+            )
+            if self.is_login_response(kch_res):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}, None
+            page = kch_res.json()["tmpList"]
+            kch_ids = [item["kch_id"] for item in page]
+            if kch_ids == previous:
+                break
+            previous = kch_ids
+            temp_list.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+        # 教学班详情按课程号获取，同一课程号的行与返回的教学班按顺序对应
+        rows = {}
+        for item in temp_list:
+            rows.setdefault(item["kch_id"], []).append(item)
+        for kch_id, items in rows.items():
+            jbkk_res = self._get_block_classes(head_data, year, term, block, kch_id)
+            if jbkk_res is None:
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}, None
+            if block != 3 and len(items) != len(jbkk_res):
+                return {"code": 999, "msg": "板块课编号及长度错误"}, None
+            for item, detail in zip(items, jbkk_res):
+                item.update(detail)
+        kklxdm = head_data[f"bkk{block}_kklxdm"]
+        return None, [self.format_block(j, kklxdm) for j in temp_list]
+
+    @metered
+    @relogin_on_expiry
     def select_course(
         self,
         sid: str,
@@ -1257,25 +1550,9 @@ class Client:
             url_select = urljoin(
                 self.base_url, "xsxk/zzxkyzb_xkBcZyZzxkYzb.html?gnmkdm=N253512"
             )
-            term = term**2 * 3
-            select_data = {
-                "jxb_ids": do_id,
-                "kch_id": course_id,
-                # 'rwlx': '3',
-                # 'rlkz': '0',
-                # 'rlzlkz': '1',
-                # 'sxbj': '1',
-                # 'xxkbj': '0',
-                # 'cxbj': '0',
-                "qz": "0",
-                # 'xkkz_id': '9B247F4EFD6291B9E055000000000001',
-                "xkxnm": str(year),
-                "xkxqm": str(term),
-                "njdm_id": str(sid[0:2]),
-                "zyh_id": str(sid[2:6]),
-                "kklxdm": str(kklxdm),
-                # 'xklc': '1',
-            }
+            select_data = self.get_select_data(
+                sid, course_id, do_id, kklxdm, year, term
+            )
             req_select = self.sess.post(
                 url_select,
                 headers=self.headers,
@@ -1285,8 +1562,7 @@ class Client:
             )
             if req_select.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_select.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_select):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             result = req_select.json()
             return {"code": 1000, "msg": "选课成功", "data": result}
@@ -1303,6 +1579,8 @@ class Client:
             traceback.print_exc()
             return {"code": 999, "msg": f"选课时未记录的错误：{str(e)}"}
 
+    @metered
+    @relogin_on_expiry
     def cancel_course(self, do_id: str, course_id: str, year: int, term: int):
         """取消选课"""
         try:
@@ -1325,8 +1603,7 @@ class Client:
             )
             if req_cancel.status_code != 200:
                 return {"code": 2333, "msg": "教务系统挂了"}
-            doc = pq(req_cancel.text)
-            if doc("h5").text() == "用户登录":
+            if self.is_login_response(req_cancel):
                 return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
             result = {"status": re.findall(r"(\d+)", req_cancel.text)[0]}
             return {"code": 1000, "msg": "退课成功", "data": result}
@@ -1345,6 +1622,8 @@ class Client:
 
     # ============= utils =================
 
+    @metered
+    @relogin_on_expiry
     def get_gpa(self):
         """获取GPA"""
         url = urljoin(
@@ -1357,9 +1636,9 @@ class Client:
             cookies=self.cookies,
             timeout=self.timeout,
         )
-        doc = pq(req_gpa.text)
-        if doc("h5").text() == "用户登录":
+        if self.is_login_response(req_gpa):
             return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+        doc = pq(req_gpa.text)
         allc_str = [allc.text() for allc in doc("font[size='2px']").items()]
         try:
             gpa = float(allc_str[2])
@@ -1368,20 +1647,62 @@ class Client:
             return "init"
 
     def get_course_category(self, type, item):
-        """根据课程号获取类别"""
+        """根据课程号获取类别，结果在所有 Client 间按 (base_url, 课程号) 共享缓存"""
         if type not in self.detail_category_type:
             return item.get("KCLBMC")
         if not item.get("KCH"):
             return None
-        url = urljoin(self.base_url, f"jxjhgl/common_cxKcJbxx.html?id={item['KCH']}")
+        if self.category_cache is None:
+            return self._get_course_category(item["KCH"])
+        return self.category_cache.get_or_fetch(
+            self.base_url, item["KCH"], partial(self._get_course_category, item["KCH"])
+        )
+
+    def _get_course_category(self, kch):
+        url = urljoin(self.base_url, f"jxjhgl/common_cxKcJbxx.html?id={kch}")
         req_category = self.sess.get(
             url,
             headers=self.headers,
             cookies=self.cookies,
             timeout=self.timeout,
         )
-        doc = pq(req_category.text)
-        ths = doc("th")
+        return self.parse_course_category(req_category.text)
+
+    @classmethod
+    def session_key(cls, base_url, sid):
+        return f"{base_url}\t{sid}"
+
+    @classmethod
+    def hash_password(cls, password, salt):
+        """会话存储中用于校验密码的加盐哈希，不保存密码本身"""
+        return hashlib.pbkdf2_hmac(
+            "sha256", password.encode(), bytes.fromhex(salt), 100_000
+        ).hex()
+
+    @classmethod
+    def session_entry(cls, cookies, password):
+        """会话存储中保存的条目：cookies 及登录密码的加盐哈希"""
+        salt = os.urandom(16).hex()
+        return {
+            "cookies": cookies,
+            "salt": salt,
+            "password_hash": cls.hash_password(password, salt),
+        }
+
+    @classmethod
+    def stored_cookies(cls, entry, password):
+        """密码与保存时一致才返回条目中的 cookies，否则返回None"""
+        if not isinstance(entry, dict) or "password_hash" not in entry:
+            return None
+        password_hash = cls.hash_password(password, entry["salt"])
+        if not hmac.compare_digest(password_hash, entry["password_hash"]):
+            return None
+        return entry["cookies"]
+
+    @classmethod
+    def parse_course_category(cls, content):
+        """从课程基本信息页面中解析课程类别"""
+        ths = pq(content)("th")
         try:
             data_list = [(th.text).strip() for th in ths]
             return data_list[6]
@@ -1389,16 +1710,654 @@ class Client:
             return None
 
     @classmethod
-    def encrypt_password(cls, pwd, n, e):
-        """对密码base64编码"""
+    def get_csrf_token(cls, text):
+        """从登录页提取csrftoken，不构建完整 DOM"""
+        match = re.search(r"<input[^>]*?id=[\"']csrftoken[\"'][^>]*>", text)
+        if match is None:
+            return pq(text)("#csrftoken").attr("value")
+        value = re.search(r"value=[\"']([^\"']*)", match.group(0))
+        return value.group(1) if value else None
+
+    @classmethod
+    def need_kaptcha(cls, text):
+        """登录页是否有验证码输入框 input#yzm"""
+        return re.search(r"<input[^>]*?id=[\"']yzm[\"']", text) is not None
+
+    @classmethod
+    def get_login_tips(cls, text):
+        """登录结果页的 p#tips 提示文本，不存在时返回None"""
+        match = re.search(r"<p[^>]*?id=[\"']tips[\"'][^>]*>(.*?)</p>", text, re.S)
+        if match is None:
+            return None
+        text = html.unescape(re.sub(r"<[^>]+>", " ", match.group(1)))
+        return " ".join(text.split())
+
+    @classmethod
+    def is_html(cls, content_type, content):
+        """根据响应体首字节及Content-Type判断是否为HTML，教务系统的JSON也常以text/html返回"""
+        head = content[:64].lstrip(b"\xef\xbb\xbf \t\r\n")
+        if head[:1] in (b"{", b"[", b'"'):
+            return False
+        if head[:1] == b"<":
+            return True
+        return "html" in (content_type or "")
+
+    @classmethod
+    def is_login_page(cls, url, content_type, content):
+        """
+        判断响应是否为登录页，即cookies已失效
+        依次根据跳转后的URL、响应体类型和关键字判断，只有疑似登录页的HTML才构建DOM
+        """
+        if url and "login_slogin.html" in url:
+            return True
+        if not content or not cls.is_html(content_type, content):
+            return False
+        text = content.decode("utf-8", "replace")
+        if "用户登录" not in text:
+            return False
+        return pq(text)("h5").text() == "用户登录"
+
+    @classmethod
+    def is_error_page(cls, content_type, content):
+        """判断响应是否为教务系统错误页"""
+        if not content or not cls.is_html(content_type, content):
+            return False
+        text = content.decode("utf-8", "replace")
+        if "错误" not in text:
+            return False
+        return "错误" in pq(text)("title").text()
+
+    @classmethod
+    def is_login_response(cls, resp):
+        return cls.is_login_page(
+            resp.url, resp.headers.get("Content-Type"), resp.content
+        )
+
+    @classmethod
+    def is_error_response(cls, resp):
+        return cls.is_error_page(resp.headers.get("Content-Type"), resp.content)
+
+    @classmethod
+    def format_info(cls, info):
+        """个人信息接口数据转换"""
+        return {
+            "sid": info.get("xh"),
+            "name": info.get("xm"),
+            "college_name": info.get("zsjg_id", info.get("jg_id")),
+            "major_name": info.get("zszyh_id", info.get("zyh_id")),
+            "class_name": info.get("bh_id", info.get("xjztdm")),
+            "status": info.get("xjztdm"),
+            "enrollment_date": info.get("rxrq"),
+            "candidate_number": info.get("ksh"),
+            "graduation_school": info.get("byzx"),
+            "domicile": info.get("jg"),
+            "postal_code": info.get("yzbm"),
+            "politics_status": info.get("zzmmm"),
+            "nationality": info.get("mzm"),
+            "education": info.get("pyccdm"),
+            "phone_number": info.get("sjhm"),
+            "parents_number": info.get("gddh"),
+            "email": info.get("dzyx"),
+            "birthday": info.get("csrq"),
+            "id_number": info.get("zjhm"),
+        }
+
+    @classmethod
+    def get_personal_fields(cls, doc):
+        """解析个人信息页面的键值对"""
+        pending_result = {}
+        # 学生基本信息；学生学籍信息，其他信息，联系方式
+        for selector in ("div.col-sm-6", "div.col-sm-4"):
+            for ul_item in doc.find(selector).items():
+                content = pq(ul_item).find("div.form-group")
+                key = pq(content).find("label.col-sm-4.control-label").text()
+                value = pq(content).find("div.col-sm-8 p.form-control-static").text()
+                # 到这一步，解析到的数据基本就是一个键值对形式的html数据了，比如"[学号：]:123456"
+                pending_result[key] = value
+        return pending_result
+
+    @classmethod
+    def format_personal_info(cls, pending_result):
+        """个人信息页面数据转换"""
+        result = {
+            "sid": pending_result["学号："],
+            "name": pending_result["姓名："],
+            # "birthday": "无" if pending_result.get("出生日期：") == '' else pending_result["出生日期："],
+            # "id_number": "无" if pending_result.get("证件号码：") == '' else pending_result["证件号码："],
+            # "candidate_number": "无" if pending_result.get("考生号：") == '' else pending_result["考生号："],
+            # "status": "无" if pending_result.get("学籍状态：") == '' else pending_result["学籍状态："],
+            # "entry_date": "无" if pending_result.get("入学日期：") == '' else pending_result["入学日期："],
+            # "graduation_school": "无" if pending_result.get("毕业中学：") == '' else pending_result["毕业中学："],
+            "domicile": "无"
+            if pending_result.get("籍贯：") == ""
+            else pending_result["籍贯："],
+            "phone_number": "无"
+            if pending_result.get("手机号码：") == ""
+            else pending_result["手机号码："],
+            "parents_number": "无",
+            "email": "无"
+            if pending_result.get("电子邮箱：") == ""
+            else pending_result["电子邮箱："],
+            "political_status": "无"
+            if pending_result.get("政治面貌：") == ""
+            else pending_result["政治面貌："],
+            "national": "无"
+            if pending_result.get("民族：") == ""
+            else pending_result["民族："],
+            # "education": "无" if pending_result.get("培养层次：") == '' else pending_result["培养层次："],
+            # "postal_code": "无" if pending_result.get("邮政编码：") == '' else pending_result["邮政编码："],
+            # "grade": int(pending_result["学号："][0:4]),
+        }
+        if pending_result.get("学院名称：") is not None:
+            # 如果在个人信息页面获取到了学院班级
+            result.update(
+                {
+                    "college_name": "无"
+                    if pending_result.get("学院名称：") == ""
+                    else pending_result["学院名称："],
+                    "major_name": "无"
+                    if pending_result.get("专业名称：") == ""
+                    else pending_result["专业名称："],
+                    "class_name": "无"
+                    if pending_result.get("班级名称：") == ""
+                    else pending_result["班级名称："],
+                }
+            )
+        return result
+
+    @classmethod
+    def format_supplement_info(cls, doc):
+        """从学生证补办申请页面补全学院、专业、班级"""
+        pending_result = {}
+        for ul_item in doc.find("div.col-sm-6").items():
+            content = pq(ul_item).find("div.form-group")
+            key = (
+                pq(content).find("label.col-sm-4.control-label").text() + "："
+            )  # 为了保持格式一致，这里加个冒号
+            value = pq(content).find("div.col-sm-8 label.control-label").text()
+            pending_result[key] = value
+        return {
+            "college_name": "无"
+            if pending_result.get("学院：") is None
+            else pending_result["学院："],
+            "major_name": "无"
+            if pending_result.get("专业：") is None
+            else pending_result["专业："],
+            "class_name": "无"
+            if pending_result.get("班级：") is None
+            else pending_result["班级："],
+        }
+
+    @classmethod
+    def format_grade(cls, i):
+        """成绩条目转换"""
+        return {
+            "course_id": i.get("kch_id"),
+            "title": i.get("kcmc"),
+            "teacher": i.get("jsxm"),
+            "class_name": i.get("jxbmc"),
+            "credit": cls.align_floats(i.get("xf")),
+            "category": i.get("kclbmc"),
+            "nature": i.get("kcxzmc"),
+            "grade": cls.parse_int(i.get("cj")),
+            "grade_point": cls.align_floats(i.get("jd")),
+            "grade_nature": i.get("ksxz"),
+            "start_college": i.get("kkbmmc"),
+            "mark": i.get("kcbj"),
+        }
+
+    @classmethod
+    def format_exam(cls, i):
+        """考试信息条目转换"""
+        return {
+            "course_id": i.get("kch"),  # 课程代码
+            "title": i.get("kcmc"),  # 课程名称
+            "time": i.get("kssj"),  # 考试时间
+            "location": i.get("cdmc"),  # 考试地点
+            "xq": i.get("cdxqmc"),  # 考试校区
+            "zwh": i.get("zwh"),  # 考试座号
+            "cxbj": i.get("cxbj", ""),  # 重修标记
+            "exam_name": i.get("ksmc"),  # 考试批次名
+            "teacher": i.get("jsxx"),  # 任课教师(含教师id)
+            "class_name": i.get("jxbmc"),  # 教学班名称
+            "kkxy": i.get("kkxy"),  # 开课学院
+            "credit": cls.align_floats(i.get("xf")),  # 课程学分数
+            "ksfs": i.get("ksfs"),  # 考试方式, ep: 笔试 & 开卷 & 机考
+            "sjbh": i.get("sjbh"),  # 试卷编号
+            "bz": i.get("bz1", ""),  # 备注, ep: 免监考班级
+        }
+
+    @classmethod
+    def format_schedule(cls, i):
+        """课表条目转换"""
+        return {
+            "course_id": i.get("kch_id"),
+            "title": i.get("kcmc"),
+            "teacher": i.get("xm"),
+            "class_name": i.get("jxbmc"),
+            "credit": cls.align_floats(i.get("xf")),
+            "weekday": cls.parse_int(i.get("xqj")),
+            "time": cls.display_course_time(i.get("jc")),
+            "sessions": i.get("jc"),
+            "list_sessions": cls.list_sessions(i.get("jc")),
+            "weeks": i.get("zcd"),
+            "list_weeks": cls.list_weeks(i.get("zcd")),
+            "evaluation_mode": i.get("khfsmc"),
+            "campus": i.get("xqmc"),
+            "place": i.get("cdmc"),
+            "hours_composition": i.get("kcxszc"),
+            "weekly_hours": cls.parse_int(i.get("zhxs")),
+            "total_hours": cls.parse_int(i.get("zxs")),
+        }
+
+    @classmethod
+    def format_academia(cls, sid, i, category):
+        """学业情况课程条目转换，category 由 get_course_category 获取"""
+        return {
+            "course_id": i.get("KCH"),
+            "title": i.get("KCMC"),
+            "situation": cls.parse_int(i.get("XDZT")),
+            "display_term": cls.get_display_term(
+                sid, i.get("JYXDXNM"), i.get("JYXDXQMC")
+            ),
+            "credit": cls.align_floats(i.get("XF")),
+            "category": category,
+            "nature": i.get("KCXZMC"),
+            "max_grade": cls.parse_int(i.get("MAXCJ")),
+            "grade_point": cls.align_floats(i.get("JD")),
+        }
+
+    @classmethod
+    def format_notification(cls, i):
+        """通知消息条目转换"""
+        return {**cls.split_notifications(i), "create_time": i.get("cjsj")}
+
+    @classmethod
+    def notification_key(cls, i):
+        """消息标识，接口未返回消息id，以内容摘要区分同一时间的多条消息"""
+        return hashlib.md5((i.get("xxnr") or "").encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def filter_new_notifications(cls, items, watermark):
+        """
+        从按创建时间倒序的一页消息中筛出水位之后的新消息
+        返回 (新消息, 是否已越过水位)
+        """
+        if not watermark:
+            return items, False
+        fresh = []
+        for i in items:
+            create_time = i.get("cjsj") or ""
+            if create_time < watermark["create_time"]:
+                return fresh, True
+            if (
+                create_time == watermark["create_time"]
+                and cls.notification_key(i) in watermark["keys"]
+            ):
+                continue
+            fresh.append(i)
+        return fresh, False
+
+    @classmethod
+    def format_notification_sync(cls, items, watermark, complete):
+        """增量消息结果，watermark 为最新消息的创建时间及该时间下所有消息的标识"""
+        if items:
+            create_time = max(i.get("cjsj") or "" for i in items)
+            keys = [
+                cls.notification_key(i)
+                for i in items
+                if (i.get("cjsj") or "") == create_time
+            ]
+            if watermark and watermark["create_time"] == create_time:
+                keys = watermark["keys"] + keys
+            elif watermark and watermark["create_time"] > create_time:
+                create_time, keys = watermark["create_time"], watermark["keys"]
+            watermark = {"create_time": create_time, "keys": keys}
+        return {
+            "count": len(items),
+            "notifications": [cls.format_notification(i) for i in items],
+            "watermark": watermark,
+            "complete": complete,  # False 表示达到 max_pages 仍未越过水位，可能遗漏更早的消息
+        }
+
+    @classmethod
+    def format_classroom(cls, i):
+        """空闲教室条目转换"""
+        return {
+            "room_id": i.get("cd_id") or i.get("cdbh") or i.get("cdmc"),
+            "name": i.get("cdmc"),
+            "building": i.get("jxlmc"),
+            "category": i.get("cdlbmc"),
+            "seats": cls.parse_int(i.get("zws")),
+            "campus": i.get("xqmc"),
+        }
+
+    @classmethod
+    def format_selected(cls, i):
+        """已选课程条目转换"""
+        return {
+            "course_id": i.get("kch"),
+            "class_id": i.get("jxb_id"),
+            "do_id": i.get("do_jxb_id"),
+            "title": i.get("kcmc"),
+            "teacher_id": (re.findall(r"(.*?\d+)/", i.get("jsxx")))[0],
+            "teacher": (re.findall(r"/(.*?)/", i.get("jsxx")))[0],
+            "credit": float(i.get("xf", 0)),
+            "category": i.get("kklxmc"),
+            "capacity": int(i.get("jxbrs", 0)),
+            "selected_number": int(i.get("yxzrs", 0)),
+            "place": cls.get_place(i.get("jxdd")),
+            "time": cls.get_course_time(i.get("sksj")),
+            "optional": int(i.get("zixf", 0)),
+            "waiting": i.get("sxbj"),
+        }
+
+    @classmethod
+    def format_selected2(cls, i):
+        """已选课程2条目转换"""
+        return {
+            "course_id": i.get("kch"),
+            "class_id": i.get("jxb_id"),
+            "title": i.get("kcmc"),
+            "credit": float(i.get("xf", 0)),
+            "teacher": i.get("jsxm"),
+            "category": i.get("kclbmc"),
+            "place": i.get("jxdd"),
+        }
+
+    @classmethod
+    def format_block(cls, j, kklxdm):
+        """板块课条目转换"""
+        return {
+            "course_id": j["kch_id"],
+            "class_id": j.get("jxb_id"),
+            "do_id": j.get("do_jxb_id"),
+            "title": j.get("kcmc"),
+            "teacher_id": (re.findall(r"(.*?\d+)/", j.get("jsxx")))[0],
+            "teacher": (re.findall(r"/(.*?)/", j.get("jsxx")))[0],
+            "credit": float(j.get("xf", 0)),
+            "kklxdm": kklxdm,
+            "capacity": int(j.get("jxbrl", 0)),
+            "selected_number": int(j.get("yxzrs", 0)),
+            "place": cls.get_place(j.get("jxdd")),
+            "time": cls.get_course_time(j.get("sksj")),
+        }
+
+    @classmethod
+    def get_hidden_inputs(cls, doc):
+        """获取页面中所有隐藏input的键值"""
+        return {
+            str(item.attr("name")): str(item.attr("value"))
+            for item in doc("input[type='hidden']").items()
+        }
+
+    @classmethod
+    def get_block_head_data(cls, doc):
+        """解析自主选课首页的head_data，板块课内容为空时返回None"""
+        got_credit_list = [i for i in doc("font[color='red']").items()]
+        if len(got_credit_list) == 0:
+            return None
+        head_data = {"got_credit": got_credit_list[2].text()}
+        for index, tab_content in enumerate(doc("a[role='tab']").items(), 1):
+            r = re.findall(r"'(.*?)'", str(tab_content.attr("onclick")))
+            head_data[f"bkk{index}_kklxdm"] = r[0].strip()
+            head_data[f"bkk{index}_xkkz_id"] = r[1].strip()
+        head_data.update(cls.get_hidden_inputs(doc))
+        return head_data
+
+    @classmethod
+    def list_blocks(cls, head_data):
+        """head_data 中的板块编号列表"""
+        return [
+            int(key[3:-7])
+            for key in head_data
+            if key.startswith("bkk") and key.endswith("_kklxdm")
+        ]
+
+    @classmethod
+    def get_block_kch_data(cls, head_data, year, term, block, kspage=1, jspage=10):
+        """板块课课程列表(PartDisplay)请求数据，kspage/jspage 为起止行号"""
+        return {
+            "bklx_id": head_data["bklx_id"],
+            "xqh_id": head_data["xqh_id"],
+            "zyfx_id": head_data["zyfx_id"],
+            "njdm_id": head_data["njdm_id"],
+            "bh_id": head_data["bh_id"],
+            "xbm": head_data["xbm"],
+            "xslbdm": head_data["xslbdm"],
+            "ccdm": head_data["ccdm"],
+            "xsbj": head_data["xsbj"],
+            "xkxnm": str(year),
+            "xkxqm": str(term**2 * 3),
+            "kklxdm": head_data[f"bkk{block}_kklxdm"],
+            "kkbk": head_data["kkbk"],
+            "rwlx": head_data["rwlx"],
+            "kspage": str(kspage),
+            "jspage": str(jspage),
+        }
+
+    @classmethod
+    def get_block_bkk_data(cls, head_data, year, term, block, kch_id):
+        """板块课教学班列表(JxbWithKch)请求数据"""
+        return {
+            "bklx_id": head_data["bklx_id"],
+            "xkxnm": str(year),
+            "xkxqm": str(term**2 * 3),
+            "xkkz_id": head_data[f"bkk{block}_xkkz_id"],
+            "xqh_id": head_data["xqh_id"],
+            "zyfx_id": head_data["zyfx_id"],
+            "njdm_id": head_data["njdm_id"],
+            "bh_id": head_data["bh_id"],
+            "xbm": head_data["xbm"],
+            "xslbdm": head_data["xslbdm"],
+            "ccdm": head_data["ccdm"],
+            "xsbj": head_data["xsbj"],
+            "kklxdm": head_data[f"bkk{block}_kklxdm"],
+            "kch_id": kch_id,
+            "kkbk": head_data["kkbk"],
+            "rwlx": head_data["rwlx"],
+            "zyh_id": head_data["zyh_id"],
+        }
+
+    @classmethod
+    def get_select_data(cls, sid, course_id, do_id, kklxdm, year, term):
+        """选课请求数据"""
+        return {
+            "jxb_ids": do_id,
+            "kch_id": course_id,
+            # 'rwlx': '3',
+            # 'rlkz': '0',
+            # 'rlzlkz': '1',
+            # 'sxbj': '1',
+            # 'xxkbj': '0',
+            # 'cxbj': '0',
+            "qz": "0",
+            # 'xkkz_id': '9B247F4EFD6291B9E055000000000001',
+            "xkxnm": str(year),
+            "xkxqm": str(term**2 * 3),
+            "njdm_id": str(sid[0:2]),
+            "zyh_id": str(sid[2:6]),
+            "kklxdm": str(kklxdm),
+            # 'xklc': '1',
+        }
+
+    @classmethod
+    def get_schedule_pdf_data(cls, year, term, name):
+        """课表pdf请求数据"""
+        return {
+            "xm": name,
+            "xnm": str(year),
+            "xqm": str(term**2 * 3),
+            "xnmc": f"{year}-{year + 1}",
+            "xqmmc": str(term),
+            "jgmc": "undefined",
+            "xxdm": "",
+            "xszd.sj": "true",
+            "xszd.cd": "true",
+            "xszd.js": "true",
+            "xszd.jszc": "false",
+            "xszd.jxb": "true",
+            "xszd.xkbz": "true",
+            "xszd.kcxszc": "true",
+            "xszd.zhxs": "true",
+            "xszd.zxs": "true",
+            "xszd.khfs": "true",
+            "xszd.xf": "true",
+            "xszd.skfsmc": "false",
+            "kzlx": "dy",
+        }
+
+    @classmethod
+    def get_classroom_data(
+        cls, year, term, week, weekday, session, campus, current_page=1
+    ):
+        """空闲教室查询请求数据，周次与节次均为位图"""
+        return {
+            "fwzt": "cx",
+            "xqh_id": str(campus),  # 校区
+            "xnm": str(year),
+            "xqm": str(term**2 * 3),
+            "cdlb_id": "",  # 场地类别
+            "cdejlb_id": "",
+            "qszws": "",  # 最小座位数
+            "jszws": "",  # 最大座位数
+            "cdmc": "",
+            "lh": "",  # 楼号
+            "jyfs": "0",
+            "cdjylx": "",
+            "zcd": str(1 << (week - 1)),  # 周次
+            "xqj": str(weekday),  # 星期
+            "jcd": str(1 << (session - 1)),  # 节次
+            "_search": "false",
+            "nd": int(time.time() * 1000),
+            "queryModel.showCount": "1000",
+            "queryModel.currentPage": str(current_page),
+            "queryModel.sortName": "cdbh",
+            "queryModel.sortOrder": "asc",
+            "time": "1",
+        }
+
+    @classmethod
+    def get_notification_data(cls, current_page, page_size):
+        """通知消息分页请求数据"""
+        return {
+            "sfyy": "0",  # 是否已阅，未阅未1，已阅为2
+            "flag": "1",
+            "_search": "false",
+            "nd": int(time.time() * 1000),
+            "queryModel.showCount": str(page_size),  # 每页条数
+            "queryModel.currentPage": str(current_page),  # 当前页数
+            "queryModel.sortName": "cjsj",
+            "queryModel.sortOrder": "desc",  # 时间倒序, asc正序
+            "time": "0",
+        }
+
+    @classmethod
+    def get_academia_pdf_data(cls):
+        """学业生涯pdf请求数据"""
+        return {
+            "gsdygx": "10628-zw-mrgs",
+            "ids": "",
+            "bdykcxzDms": "",
+            "cytjkcxzDms": "",
+            "cytjkclbDms": "",
+            "cytjkcgsDms": "",
+            "bjgbdykcxzDms": "",
+            "bjgbdyxxkcxzDms": "",
+            "djksxmDms": "",
+            "cjbzmcDms": "",
+            "cjdySzxs": "",
+            "wjlx": "pdf",
+        }
+
+    @classmethod
+    @contextmanager
+    def open_sink(cls, sink):
+        """sink 为路径时写入同目录的临时文件，全部写完后原子替换；为文件对象时直接写入"""
+        if not isinstance(sink, (str, os.PathLike)):
+            yield sink
+            return
+        part = f"{os.fspath(sink)}.part"
+        try:
+            with open(part, "wb") as f:
+                yield f
+            os.replace(part, sink)
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+
+    @classmethod
+    def read_pdf_head(cls, chunks):
+        """读取第一个分块，不是pdf时为较小的错误页面，读取完整内容以便 pdf_error 判断"""
+        head = next(chunks, b"")
+        if not head.startswith(b"%PDF"):
+            head += b"".join(chunks)
+        return head
+
+    @classmethod
+    def pdf_error(cls, status_code, url, content_type, head, encoding=None):
+        """
+        检查pdf下载的响应，head 为 read_pdf_head 读取的内容，是pdf时返回None
+        否则返回错误信息：登录页为1006，教务系统错误页及其他非pdf内容为998
+        """
+        if status_code != 200:
+            return {"code": 2333, "msg": "教务系统挂了"}
+        if head.startswith(b"%PDF"):
+            return None
+        if cls.is_login_page(str(url), content_type, head):
+            return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+        if head.strip():
+            doc = pq(head.decode(encoding or "utf-8", "replace"))
+            if "错误" in doc("title").text():
+                return {"code": 998, "msg": doc("p.error_title").text()}
+        return {"code": 998, "msg": "返回的内容不是pdf"}
+
+    @classmethod
+    def write_chunks(cls, chunks, sink):
+        """将分块内容依次写入 sink，返回写入的字节数"""
+        size = 0
+        with cls.open_sink(sink) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        return size
+
+    @classmethod
+    def reopen_sink(cls, sink):
+        """写入完成后返回可从头读取的文件对象"""
+        if isinstance(sink, (str, os.PathLike)):
+            return open(sink, "rb")
+        sink.flush()
+        if sink.seekable():
+            sink.seek(0)
+        return sink
+
+    @classmethod
+    def get_pdf_path(cls, content):
+        """从文件列表接口返回内容生成PDF文件路径"""
+        return (
+            content.replace("#成功", "")
+            .replace('"', "")
+            .replace("/", "\\")
+            .replace("\\\\", "/")
+        )
+
+    @classmethod
+    def encrypt_password(cls, pwd, n, e, key=None):
+        """对密码base64编码，key 为已解析的公钥"""
         message = str(pwd).encode()
-        rsa_n = binascii.b2a_hex(binascii.a2b_base64(n))
-        rsa_e = binascii.b2a_hex(binascii.a2b_base64(e))
-        key = rsa.PublicKey(int(rsa_n, 16), int(rsa_e, 16))
+        if key is None:
+            key = cls.parse_public_key(n, e)
         encropy_pwd = rsa.encrypt(message, key)
         result = binascii.b2a_base64(encropy_pwd)
         return result
 
+    @classmethod
+    def parse_public_key(cls, n, e):
+        rsa_n = binascii.b2a_hex(binascii.a2b_base64(n))
+        rsa_e = binascii.b2a_hex(binascii.a2b_base64(e))
+        return rsa.PublicKey(int(rsa_n, 16), int(rsa_e, 16))
+
     @classmethod
     def parse_int(cls, digits):
         if not digits:
@@ -1460,6 +2419,38 @@ class Client:
                     week_list.append(int(week_num[0]))
         return week_list
 
+    @classmethod
+    def parse_sessions(cls, sessions):
+        """节次整数、节次列表或 "3-4节" 形式的字符串转为节次列表"""
+        if isinstance(sessions, int):
+            return [sessions]
+        if isinstance(sessions, str):
+            return [
+                session
+                for segment in cls.split_sessions(sessions)
+                for session in cls.list_sessions(segment)
+            ]
+        return sorted(set(sessions))
+
+    @classmethod
+    def week_mask(cls, weeks):
+        """课程所含周的位图，第 n 周对应第 n-1 位"""
+        mask = 0
+        for week in cls.list_weeks(weeks) or []:
+            if week > 0:
+                mask |= 1 << (week - 1)
+        return mask
+
+    @classmethod
+    def session_mask(cls, sessions):
+        """课程节次的位图，第 n 节对应第 n-1 位，合并的多个时段一并计入"""
+        mask = 0
+        for segment in cls.split_sessions(sessions):
+            for session in cls.list_sessions(segment):
+                if session > 0:
+                    mask |= 1 << (session - 1)
+        return mask
+
     @classmethod
     def get_academia_statistics(cls, display_statistics):
         display_statistics = "".join(display_statistics.split())
@@ -1541,54 +2532,36 @@ class Client:
     def split_merge_display(cls, schedule):
         """
         拆分同周同天同课程不同时段数据合并的问题
+        教务系统会将同一天多个时段的同一门课返回为多条相同的记录，节次为合并后的 "1-2节,5-6节"，
+        按 (课程号, 星期, 周次) 分组后，组内第 n 条记录取第 n 个时段
         """
-        repetIndex = []
-        count = 0
-        for items in schedule["courses"]:
-            for index in range(len(schedule["courses"])):
-                if (schedule["courses"]).index(items) == count:  # 如果对比到自己就忽略
+        groups = {}
+        for index, course in enumerate(schedule["courses"]):
+            key = (course["course_id"], course["weekday"], course["weeks"])
+            groups.setdefault(key, []).append(index)
+        for indexes in groups.values():
+            if len(indexes) < 2:
+                continue
+            for order, index in enumerate(indexes):
+                course = schedule["courses"][index]
+                segments = cls.split_sessions(course["sessions"])
+                if len(segments) != len(indexes):  # 时段数与记录数不一致时不做修改
                     continue
-                elif (
-                    items["course_id"]
-                    == schedule["courses"][index]["course_id"]  # 同周同天同课程
-                    and items["weekday"] == schedule["courses"][index]["weekday"]
-                    and items["weeks"] == schedule["courses"][index]["weeks"]
-                ):
-                    repetIndex.append(index)  # 满足条件记录索引
-            count += 1  # 记录当前对比课程的索引
-        if len(repetIndex) % 2 != 0:  # 暂时考虑一天两个时段上同一门课，不满足条件不进行修改
-            return schedule
-        for r in range(0, len(repetIndex), 2):  # 索引数组两两成对，故步进2循环
-            fir = repetIndex[r]
-            sec = repetIndex[r + 1]
-            if len(re.findall(r"(\d+)", schedule["courses"][fir]["sessions"])) == 4:
-                schedule["courses"][fir]["sessions"] = (
-                    re.findall(r"(\d+)", schedule["courses"][fir]["sessions"])[0]
-                    + "-"
-                    + re.findall(r"(\d+)", schedule["courses"][fir]["sessions"])[1]
-                    + "节"
-                )
-                schedule["courses"][fir]["list_sessions"] = cls.list_sessions(
-                    schedule["courses"][fir]["sessions"]
-                )
-                schedule["courses"][fir]["time"] = cls.display_course_time(
-                    schedule["courses"][fir]["sessions"]
-                )
-
-                schedule["courses"][sec]["sessions"] = (
-                    re.findall(r"(\d+)", schedule["courses"][sec]["sessions"])[2]
-                    + "-"
-                    + re.findall(r"(\d+)", schedule["courses"][sec]["sessions"])[3]
-                    + "节"
-                )
-                schedule["courses"][sec]["list_sessions"] = cls.list_sessions(
-                    schedule["courses"][sec]["sessions"]
-                )
-                schedule["courses"][sec]["time"] = cls.display_course_time(
-                    schedule["courses"][sec]["sessions"]
-                )
+                course["sessions"] = segments[order]
+                course["list_sessions"] = cls.list_sessions(course["sessions"])
+                course["time"] = cls.display_course_time(course["sessions"])
         return schedule
 
+    @classmethod
+    def split_sessions(cls, sessions):
+        """将合并的节次拆分为各时段，如 "1-2节,5-6节" -> ["1-2节", "5-6节"]"""
+        if not sessions:
+            return []
+        return [
+            f"{start}-{end or start}节"
+            for start, end in re.findall(r"(\d+)(?:-(\d+))?", sessions)
+        ]
+
     @classmethod
     def split_notifications(cls, item):
         if not item.get("xxnr"):
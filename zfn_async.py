@@ -0,0 +1,1656 @@
+import asyncio
+import base64
+import inspect
+import json
+import re
+import time
+import traceback
+from contextlib import asynccontextmanager
+from functools import partial, wraps
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import aiohttp
+import requests
+from pyquery import PyQuery as pq
+
+from zfn_api import RASPIANIE, Client, response_cache_key
+from zfn_cache import course_category_cache, public_key_cache
+from zfn_classroom import classroom_index
+from zfn_metrics import current_operation, endpoint_of, error_of, metrics
+from zfn_pool import pool_registry
+from zfn_records import (
+    AcademiaCourse,
+    ExamEntry,
+    Grade,
+    ScheduleEntry,
+    SelectedCourse,
+    to_records,
+)
+
+
+class AsyncResponse:
+    """已读取完毕的响应，连接释放后仍可读取内容"""
+
+    def __init__(self, resp, body):
+        self.status = resp.status
+        self.url = resp.url
+        self.headers = resp.headers
+        # 不使用 get_encoding()：没有 charset 时（PDF、验证码等）它会对整个响应体做编码探测
+        self.encoding = resp.charset or "utf-8"
+        self.body = body
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode(self.encoding, "replace")
+
+
+def relogin_on_expiry(method):
+    """zfn_api.relogin_on_expiry 的协程版本"""
+
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        result = await method(self, *args, **kwargs)
+        if (
+            isinstance(result, dict)
+            and result.get("code") == 1006
+            and self._credentials is not None
+            and await self._relogin()
+        ):
+            return await method(self, *args, **kwargs)
+        return result
+
+    return wrapper
+
+
+def cached_response(ignore=()):
+    """zfn_api.cached_response 的协程版本"""
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            if self.response_cache is None or self.sid is None:
+                return await method(self, *args, **kwargs)
+            key = response_cache_key(
+                self, signature, method.__name__, args, kwargs, ignore
+            )
+            return await self.response_cache.async_get_or_fetch(
+                key, method.__name__, partial(method, self, *args, **kwargs)
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def metered(method):
+    """zfn_api.metered 的协程版本"""
+
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.metrics is None:
+            return await method(self, *args, **kwargs)
+        token = current_operation.set(method.__name__)
+        start = time.perf_counter()
+        code = "exception"
+        try:
+            result = await method(self, *args, **kwargs)
+            code = result.get("code") if isinstance(result, dict) else "ok"
+            return result
+        finally:
+            self.metrics.observe_result(
+                self.school, method.__name__, code, time.perf_counter() - start
+            )
+            current_operation.reset(token)
+
+    return wrapper
+
+
+def typed_records(record_type):
+    """zfn_api.typed_records 的协程版本"""
+
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            result = await method(self, *args, **kwargs)
+            return to_records(result, record_type) if self.records else result
+
+        return wrapper
+
+    return decorator
+
+
+class AsyncClient:
+    """
+    基于 asyncio/aiohttp 的教务系统客户端
+    方法名、返回结构及状态码与 Client 保持一致，数据解析复用 Client 的工具方法
+    """
+
+    def __init__(self, cookies={}, **kwargs):
+        # 基础配置
+        self.base_url = kwargs.get("base_url")
+        self.raspisanie = kwargs.get("raspisanie", RASPIANIE)
+        self.ignore_type = kwargs.get("ignore_type", [])
+        self.detail_category_type = kwargs.get("detail_category_type", [])
+        self.timeout = kwargs.get("timeout", 3)
+        # 学业情况子请求的最大并发数及整个调用的默认截止秒数
+        self.fan_out = kwargs.get("fan_out", 8)
+        self.academia_deadline = kwargs.get("academia_deadline")
+        # 课程类别缓存，传入None关闭
+        self.category_cache = kwargs.get("category_cache", course_category_cache)
+        # 空教室位图索引，默认与 Client 共享
+        self.classroom_index = kwargs.get("classroom_index", classroom_index)
+        # 会话存储，按学号保存 cookies，同 Client
+        self.session_store = kwargs.get("session_store")
+        self._credentials = None
+        # 登录公钥缓存，默认与 Client 共享
+        self.public_key_cache = kwargs.get("public_key_cache", public_key_cache)
+        # 板块课 head_data 缓存，与当前会话绑定
+        self._block_heads = {}
+        # 查询结果缓存及其键中的学号，同 Client
+        self.response_cache = kwargs.get("response_cache")
+        self.sid = kwargs.get("sid")
+        # 课程以 __slots__ 记录返回，同 Client
+        self.records = kwargs.get("records", False)
+        # 请求及调用指标，默认与 Client 共享，传入None关闭
+        self.metrics = kwargs.get("metrics", metrics)
+        self.school = urlsplit(self.base_url or "").netloc
+        Client.raspisanie = self.raspisanie
+        Client.ignore_type = self.ignore_type
+
+        self.key_url = urljoin(self.base_url, "xtgl/login_getPublicKey.html")
+        self.login_url = urljoin(self.base_url, "xtgl/login_slogin.html")
+        self.kaptcha_url = urljoin(self.base_url, "kaptcha")
+        self.headers = dict(requests.utils.default_headers())
+        self.headers["Referer"] = self.login_url
+        self.headers[
+            "User-Agent"
+        ] = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/56.0.2924.87 Safari/537.36"
+        self.headers[
+            "Accept"
+        ] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3"
+        self.sess = None
+        self.cookies = cookies
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """关闭会话"""
+        if self.sess is not None and not self.sess.closed:
+            await self.sess.close()
+        self.sess = None
+
+    def _session(self):
+        """懒加载会话，需在事件循环内创建"""
+        if self.sess is None or self.sess.closed:
+            # unsafe=True 允许保存IP形式base_url下发的cookies
+            self.sess = aiohttp.ClientSession(
+                cookie_jar=aiohttp.CookieJar(unsafe=True)
+            )
+        return self.sess
+
+    def _session_cookies(self):
+        return {cookie.key: cookie.value for cookie in self._session().cookie_jar}
+
+    def _observe(
+        self, method, url, start, data=None, status=None, received=0, e=None
+    ):
+        """记录一次请求的指标，data 为请求的表单数据"""
+        if self.metrics is None:
+            return
+        if isinstance(data, dict):
+            data = urlencode(data)
+        sent = len(data.encode("utf-8") if isinstance(data, str) else data or b"")
+        self.metrics.observe_request(
+            self.school,
+            endpoint_of(url),
+            method,
+            status,
+            time.perf_counter() - start,
+            sent,
+            received,
+            error=None if e is None else error_of(e),
+        )
+
+    @asynccontextmanager
+    async def _request_slot(self):
+        """占用该主机的请求名额，上限为 pool_registry 中的 max_requests，未设置时不限制"""
+        limit = pool_registry.async_limit(self.base_url)
+        if limit is None:
+            yield
+            return
+        async with limit:
+            yield
+
+    async def _fetch(self, method, url, timeout=None, **kwargs):
+        """发起请求并读取完整响应体"""
+        start = time.perf_counter()
+        try:
+            async with self._request_slot(), self._session().request(
+                method,
+                url,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=timeout or self.timeout),
+                **kwargs,
+            ) as resp:
+                resp = AsyncResponse(resp, await resp.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._observe(method, url, start, kwargs.get("data"), e=e)
+            raise
+        self._observe(
+            method, url, start, kwargs.get("data"), resp.status, len(resp.body)
+        )
+        return resp
+
+    async def _is_login_response(self, resp):
+        return Client.is_login_page(
+            str(resp.url), resp.headers.get("Content-Type"), await resp.read()
+        )
+
+    async def _is_error_response(self, resp):
+        return Client.is_error_page(resp.headers.get("Content-Type"), await resp.read())
+
+    async def _json(self, resp):
+        # 教务系统返回的JSON常以text/html作为Content-Type，不能直接用resp.json()
+        return json.loads(await resp.text())
+
+    @metered
+    async def login(self, sid, password):
+        """登录教务系统，会话存储的使用同 Client.login"""
+        if self.session_store is not None:
+            self._credentials = (sid, password)
+            key = Client.session_key(self.base_url, sid)
+            cookies = Client.stored_cookies(self.session_store.get(key, None), password)
+            if cookies:
+                self.cookies = cookies
+                self.sid = sid
+                return {"code": 1000, "msg": "登录成功", "data": {"cookies": self.cookies}}
+        result = await self._login(sid, password)
+        if result["code"] != 1000:
+            self._credentials = None
+        return result
+
+    async def _relogin(self):
+        """使用 login 时的账号密码重新登录，成功返回True"""
+        sid, password = self._credentials
+        self.session_store.delete(Client.session_key(self.base_url, sid))
+        return (await self._login(sid, password))["code"] == 1000
+
+    def _logged_in(self, sid, password):
+        """登录成功后保存会话，并清除与旧会话绑定的缓存"""
+        self.sid = sid
+        self._block_heads.clear()
+        if self.session_store is not None:
+            self.session_store.set(
+                Client.session_key(self.base_url, sid),
+                Client.session_entry(self.cookies, password),
+            )
+
+    async def _login(self, sid, password, fresh_key=False):
+        """登录教务系统，公钥缓存的使用同 Client._login"""
+        need_verify = False
+        try:
+            # 登录页
+            req_csrf = await self._fetch("GET", self.login_url)
+            if req_csrf.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            # 获取csrf_token
+            text = await req_csrf.text()
+            csrf_token = Client.get_csrf_token(text)
+            need_kaptcha = Client.need_kaptcha(text)
+            pre_cookies = self._session_cookies()
+            # 获取publicKey并加密密码，需要验证码时始终重新获取
+            modulus, exponent, cached_key = await self._get_public_key(
+                fresh_key or need_kaptcha
+            )
+            if not need_kaptcha:
+                # 不需要验证码
+                encrypt_password = self._encrypt_password(password, modulus, exponent)
+                # 登录数据
+                login_data = {
+                    "csrftoken": csrf_token,
+                    "yhm": sid,
+                    "mm": encrypt_password.decode(),
+                }
+                # 请求登录
+                req_login = await self._fetch("POST", self.login_url, data=login_data)
+                tips = Client.get_login_tips(await req_login.text())
+                if tips is not None:
+                    if cached_key:
+                        # 公钥与会话绑定的系统用错公钥时同样提示用户名或密码不正确，
+                        # 因此复用的公钥登录失败时先重新获取公钥重试一次，新公钥的结果才是最终结果
+                        self.public_key_cache.invalidate(self.base_url)
+                        return await self._login(sid, password, fresh_key=True)
+                    if "用户名或密码" in tips:
+                        return {"code": 1002, "msg": "用户名或密码不正确"}
+                    return {"code": 998, "msg": tips}
+                if fresh_key and self.public_key_cache is not None:
+                    self.public_key_cache.mark_session_bound(self.base_url)
+                self.cookies = self._session_cookies()
+                self._logged_in(sid, password)
+                return {"code": 1000, "msg": "登录成功", "data": {"cookies": self.cookies}}
+            # 需要验证码，返回相关页面验证信息给用户
+            need_verify = True
+            req_kaptcha = await self._fetch("GET", self.kaptcha_url)
+            kaptcha_pic = base64.b64encode(await req_kaptcha.read()).decode()
+            return {
+                "code": 1001,
+                "msg": "获取验证码成功",
+                "data": {
+                    "sid": sid,
+                    "csrf_token": csrf_token,
+                    "cookies": pre_cookies,
+                    "password": password,
+                    "modulus": modulus,
+                    "exponent": exponent,
+                    "kaptcha_pic": kaptcha_pic,
+                    "timestamp": time.time(),
+                },
+            }
+        except asyncio.TimeoutError:
+            msg = "获取验证码超时" if need_verify else "登录超时"
+            return {"code": 1003, "msg": msg}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            msg = "获取验证码时未记录的错误" if need_verify else "登录时未记录的错误"
+            return {"code": 999, "msg": f"{msg}：{str(e)}"}
+
+    async def _get_public_key(self, fresh=False):
+        """返回 (modulus, exponent, 是否来自缓存)"""
+        if self.public_key_cache is not None and not fresh:
+            latest = self.public_key_cache.latest(self.base_url)
+            if latest is not None:
+                return (*latest, True)
+        req_pubkey = await self._json(await self._fetch("GET", self.key_url))
+        modulus = req_pubkey["modulus"]
+        exponent = req_pubkey["exponent"]
+        if self.public_key_cache is not None:
+            self.public_key_cache.remember(self.base_url, modulus, exponent)
+        return modulus, exponent, False
+
+    def _encrypt_password(self, password, modulus, exponent):
+        if self.public_key_cache is None:
+            return Client.encrypt_password(password, modulus, exponent)
+        key = self.public_key_cache.parsed(
+            self.base_url, modulus, exponent, Client.parse_public_key
+        )
+        return Client.encrypt_password(password, modulus, exponent, key)
+
+    @metered
+    async def login_with_kaptcha(
+        self, sid, csrf_token, cookies, password, modulus, exponent, kaptcha, **kwargs
+    ):
+        """需要验证码的登陆"""
+        try:
+            encrypt_password = self._encrypt_password(password, modulus, exponent)
+            login_data = {
+                "csrftoken": csrf_token,
+                "yhm": sid,
+                "mm": encrypt_password.decode(),
+                "yzm": kaptcha,
+            }
+            req_login = await self._fetch(
+                "POST", self.login_url, cookies=cookies, data=login_data
+            )
+            if req_login.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            # 请求登录
+            tips = Client.get_login_tips(await req_login.text())
+            if tips is not None:
+                if "验证码" in tips:
+                    return {"code": 1004, "msg": "验证码输入错误"}
+                if "用户名或密码" in tips:
+                    return {"code": 1002, "msg": "用户名或密码不正确"}
+                return {"code": 998, "msg": tips}
+            self.cookies = self._session_cookies()
+            # 不同学校系统兼容差异
+            if not self.cookies.get("route") and cookies.get("route"):
+                route_cookies = {
+                    "JSESSIONID": self.cookies["JSESSIONID"],
+                    "route": cookies["route"],
+                }
+                self.cookies = route_cookies
+            self._logged_in(sid, password)
+            return {"code": 1000, "msg": "登录成功", "data": {"cookies": self.cookies}}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "登录超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "验证码登录时未记录的错误：" + str(e)}
+
+    @metered
+    @relogin_on_expiry
+    async def get_info(self):
+        """获取个人信息"""
+        url = urljoin(self.base_url, "xsxxxggl/xsxxwh_cxCkDgxsxx.html?gnmkdm=N100801")
+        try:
+            req_info = await self._fetch("GET", url, cookies=self.cookies)
+            if req_info.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_info):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            info = await self._json(req_info)
+            if info is None:
+                return await self._get_info()
+            result = Client.format_info(info)
+            return {"code": 1000, "msg": "获取个人信息成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取个人信息超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取个人信息时未记录的错误：" + str(e)}
+
+    async def _get_info(self):
+        """获取个人信息"""
+        url = urljoin(self.base_url, "xsxxxggl/xsgrxxwh_cxXsgrxx.html?gnmkdm=N100801")
+        try:
+            req_info = await self._fetch("GET", url, cookies=self.cookies)
+            if req_info.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_info):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            doc = pq(await req_info.text())
+            pending_result = Client.get_personal_fields(doc)
+            if pending_result.get("学号：") == "":
+                return {
+                    "code": 1014,
+                    "msg": "当前学年学期无学生时盒数据，您可能已经毕业了。\n\n如果是专升本同学，请使用专升本后的新学号登录～",
+                }
+            result = Client.format_personal_info(pending_result)
+            if pending_result.get("学院名称：") is None:
+                # 如果个人信息页面获取不到学院班级，则此处需要请求另外一个地址以获取学院、专业、班级等信息
+                _url = urljoin(
+                    self.base_url,
+                    "xszbbgl/xszbbgl_cxXszbbsqIndex.html?doType=details&gnmkdm=N106005",
+                )
+                _req_info = await self._fetch(
+                    "POST",
+                    _url,
+                    cookies=self.cookies,
+                    data={"offDetails": "1", "gnmkdm": "N106005", "czdmKey": "00"},
+                )
+                _doc = pq(await _req_info.text())
+                if _doc("p.error_title").text() != "无功能权限，":
+                    # 通过学生证补办申请入口，来补全部分信息
+                    result.update(Client.format_supplement_info(_doc))
+            return {"code": 1000, "msg": "获取个人信息成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取个人信息超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取个人信息时未记录的错误：" + str(e)}
+
+    @typed_records(Grade)
+    @cached_response()
+    @metered
+    @relogin_on_expiry
+    async def get_grade(self, year: int, term: int = 0, use_personal_info: bool = False):
+        """
+        获取成绩
+        use_personal_info: 是否使用获取个人信息接口获取成绩
+        """
+        return await self._collect_pages(
+            self.iter_grade(year, term, use_personal_info), year, term, "获取成绩成功"
+        )
+
+    async def iter_grade(
+        self,
+        year: int,
+        term: int = 0,
+        use_personal_info: bool = False,
+        page_size: int = 100,
+    ):
+        """分页获取成绩，逐页产出，格式同 Client.iter_grade"""
+        url = urljoin(
+            self.base_url,
+            "cjcx/cjcx_cxDgXscj.html?doType=query&gnmkdm=N305005"
+            if use_personal_info
+            else "cjcx/cjcx_cxXsgrcj.html?doType=query&gnmkdm=N305005",
+        )
+        async for page in self._iter_query_pages(
+            url, year, term, page_size, "成绩", Client.format_grade
+        ):
+            yield page
+
+    @typed_records(ExamEntry)
+    @cached_response()
+    @metered
+    @relogin_on_expiry
+    async def get_exam_schedule(self, year: int, term: int = 0):
+        """获取考试信息"""
+        return await self._collect_pages(
+            self.iter_exam_schedule(year, term), year, term, "获取考试信息成功"
+        )
+
+    async def iter_exam_schedule(self, year: int, term: int = 0, page_size: int = 100):
+        """分页获取考试信息，格式同 Client.iter_grade"""
+        url = urljoin(
+            self.base_url,
+            "kwgl/kscx_cxXsksxxIndex.html?doType=query&gnmkdm=N358105",
+        )
+        async for page in self._iter_query_pages(
+            url, year, term, page_size, "考试信息", Client.format_exam
+        ):
+            yield page
+
+    async def _iter_query_pages(self, url, year, term, page_size, name, format_item):
+        """按 queryModel.currentPage 逐页请求分页查询接口，每页条目经 format_item 转换后产出"""
+        term = term**2 * 3
+        term = "" if term == 0 else term
+        current_page = 1
+        fetched = 0
+        try:
+            while True:
+                data = {
+                    "xnm": str(year),  # 学年数
+                    "xqm": str(term),  # 学期数，第一学期为3，第二学期为12, 整个学年为空''
+                    "_search": "false",
+                    "nd": int(time.time() * 1000),
+                    "queryModel.showCount": str(page_size),  # 每页最多条数
+                    "queryModel.currentPage": str(current_page),
+                    "queryModel.sortName": "",
+                    "queryModel.sortOrder": "asc",
+                    "time": "0",  # 查询次数
+                }
+                req_page = await self._fetch("POST", url, data=data, cookies=self.cookies)
+                if req_page.status != 200:
+                    yield {"code": 2333, "msg": "教务系统挂了"}
+                    return
+                if await self._is_login_response(req_page):
+                    yield {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+                    return
+                page = await self._json(req_page)
+                items = page.get("items")
+                if not items:
+                    if current_page == 1:
+                        yield {"code": 1005, "msg": "获取内容为空"}
+                    return
+                fetched += len(items)
+                reported = page.get("totalResult")
+                total = int(reported or fetched)
+                yield {
+                    "code": 1000,
+                    "msg": f"获取{name}成功",
+                    "data": {
+                        "sid": items[0]["xh"],
+                        "name": items[0]["xm"],
+                        "page": current_page,
+                        "total": total,
+                        "courses": [format_item(i) for i in items],
+                    },
+                }
+                # 有的系统会把 showCount 限制在更小的值，有 totalResult 时只按总数判断是否取完
+                if fetched >= total or (not reported and len(items) < page_size):
+                    return
+                current_page += 1
+        except asyncio.TimeoutError:
+            yield {"code": 1003, "msg": f"获取{name}超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            yield {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            yield {"code": 999, "msg": f"获取{name}时未记录的错误：" + str(e)}
+
+    @classmethod
+    async def _collect_pages(cls, pages, year, term, msg):
+        """将分页结果合并为一次性返回的结构"""
+        result = None
+        async for page in pages:
+            if page["code"] != 1000:
+                return page
+            if result is None:
+                result = {
+                    "sid": page["data"]["sid"],
+                    "name": page["data"]["name"],
+                    "year": year,
+                    "term": term,
+                    "count": 0,
+                    "courses": [],
+                }
+            result["courses"].extend(page["data"]["courses"])
+        result["count"] = len(result["courses"])
+        return {"code": 1000, "msg": msg, "data": result}
+
+    @typed_records(ScheduleEntry)
+    @cached_response()
+    @metered
+    @relogin_on_expiry
+    async def get_schedule(self, year: int, term: int):
+        """获取课程表信息"""
+        url = urljoin(self.base_url, "kbcx/xskbcx_cxXsKb.html?gnmkdm=N2151")
+        temp_term = term
+        term = term**2 * 3
+        data = {"xnm": str(year), "xqm": str(term)}
+        try:
+            req_schedule = await self._fetch(
+                "POST", url, data=data, cookies=self.cookies
+            )
+            if req_schedule.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_schedule):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            schedule = await self._json(req_schedule)
+            if not schedule.get("kbList"):
+                return {"code": 1005, "msg": "获取内容为空"}
+            result = {
+                "sid": schedule["xsxx"].get("XH"),
+                "name": schedule["xsxx"].get("XM"),
+                "year": year,
+                "term": temp_term,
+                "count": len(schedule["kbList"]),
+                "courses": [Client.format_schedule(i) for i in schedule["kbList"]],
+                "extra_courses": [i.get("qtkcgs") for i in schedule.get("sjkList")],
+            }
+            result = Client.split_merge_display(result)
+            return {"code": 1000, "msg": "获取课表成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取课表超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取课表时未记录的错误：" + str(e)}
+
+    @metered
+    @relogin_on_expiry
+    async def get_empty_classrooms(
+        self,
+        year: int,
+        term: int,
+        week: int,
+        weekday: int,
+        sessions,
+        campus="1",
+        refresh=False,
+    ):
+        """查询空教室，参数及返回同 Client.get_empty_classrooms"""
+        sessions = Client.parse_sessions(sessions)
+        key = self.classroom_index.key(self.base_url, year, term, campus)
+        try:
+            if refresh or not self.classroom_index.is_fresh(
+                key, week, weekday, sessions
+            ):
+                day_sessions = list(
+                    range(1, max([len(self.raspisanie) or 12] + sessions) + 1)
+                )
+                day = await self._fan_out(
+                    [
+                        partial(
+                            self._get_free_classrooms,
+                            year,
+                            term,
+                            week,
+                            weekday,
+                            session,
+                            campus,
+                        )
+                        for session in day_sessions
+                    ]
+                )
+                if None in day:
+                    return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+                self.classroom_index.update(
+                    key, week, weekday, dict(zip(day_sessions, day))
+                )
+            classrooms = self.classroom_index.query(key, week, weekday, sessions)
+            result = {
+                "year": year,
+                "term": term,
+                "week": week,
+                "weekday": weekday,
+                "sessions": sessions,
+                "campus": campus,
+                "count": len(classrooms),
+                "classrooms": classrooms,
+            }
+            return {"code": 1000, "msg": "获取空教室成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取空教室超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取空教室时未记录的错误：" + str(e)}
+
+    async def _get_free_classrooms(self, year, term, week, weekday, session, campus):
+        """获取某周某天某一节的全部空闲教室，登录失效时返回None"""
+        url = urljoin(
+            self.base_url, "cdjy/cdjy_cxKxcdlb.html?doType=query&gnmkdm=N2155"
+        )
+        classrooms = []
+        current_page = 1
+        while True:
+            req_classroom = await self._fetch(
+                "POST",
+                url,
+                data=Client.get_classroom_data(
+                    year, term, week, weekday, session, campus, current_page
+                ),
+                cookies=self.cookies,
+            )
+            if req_classroom.status != 200:
+                raise aiohttp.ClientError(f"教务系统返回{req_classroom.status}")
+            if await self._is_login_response(req_classroom):
+                return None
+            page = await self._json(req_classroom)
+            items = page.get("items") or []
+            classrooms.extend(Client.format_classroom(i) for i in items)
+            if not items or len(classrooms) >= int(page.get("totalResult") or 0):
+                return classrooms
+            current_page += 1
+
+    @typed_records(AcademiaCourse)
+    @cached_response(ignore=("deadline",))
+    @metered
+    @relogin_on_expiry
+    async def get_academia(self, deadline=None):
+        """
+        获取学业生涯情况
+        deadline: 整个调用的截止秒数，默认使用初始化时的 academia_deadline，None 表示不限制
+        """
+        url_main = urljoin(
+            self.base_url,
+            "xsxy/xsxyqk_cxXsxyqkIndex.html?gnmkdm=N105515&layout=default",
+        )
+        url_info = urljoin(
+            self.base_url, "xsxy/xsxyqk_cxJxzxjhxfyqKcxx.html?gnmkdm=N105515"
+        )
+        deadline = self.academia_deadline if deadline is None else deadline
+        deadline_at = None if deadline is None else time.monotonic() + deadline
+        try:
+            req_main = await self._fetch("GET", url_main, cookies=self.cookies)
+            if req_main.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_main):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            text_main = await req_main.text()
+            doc_main = pq(text_main)
+            if str(doc_main("div.alert-danger")) != "":
+                return {"code": 998, "msg": doc_main("div.alert-danger").text()}
+            sid = doc_main("input#xh_id").attr("value")
+            display_statistics = (
+                doc_main("div#alertBox").text().replace(" ", "").replace("\n", "")
+            )
+            statistics = Client.get_academia_statistics(display_statistics)
+            type_statistics = Client.get_academia_type_statistics(text_main)
+            type_list = list(type_statistics.keys())
+            # 各类别的课程列表并发获取，结果按类别原顺序组装
+            detail_list = await self._fan_out(
+                [
+                    partial(
+                        self._get_academia_detail, url_info, type_statistics[type]["id"]
+                    )
+                    for type in type_list
+                ],
+                deadline_at,
+            )
+            details = dict(zip(type_list, detail_list))
+            categories = {
+                type: [i.get("KCLBMC") for i in details[type]] for type in type_list
+            }
+            pending = [
+                (type, index, i)
+                for type in type_list
+                if type in self.detail_category_type
+                for index, i in enumerate(details[type])
+            ]
+            fetched = await self._fan_out(
+                [partial(self.get_course_category, type, i) for type, _, i in pending],
+                deadline_at,
+            )
+            for (type, index, _), category in zip(pending, fetched):
+                categories[type][index] = category
+            result = {
+                "sid": sid,
+                "statistics": statistics,
+                "details": [
+                    {
+                        "type": type,
+                        "credits": type_statistics[type]["credits"],
+                        "courses": [
+                            Client.format_academia(sid, i, categories[type][index])
+                            for index, i in enumerate(details[type])
+                        ],
+                    }
+                    for type in type_list
+                    if len(details[type]) > 0
+                ],
+            }
+            return {"code": 1000, "msg": "获取学业情况成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取学业情况超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取学业情况时未记录的错误：" + str(e)}
+
+    async def _get_academia_detail(self, url_info, type_id):
+        """获取学业情况某一类别的课程列表"""
+        return await self._json(
+            await self._fetch(
+                "POST", url_info, data={"xfyqjd_id": type_id}, cookies=self.cookies
+            )
+        )
+
+    async def _fan_out(self, calls, deadline_at=None):
+        """以最多 fan_out 个并发执行无参协程函数，结果按原顺序返回，超过截止时间时抛出超时"""
+        semaphore = asyncio.Semaphore(self.fan_out)
+
+        async def run(call):
+            async with semaphore:
+                return await call()
+
+        timeout = (
+            None if deadline_at is None else max(deadline_at - time.monotonic(), 0)
+        )
+        return await asyncio.wait_for(
+            asyncio.gather(*(run(call) for call in calls)), timeout
+        )
+
+    @metered
+    @relogin_on_expiry
+    async def get_academia_pdf(self, sink=None, chunk_size=64 * 1024):
+        """获取学业生涯（学生成绩总表）pdf，sink 的用法同 Client.get_academia_pdf"""
+        url_view = urljoin(self.base_url, "bysxxcx/xscjzbdy_dyXscjzbView.html")
+        url_window = urljoin(self.base_url, "bysxxcx/xscjzbdy_dyCjdyszxView.html")
+        url_policy = urljoin(self.base_url, "xtgl/bysxxcx/xscjzbdy_cxXsCount.html")
+        url_filetype = urljoin(self.base_url, "bysxxcx/xscjzbdy_cxGswjlx.html")
+        url_common = urljoin(self.base_url, "common/common_cxJwxtxx.html")
+        url_file = urljoin(self.base_url, "bysxxcx/xscjzbdy_dyList.html")
+        url_progress = urljoin(self.base_url, "xtgl/progress_cxProgressStatus.html")
+        data = Client.get_academia_pdf_data()
+        # 与 Client 一致：许可、文件类型及文件列表接口均不携带 wjlx
+        del data["wjlx"]
+        post = partial(self._fetch, "POST", cookies=self.cookies)
+
+        try:
+            start = time.perf_counter()
+            data_params = {"gnmkdm": "N558020"}
+            # View接口
+            req_view = await post(url_view, data=data_params, params=data_params)
+            if req_view.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_view):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            # Window、许可、文件类型、Common接口互不依赖，并发发出
+            await self._fan_out(
+                [
+                    partial(post, url_window, data={"xh": ""}, params=data_params),
+                    partial(post, url_policy, data=data, params=data_params),
+                    partial(post, url_filetype, data=data, params=data_params),
+                    partial(post, url_common, data=data_params, params=data_params),
+                ]
+            )
+            # 获取PDF文件URL
+            req_file = await post(url_file, data=data, params=data_params)
+            text_file = await req_file.text()
+            doc = pq(text_file)
+            if "错误" in doc("title").text():
+                error = doc("p.error_title").text()
+                return {"code": 998, "msg": error}
+            # 生成PDF文件URL
+            pdf = Client.get_pdf_path(text_file)
+            # 与 Client 一致：进度接口完成后再下载，出错返回时不会留下仍在写入 sink 的任务
+            data_progress = {
+                "key": "score_print_processed",
+                "gnmkdm": "N558020",
+            }
+            await post(url_progress, data=data_progress, params=data_progress)
+            error, result = await self._download(
+                urljoin(self.base_url, pdf), sink, chunk_size
+            )
+            if error is not None:
+                return error
+            if sink is not None:
+                result = {"size": result, "elapsed": time.perf_counter() - start}
+            return {"code": 1000, "msg": "获取学生成绩总表pdf成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取成绩总表pdf超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取成绩总表pdf时未记录的错误：" + str(e)}
+
+    async def _stream_schedule_pdf(self, url_file, data, sink, chunk_size, start):
+        """将课表pdf分块写入 sink"""
+        size = status = 0
+        try:
+            async with self._request_slot(), self._session().post(
+                url_file,
+                headers=self.headers,
+                data=data,
+                params={"doType": "table"},
+                cookies=self.cookies,
+                timeout=aiohttp.ClientTimeout(sock_read=self.timeout),
+            ) as req_file:
+                status = req_file.status
+                head = await self._read_pdf_head(req_file, chunk_size)
+                size = len(head)
+                error = Client.pdf_error(
+                    status,
+                    req_file.url,
+                    req_file.headers.get("Content-Type"),
+                    head,
+                    req_file.charset,
+                )
+                if error is not None:
+                    return error
+                with Client.open_sink(sink) as f:
+                    f.write(head)
+                    async for chunk in req_file.content.iter_chunked(chunk_size):
+                        f.write(chunk)
+                        size += len(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._observe("POST", url_file, start, data, e=e)
+            status = 0
+            raise
+        finally:
+            if status:
+                self._observe("POST", url_file, start, data, status, size)
+        result = {
+            "size": size,
+            "elapsed": time.perf_counter() - start,
+            "file": Client.reopen_sink(sink),
+        }
+        return {"code": 1000, "msg": "获取课程表pdf成功", "data": result}
+
+    async def _read_pdf_head(self, resp, chunk_size):
+        """同 Client.read_pdf_head"""
+        head = await resp.content.read(chunk_size)
+        if not head.startswith(b"%PDF"):
+            head += await resp.content.read()
+        return head
+
+    async def _download(self, url, sink, chunk_size):
+        """同 Client._download"""
+        if sink is None:
+            resp = await self._fetch(
+                "GET", url, cookies=self.cookies, timeout=self.timeout + 2
+            )
+            error = Client.pdf_error(
+                resp.status,
+                resp.url,
+                resp.headers.get("Content-Type"),
+                resp.body,
+                resp.encoding,
+            )
+            if error is not None:
+                return error, None
+            return None, resp.body
+        error = None
+        size = status = 0
+        start = time.perf_counter()
+        try:
+            async with self._request_slot(), self._session().get(
+                url,
+                headers=self.headers,
+                cookies=self.cookies,
+                timeout=aiohttp.ClientTimeout(sock_read=self.timeout + 2),
+            ) as resp:
+                status = resp.status
+                head = await self._read_pdf_head(resp, chunk_size)
+                size = len(head)
+                error = Client.pdf_error(
+                    status,
+                    resp.url,
+                    resp.headers.get("Content-Type"),
+                    head,
+                    resp.charset,
+                )
+                if error is None:
+                    with Client.open_sink(sink) as f:
+                        f.write(head)
+                        async for chunk in resp.content.iter_chunked(chunk_size):
+                            f.write(chunk)
+                            size += len(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._observe("GET", url, start, e=e)
+            raise
+        self._observe("GET", url, start, status=status, received=size)
+        if error is not None:
+            return error, None
+        return None, size
+
+    @metered
+    @relogin_on_expiry
+    async def get_schedule_pdf(
+        self,
+        year: int,
+        term: int,
+        name: str = "导出",
+        sink=None,
+        chunk_size: int = 64 * 1024,
+    ):
+        """获取课表pdf，sink 的用法同 Client.get_schedule_pdf"""
+        url_policy = urljoin(self.base_url, "kbdy/bjkbdy_cxXnxqsfkz.html")
+        url_file = urljoin(self.base_url, "kbcx/xskbcx_cxXsShcPdf.html")
+        data = Client.get_schedule_pdf_data(year, term, name)
+
+        try:
+            start = time.perf_counter()
+            # 许可接口
+            req_policy = await self._fetch(
+                "POST",
+                url_policy,
+                data=data,
+                params={"gnmkdm": "N2151"},
+                cookies=self.cookies,
+            )
+            if req_policy.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_policy):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            # 获取PDF文件
+            if sink is not None:
+                return await self._stream_schedule_pdf(
+                    url_file, data, sink, chunk_size, start
+                )
+            req_file = await self._fetch(
+                "POST",
+                url_file,
+                data=data,
+                params={"doType": "table"},
+                cookies=self.cookies,
+            )
+            result = await req_file.read()  # 二进制内容
+            if not result.startswith(b"%PDF"):
+                doc = pq(await req_file.text())
+                if "错误" in doc("title").text():
+                    error = doc("p.error_title").text()
+                    return {"code": 998, "msg": error}
+            return {"code": 1000, "msg": "获取课程表pdf成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取课程表pdf超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取课程表pdf时未记录的错误：" + str(e)}
+
+    @metered
+    @relogin_on_expiry
+    async def get_notifications(self):
+        """获取通知消息"""
+        url = urljoin(self.base_url, "xtgl/index_cxDbsy.html?doType=query")
+        try:
+            req_notification = await self._fetch(
+                "POST",
+                url,
+                data=Client.get_notification_data(1, 1000),
+                cookies=self.cookies,
+            )
+            if req_notification.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(
+                req_notification
+            ) or await self._is_error_response(req_notification):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            notifications = await self._json(req_notification)
+            result = [Client.format_notification(i) for i in notifications.get("items")]
+            return {"code": 1000, "msg": "获取消息成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取消息超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取消息时未记录的错误：" + str(e)}
+
+    @metered
+    @relogin_on_expiry
+    async def sync_notifications(self, watermark=None, page_size=20, max_pages=10):
+        """增量获取通知消息，参数及返回同 Client.sync_notifications"""
+        url = urljoin(self.base_url, "xtgl/index_cxDbsy.html?doType=query")
+        items = []
+        complete = False
+        try:
+            for current_page in range(1, max_pages + 1):
+                req_notification = await self._fetch(
+                    "POST",
+                    url,
+                    data=Client.get_notification_data(current_page, page_size),
+                    cookies=self.cookies,
+                )
+                if req_notification.status != 200:
+                    return {"code": 2333, "msg": "教务系统挂了"}
+                if await self._is_login_response(
+                    req_notification
+                ) or await self._is_error_response(req_notification):
+                    return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+                page = (await self._json(req_notification)).get("items") or []
+                fresh, crossed = Client.filter_new_notifications(page, watermark)
+                items.extend(fresh)
+                if crossed or len(page) < page_size:
+                    complete = True
+                    break
+            return {
+                "code": 1000,
+                "msg": "获取新消息成功",
+                "data": Client.format_notification_sync(items, watermark, complete),
+            }
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取消息超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": "获取消息时未记录的错误：" + str(e)}
+
+    @typed_records(SelectedCourse)
+    @metered
+    @relogin_on_expiry
+    async def get_selected_courses(self, year: int, term: int):
+        """获取已选课程信息"""
+        try:
+            url = urljoin(
+                self.base_url,
+                "xsxk/zzxkyzb_cxZzxkYzbChoosedDisplay.html?gnmkdm=N253512",
+            )
+            temp_term = term
+            term = term**2 * 3
+            data = {"xkxnm": str(year), "xkxqm": str(term)}
+            req_selected = await self._fetch(
+                "POST", url, data=data, cookies=self.cookies
+            )
+            if req_selected.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_selected):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            selected = await self._json(req_selected)
+            result = {
+                "year": year,
+                "term": temp_term,
+                "count": len(selected),
+                "courses": [Client.format_selected(i) for i in selected],
+            }
+            return {"code": 1000, "msg": "获取已选课程成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取已选课程超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"获取已选课程时未记录的错误：{str(e)}"}
+
+    @metered
+    @relogin_on_expiry
+    async def get_selected_courses2(self, year: int = 0, term: int = 0):
+        """获取已选课程信息2"""
+        try:
+            url = urljoin(
+                self.base_url,
+                "/xsxxxggl/xsxxwh_cxXsxkxx.html?gnmkdm=N100801",
+            )
+            temp_term = term
+            if year == 0 or term == 0:
+                year = ""
+                term = ""
+            else:
+                term = term**2 * 3
+            data = {
+                "xnm": str(year),
+                "xqm": str(term),
+                "_search": "false",
+                "queryModel.showCount": "5000",
+                "queryModel.currentPage": "1",
+                "queryModel.sortName": "",
+                "queryModel.sortOrder": "asc",
+                "time": "1",
+            }
+            req_selected = await self._fetch(
+                "POST", url, data=data, cookies=self.cookies
+            )
+            if req_selected.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_selected):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            selected = await self._json(req_selected)
+            result = {
+                "year": year,
+                "term": temp_term,
+                "count": len(selected["items"]),
+                "courses": [Client.format_selected2(i) for i in selected["items"]],
+            }
+            return {"code": 1000, "msg": "获取已选课程2成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取已选课程2超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {
+                "code": 2333,
+                "msg": "请重试，若多次失败可能是系统错误维护或需更新接口",
+            }
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"获取已选课程2时未记录的错误：{str(e)}"}
+
+    @metered
+    @relogin_on_expiry
+    async def get_block_courses(
+        self, year: int, term: int, block: int, page_size: int = 10
+    ):
+        """获取板块课选课列表，head_data 的缓存同 Client.get_block_courses"""
+        try:
+            error, head_data = await self._get_block_head(year, term)
+            if error is not None:
+                return error
+            error, courses = await self._get_block_courses(
+                head_data, year, term, block, page_size
+            )
+            if error is not None:
+                return error
+            if not courses:
+                return {"code": 1005, "msg": "板块课内容为空"}
+            result = {"count": len(courses), "courses": courses}
+            return {"code": 1000, "msg": "获取板块课信息成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取板块课信息超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"获取板块课信息时未记录的错误：{str(e)}"}
+
+    @metered
+    @relogin_on_expiry
+    async def get_all_block_courses(self, year: int, term: int, page_size: int = 10):
+        """并发获取所有板块的选课列表"""
+        try:
+            error, head_data = await self._get_block_head(year, term)
+            if error is not None:
+                return error
+            blocks = Client.list_blocks(head_data)
+            fetched = await self._fan_out(
+                [
+                    partial(
+                        self._get_block_courses, head_data, year, term, block, page_size
+                    )
+                    for block in blocks
+                ]
+            )
+            result = {"count": 0, "blocks": []}
+            for block, (error, courses) in zip(blocks, fetched):
+                if error is not None:
+                    return error
+                result["count"] += len(courses)
+                result["blocks"].append(
+                    {
+                        "block": block,
+                        "kklxdm": head_data[f"bkk{block}_kklxdm"],
+                        "count": len(courses),
+                        "courses": courses,
+                    }
+                )
+            return {"code": 1000, "msg": "获取板块课信息成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取板块课信息超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"获取板块课信息时未记录的错误：{str(e)}"}
+
+    @metered
+    @relogin_on_expiry
+    async def get_block_classes(self, year: int, term: int, block: int, course_id: str):
+        """获取板块课中某门课程的教学班列表，同 Client.get_block_classes"""
+        try:
+            error, head_data = await self._get_block_head(year, term)
+            if error is not None:
+                return error
+            head_data = await self._get_block_display(head_data, year, term, block)
+            classes = await self._get_block_classes(
+                head_data, year, term, block, course_id
+            )
+            if classes is None:
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            kklxdm = head_data[f"bkk{block}_kklxdm"]
+            result = {
+                "count": len(classes),
+                "classes": [
+                    Client.format_block({**j, "kch_id": course_id}, kklxdm)
+                    for j in classes
+                ],
+            }
+            return {"code": 1000, "msg": "获取教学班信息成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "获取教学班信息超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"获取教学班信息时未记录的错误：{str(e)}"}
+
+    async def _get_block_classes(self, head_data, year, term, block, kch_id):
+        """JxbWithKch 接口返回的教学班列表，登录失效时返回None"""
+        url_bkk = urljoin(
+            self.base_url, "xsxk/zzxkyzb_cxJxbWithKchZzxkYzb.html?gnmkdm=N253512"
+        )
+        bkk_res = await self._fetch(
+            "POST",
+            url_bkk,
+            data=Client.get_block_bkk_data(head_data, year, term, block, kch_id),
+            cookies=self.cookies,
+        )
+        if await self._is_login_response(bkk_res):
+            return None
+        return await self._json(bkk_res)
+
+    def clear_block_cache(self):
+        """清除缓存的板块课 head_data"""
+        self._block_heads.clear()
+
+    async def _get_block_head(self, year, term):
+        """获取自主选课首页的 head_data，返回 (错误结果, head_data)"""
+        head_data = self._block_heads.get((year, term))
+        if head_data is not None:
+            return None, head_data
+        url_head = urljoin(
+            self.base_url,
+            "xsxk/zzxkyzb_cxZzxkYzbIndex.html?gnmkdm=N253512&layout=default",
+        )
+        req_head_data = await self._fetch("GET", url_head, cookies=self.cookies)
+        if req_head_data.status != 200:
+            return {"code": 2333, "msg": "教务系统挂了"}, None
+        if await self._is_login_response(req_head_data):
+            return {"code": 1006, "msg": "未登录或已过期，请重新登录"}, None
+        doc = pq(await req_head_data.text())
+        if str(doc("div.nodata")) != "":
+            return {"code": 998, "msg": doc("div.nodata").text()}, None
+        head_data = Client.get_block_head_data(doc)
+        if head_data is None:
+            return {"code": 1005, "msg": "板块课内容为空"}, None
+        self._block_heads[(year, term)] = head_data
+        return None, head_data
+
+    async def _get_block_display(self, head_data, year, term, block):
+        """获取某一板块的 head_data（首页数据加上板块页面的隐藏字段）"""
+        block_head = self._block_heads.get((year, term, block))
+        if block_head is not None:
+            return block_head
+        url_display = urljoin(
+            self.base_url, "xsxk/zzxkyzb_cxZzxkYzbDisplay.html?gnmkdm=N253512"
+        )
+        display_req_data = {
+            "xkkz_id": head_data[f"bkk{block}_xkkz_id"],
+            "xszxzt": "1",
+            "kspage": "0",
+        }
+        req_display_data = await self._fetch(
+            "POST", url_display, data=display_req_data, cookies=self.cookies
+        )
+        block_head = {
+            **head_data,
+            **Client.get_hidden_inputs(pq(await req_display_data.text())),
+        }
+        self._block_heads[(year, term, block)] = block_head
+        return block_head
+
+    async def _get_block_courses(
+        self, head_data, year, term, block, page_size=10, max_pages=100
+    ):
+        """
+        按 kspage/jspage 翻页获取某一板块的全部课程，返回 (错误结果, 课程列表)
+        教务系统忽略翻页参数时每次返回相同的课程，与上一页课程号相同或达到 max_pages 时停止
+        """
+        url_kch = urljoin(
+            self.base_url, "xsxk/zzxkyzb_cxZzxkYzbPartDisplay.html?gnmkdm=N253512"
+        )
+        head_data = await self._get_block_display(head_data, year, term, block)
+        temp_list = []
+        previous = None
+        start = 1
+        for _ in range(max_pages):
+            kch_res = await self._fetch(
+                "POST",
+                url_kch,
+                data=Client.get_block_kch_data(
+                    head_data, year, term, block, start, start + page_size - 1
+                ),
+                cookies=self.cookies,
+            )
+            if await self._is_login_response(kch_res):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}, None
+            page = (await self._json(kch_res))["tmpList"]
+            kch_ids = [item["kch_id"] for item in page]
+            if kch_ids == previous:
+                break
+            previous = kch_ids
+            temp_list.extend(page)
+            if len(page) < page_size:
+                break
+            start += page_size
+        # 教学班详情按课程号获取，同一课程号的行与返回的教学班按顺序对应
+        rows = {}
+        for item in temp_list:
+            rows.setdefault(item["kch_id"], []).append(item)
+        for kch_id, items in rows.items():
+            jbkk_res = await self._get_block_classes(
+                head_data, year, term, block, kch_id
+            )
+            if jbkk_res is None:
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}, None
+            if block != 3 and len(items) != len(jbkk_res):
+                return {"code": 999, "msg": "板块课编号及长度错误"}, None
+            for item, detail in zip(items, jbkk_res):
+                item.update(detail)
+        kklxdm = head_data[f"bkk{block}_kklxdm"]
+        return None, [Client.format_block(j, kklxdm) for j in temp_list]
+
+    @metered
+    @relogin_on_expiry
+    async def select_course(
+        self,
+        sid: str,
+        course_id: str,
+        do_id: str,
+        kklxdm: str,
+        year: int,
+        term: int,
+    ):
+        """选课"""
+        try:
+            url_select = urljoin(
+                self.base_url, "xsxk/zzxkyzb_xkBcZyZzxkYzb.html?gnmkdm=N253512"
+            )
+            select_data = Client.get_select_data(
+                sid, course_id, do_id, kklxdm, year, term
+            )
+            req_select = await self._fetch(
+                "POST", url_select, data=select_data, cookies=self.cookies
+            )
+            if req_select.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            if await self._is_login_response(req_select):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            result = await self._json(req_select)
+            return {"code": 1000, "msg": "选课成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "选课超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"选课时未记录的错误：{str(e)}"}
+
+    @metered
+    @relogin_on_expiry
+    async def cancel_course(self, do_id: str, course_id: str, year: int, term: int):
+        """取消选课"""
+        try:
+            url_cancel = urljoin(
+                self.base_url, "xsxk/zzxkyzb_tuikBcZzxkYzb.html?gnmkdm=N253512"
+            )
+            term = term**2 * 3
+            cancel_data = {
+                "jxb_ids": do_id,
+                "kch_id": course_id,
+                "xkxnm": str(year),
+                "xkxqm": str(term),
+            }
+            req_cancel = await self._fetch(
+                "POST", url_cancel, data=cancel_data, cookies=self.cookies
+            )
+            if req_cancel.status != 200:
+                return {"code": 2333, "msg": "教务系统挂了"}
+            text_cancel = await req_cancel.text()
+            if await self._is_login_response(req_cancel):
+                return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+            result = {"status": re.findall(r"(\d+)", text_cancel)[0]}
+            return {"code": 1000, "msg": "退课成功", "data": result}
+        except asyncio.TimeoutError:
+            return {"code": 1003, "msg": "选课超时"}
+        except (
+            aiohttp.ClientError,
+            json.decoder.JSONDecodeError,
+            AttributeError,
+        ):
+            traceback.print_exc()
+            return {"code": 2333, "msg": "请重试，若多次失败可能是系统错误维护或需更新接口"}
+        except Exception as e:
+            traceback.print_exc()
+            return {"code": 999, "msg": f"选课时未记录的错误：{str(e)}"}
+
+    # ============= utils =================
+
+    @metered
+    @relogin_on_expiry
+    async def get_gpa(self):
+        """获取GPA"""
+        url = urljoin(
+            self.base_url,
+            "xsxy/xsxyqk_cxXsxyqkIndex.html?gnmkdm=N105515&layout=default",
+        )
+        req_gpa = await self._fetch("GET", url, cookies=self.cookies)
+        if await self._is_login_response(req_gpa):
+            return {"code": 1006, "msg": "未登录或已过期，请重新登录"}
+        doc = pq(await req_gpa.text())
+        allc_str = [allc.text() for allc in doc("font[size='2px']").items()]
+        try:
+            gpa = float(allc_str[2])
+            return gpa
+        except Exception:
+            return "init"
+
+    async def get_course_category(self, type, item):
+        """根据课程号获取类别，结果在所有客户端间按 (base_url, 课程号) 共享缓存"""
+        if type not in self.detail_category_type:
+            return item.get("KCLBMC")
+        if not item.get("KCH"):
+            return None
+        if self.category_cache is None:
+            return await self._get_course_category(item["KCH"])
+        return await self.category_cache.async_get_or_fetch(
+            self.base_url, item["KCH"], partial(self._get_course_category, item["KCH"])
+        )
+
+    async def _get_course_category(self, kch):
+        url = urljoin(self.base_url, f"jxjhgl/common_cxKcJbxx.html?id={kch}")
+        req_category = await self._fetch("GET", url, cookies=self.cookies)
+        return Client.parse_course_category(await req_category.text())
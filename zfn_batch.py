@@ -0,0 +1,224 @@
+import asyncio
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from zfn_api import Client
+from zfn_async import AsyncClient
+from zfn_pool import PoolRegistry, pool_registry
+
+
+class BatchStats:
+    """批量任务的吞吐量及各操作耗时统计"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.jobs = 0
+        self.latencies = defaultdict(list)
+        self.codes = defaultdict(Counter)
+
+    def record(self, job_result):
+        self.jobs += 1
+        for item in job_result["results"]:
+            self.latencies[item["operation"]].append(item["elapsed"])
+            self.codes[item["operation"]][self.result_code(item["result"])] += 1
+
+    @classmethod
+    def result_code(cls, result):
+        """get_gpa 等方法成功时直接返回数值，记为 "ok"，同 zfn_api.metered"""
+        return result.get("code") if isinstance(result, dict) else "ok"
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @classmethod
+    def percentile(cls, values, percent):
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+        return values[index]
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        operations = {}
+        for operation, values in self.latencies.items():
+            values = sorted(values)
+            operations[operation] = {
+                "count": len(values),
+                "avg": sum(values) / len(values),
+                "p50": self.percentile(values, 50),
+                "p95": self.percentile(values, 95),
+                "max": values[-1],
+                "codes": dict(self.codes[operation]),
+            }
+        return {
+            "jobs": self.jobs,
+            "elapsed": elapsed,
+            "throughput": self.jobs / elapsed if elapsed > 0 else None,  # 每秒完成学生数
+            "operations": operations,
+        }
+
+
+class BaseBatchRunner:
+    """
+    批量执行多个账号的查询
+    jobs 中每一项为 (sid, auth, operations[, client_kwargs])：
+        auth: cookies 字典，或密码字符串（先登录，需要验证码的账号直接返回1001）
+        operations: 方法名或 (方法名, args[, kwargs]) 组成的列表，如 ["get_info", ("get_grade", (2024, 1))]
+    per_host: 同一教务系统主机同时在途的请求数上限，None 表示不限制；
+        在传输层按请求计数（get_academia 等操作内部并发的每个请求、登录的每一步各占一个名额），
+        通过 pool_registry.configure(base_url, max_requests=per_host) 设置，对进程内所有 Client 生效
+    """
+
+    def __init__(self, client_kwargs=None, max_workers=32, per_host=8):
+        self.client_kwargs = client_kwargs or {}
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.stats = None
+        self._hosts = set()
+        self._hosts_lock = threading.Lock()
+
+    @classmethod
+    def parse_job(cls, job):
+        sid, auth, operations = job[:3]
+        client_kwargs = job[3] if len(job) > 3 else {}
+        return sid, auth, [cls.parse_operation(i) for i in operations], client_kwargs
+
+    @classmethod
+    def parse_operation(cls, operation):
+        if isinstance(operation, str):
+            return operation, (), {}
+        name, args, *rest = operation
+        return name, tuple(args), rest[0] if rest else {}
+
+    def limit_host(self, base_url):
+        """首次遇到某主机时为其设置进程级的请求数上限"""
+        if self.per_host is None:
+            return
+        origin = PoolRegistry.origin(base_url)
+        with self._hosts_lock:
+            if origin in self._hosts:
+                return
+            self._hosts.add(origin)
+        pool_registry.configure(base_url, max_requests=self.per_host)
+
+    @classmethod
+    def error_result(cls, name, e):
+        """操作抛出的异常转换为与 Client 一致的999错误信息，不中断整个批量任务"""
+        return {"code": 999, "msg": f"{name}时未记录的错误：{str(e)}"}
+
+    def report(self):
+        """运行结束后的统计报告"""
+        return self.stats.report() if self.stats is not None else None
+
+
+class BatchRunner(BaseBatchRunner):
+    """基于线程池的批量执行器，run() 按完成顺序逐个产出每个账号的结果"""
+
+    def run_job(self, job):
+        sid, auth, operations, client_kwargs = self.parse_job(job)
+        kwargs = {**self.client_kwargs, **client_kwargs}
+        client = Client(auth if isinstance(auth, dict) else {}, **kwargs)
+        self.limit_host(kwargs.get("base_url"))
+        results = []
+        if isinstance(auth, str):
+            operations = [("login", (sid, auth), {})] + operations
+        for name, args, op_kwargs in operations:
+            start = time.perf_counter()
+            try:
+                result = getattr(client, name)(*args, **op_kwargs)
+            except Exception as e:
+                traceback.print_exc()
+                result = self.error_result(name, e)
+            elapsed = time.perf_counter() - start
+            results.append(
+                {"operation": name, "args": args, "result": result, "elapsed": elapsed}
+            )
+            if name == "login" and BatchStats.result_code(result) != 1000:
+                break
+        return {"sid": sid, "cookies": client.cookies, "results": results}
+
+    def run(self, jobs):
+        """执行任务，按完成顺序产出结果；同时在途的任务数不超过 max_workers 的两倍"""
+        self.stats = BatchStats()
+        jobs = iter(jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            exhausted = False
+            try:
+                while True:
+                    while not exhausted and len(pending) < self.max_workers * 2:
+                        job = next(jobs, None)
+                        if job is None:
+                            exhausted = True
+                            break
+                        pending.add(executor.submit(self.run_job, job))
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job_result = future.result()
+                        self.stats.record(job_result)
+                        yield job_result
+            finally:
+                for future in pending:
+                    future.cancel()
+        self.stats.finish()
+
+
+class AsyncBatchRunner(BaseBatchRunner):
+    """基于 asyncio 的批量执行器，run() 为异步生成器，max_workers 为同时在途的账号数"""
+
+    async def run_job(self, job):
+        sid, auth, operations, client_kwargs = self.parse_job(job)
+        kwargs = {**self.client_kwargs, **client_kwargs}
+        self.limit_host(kwargs.get("base_url"))
+        results = []
+        if isinstance(auth, str):
+            operations = [("login", (sid, auth), {})] + operations
+        async with AsyncClient(auth if isinstance(auth, dict) else {}, **kwargs) as client:
+            for name, args, op_kwargs in operations:
+                start = time.perf_counter()
+                try:
+                    result = await getattr(client, name)(*args, **op_kwargs)
+                except Exception as e:
+                    traceback.print_exc()
+                    result = self.error_result(name, e)
+                elapsed = time.perf_counter() - start
+                results.append(
+                    {"operation": name, "args": args, "result": result, "elapsed": elapsed}
+                )
+                if name == "login" and BatchStats.result_code(result) != 1000:
+                    break
+            return {"sid": sid, "cookies": client.cookies, "results": results}
+
+    async def run(self, jobs):
+        """执行任务，按完成顺序产出结果"""
+        self.stats = BatchStats()
+        jobs = iter(jobs)
+        pending = set()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.max_workers:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self.run_job(job)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    job_result = task.result()
+                    self.stats.record(job_result)
+                    yield job_result
+        finally:
+            for task in pending:
+                task.cancel()
+        self.stats.finish()
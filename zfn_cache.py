@@ -0,0 +1,607 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，仅依赖原子替换
+    fcntl = None
+
+MISSING = object()
+
+
+def json_size(value):
+    """值按 JSON 序列化后的字节数"""
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+class MemoryCache:
+    """
+    线程安全的内存 LRU 缓存
+    ttl: 默认过期秒数，None 表示不过期
+    max_entries: 最大条目数，超出时淘汰最久未使用的条目
+    max_bytes: 所有值按 sizeof 计算的总大小上限，超出时同样淘汰最久未使用的条目，None 表示不限制
+    """
+
+    def __init__(self, ttl=None, max_entries=10000, max_bytes=None, sizeof=json_size):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires, _ = entry
+            if expires is not None and expires <= time.time():
+                self._pop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def set(self, key, value, ttl=MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        expires = None if ttl is None else time.time() + ttl
+        size = 0 if self.max_bytes is None else self.sizeof(value)
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expires, size)
+            self.size += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None
+                and self.size > self.max_bytes
+                and len(self._data) > 1
+            ):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    基于 SQLite 文件的持久化缓存，值以 JSON 保存
+    ttl: 默认过期秒数，None 表示不过期
+    max_entries: 最大条目数，超出时淘汰最久未访问的条目
+    """
+
+    def __init__(
+        self, path, ttl=None, max_entries=100000, table="cache", max_bytes=None
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT, expires REAL, accessed REAL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)"
+        )
+        self._conn.commit()
+
+    def get(self, key, default=MISSING):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            value, expires = row
+            if expires is not None and expires <= now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return default
+            self._conn.execute(
+                f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value, ttl=MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        now = time.time()
+        expires = None if ttl is None else now + ttl
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires, now),
+            )
+            (count,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            if self.max_bytes is not None:
+                self._evict_bytes(key)
+            self._conn.commit()
+
+    def _evict_bytes(self, key):
+        """按最久未访问的顺序删除条目，直到值的总字节数不超过 max_bytes，保留刚写入的条目"""
+        (total,) = self._conn.execute(
+            f"SELECT COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM {self.table}"
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            f"SELECT key, LENGTH(CAST(value AS BLOB)) FROM {self.table} "
+            "WHERE key != ? ORDER BY accessed",
+            (key,),
+        )
+        evicted = []
+        for old_key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((old_key,))
+            total -= size
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class DirectoryCache:
+    """
+    基于共享目录的持久化缓存，每个键一个 JSON 文件，可供多个进程同时使用
+    写入先写临时文件再原子替换；整个目录共用一个 .lock 文件锁，读取共享、写入及删除互斥，
+    不再为每个键创建锁文件
+    ttl: 默认过期秒数，None 表示不过期
+    """
+
+    LOCK_FILE = ".lock"
+
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = os.path.join(path, self.LOCK_FILE)
+
+    def _file(self, key):
+        return os.path.join(
+            self.path, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+        )
+
+    def _locked(self, exclusive):
+        lock = open(self._lock_file, "a")
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return lock
+
+    def get(self, key, default=MISSING):
+        with self._locked(False):
+            try:
+                with open(self._file(key), encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.decoder.JSONDecodeError):
+                return default
+        if entry["expires"] is not None and entry["expires"] <= time.time():
+            self.delete(key)
+            return default
+        return entry["value"]
+
+    def set(self, key, value, ttl=MISSING):
+        ttl = self.ttl if ttl is MISSING else ttl
+        entry = {"value": value, "expires": None if ttl is None else time.time() + ttl}
+        with self._locked(True):
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp, self._file(key))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    def delete(self, key):
+        with self._locked(True):
+            try:
+                os.unlink(self._file(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._locked(True):
+            for name in os.listdir(self.path):
+                # 同时清理旧版本为每个键创建的 .json.lock 文件
+                if name.endswith((".json", ".json.lock")):
+                    try:
+                        os.unlink(os.path.join(self.path, name))
+                    except FileNotFoundError:
+                        pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.path) if name.endswith(".json"))
+
+
+class CourseCategoryCache:
+    """
+    课程类别的跨 Client 共享缓存，键为 (base_url, 课程号)
+    内存 LRU 为第一级，可选的 SQLite 文件为第二级；同一键的并发查询只会发出一次请求
+    """
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else MemoryCache(ttl=86400)
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._async_inflight = {}
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "shared": 0, "misses": 0}
+
+    @classmethod
+    def key(cls, base_url, kch):
+        return f"{base_url}\t{kch}"
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def lookup(self, key):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISSING:
+                self._count("disk_hits")
+                self.memory.set(key, value)
+                return value
+        return MISSING
+
+    def store(self, key, value):
+        # 解析失败返回的None不缓存，下次重新获取
+        if value is None:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def get_or_fetch(self, base_url, kch, fetch):
+        """命中缓存直接返回，否则调用 fetch() 获取；同一键同时只有一个线程发出请求"""
+        key = self.key(base_url, kch)
+        value = self.lookup(key)
+        if value is not MISSING:
+            return value
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count("shared")
+            return future.result()
+        self._count("misses")
+        try:
+            value = fetch()
+            self.store(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    async def async_get_or_fetch(self, base_url, kch, fetch):
+        """get_or_fetch 的协程版本，fetch 为无参协程函数"""
+        key = self.key(base_url, kch)
+        value = self.lookup(key)
+        if value is not MISSING:
+            return value
+        inflight_key = (id(asyncio.get_running_loop()), key)
+        future = self._async_inflight.get(inflight_key)
+        if future is not None:
+            self._count("shared")
+            return await asyncio.shield(future)
+        future = self._async_inflight[inflight_key] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._count("misses")
+        try:
+            value = await fetch()
+            self.store(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他协程等待时避免出现未获取异常的警告
+            future.exception()
+            raise
+        finally:
+            del self._async_inflight[inflight_key]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        total = sum(counters.values())
+        hits = total - counters["misses"]
+        return {
+            **counters,
+            "lookups": total,
+            "hit_rate": hits / total if total else None,
+            "memory_entries": len(self.memory),
+        }
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+class PublicKeyCache:
+    """
+    登录公钥缓存
+    按 base_url 记住最近获取的 (modulus, exponent)，ttl 秒内的登录跳过获取公钥的请求；
+    解析后的公钥按 (base_url, modulus, exponent) 缓存。复用的公钥登录失败时调用 invalidate，
+    重新获取公钥后登录成功说明该系统的公钥与会话绑定，mark_session_bound 后不再跳过请求
+    """
+
+    def __init__(self, ttl=60, max_entries=1000):
+        self.ttl = ttl
+        self._latest = MemoryCache(ttl=ttl, max_entries=max_entries)
+        self._parsed = MemoryCache(ttl=ttl, max_entries=max_entries)
+        self.session_bound = set()
+
+    def latest(self, base_url):
+        """最近获取的 (modulus, exponent)，公钥与会话绑定或已过期时返回None"""
+        if base_url in self.session_bound:
+            return None
+        return self._latest.get(base_url, None)
+
+    def remember(self, base_url, modulus, exponent):
+        if base_url not in self.session_bound:
+            self._latest.set(base_url, (modulus, exponent))
+
+    def parsed(self, base_url, modulus, exponent, parse):
+        """解析后的公钥，未命中时调用 parse(modulus, exponent)"""
+        key = (base_url, modulus, exponent)
+        value = self._parsed.get(key)
+        if value is MISSING:
+            value = parse(modulus, exponent)
+            self._parsed.set(key, value)
+        return value
+
+    def invalidate(self, base_url):
+        latest = self._latest.get(base_url, None)
+        self._latest.delete(base_url)
+        if latest is not None:
+            self._parsed.delete((base_url, *latest))
+
+    def mark_session_bound(self, base_url):
+        self.session_bound.add(base_url)
+        self.invalidate(base_url)
+
+    def clear(self):
+        self._latest.clear()
+        self._parsed.clear()
+        self.session_bound.clear()
+
+
+class ResponseCache:
+    """
+    查询结果缓存，键为 (base_url, 学号, 方法, 学年, 学期)，只缓存 code 为1000的结果
+    backend: MemoryCache 或 SQLiteCache，条目数及字节数上限在后端配置，默认为 64MB 的内存 LRU
+    ttls: {方法名: 秒数}，覆盖 DEFAULT_TTLS，其余方法使用 ttl
+    stale_ttl: 过期后仍保留的秒数，期间命中时立即返回旧结果并在后台刷新，0 表示过期即重新获取
+    内存后端命中时返回的是缓存中的同一对象，请勿修改
+    """
+
+    DEFAULT_TTLS = {
+        "get_grade": 1800,
+        "get_exam_schedule": 3600,
+        "get_schedule": 21600,
+        "get_academia": 21600,
+    }
+
+    def __init__(self, backend=None, ttls=None, ttl=600, stale_ttl=86400):
+        self.backend = (
+            backend if backend is not None else MemoryCache(max_bytes=64 * 1024 * 1024)
+        )
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._refreshing = set()
+        self._tasks = set()
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "shared": 0,
+            "misses": 0,
+            "refreshes": 0,
+        }
+
+    @classmethod
+    def key(cls, base_url, sid, method, year=None, term=None, extra=()):
+        return "\t".join(str(i) for i in (base_url, sid, method, year, term, *extra))
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def lookup(self, key):
+        """返回 (结果, 是否未过期)，未命中时返回 (None, False)"""
+        entry = self.backend.get(key, None)
+        if entry is None:
+            return None, False
+        return entry["result"], entry["fresh_until"] > time.time()
+
+    def store(self, key, method, result):
+        if not isinstance(result, dict) or result.get("code") != 1000:
+            return
+        ttl = self.ttls.get(method, self.ttl)
+        entry = {"result": result, "fresh_until": time.time() + ttl}
+        self.backend.set(key, entry, ttl + self.stale_ttl)
+
+    def _claim_refresh(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.counters["refreshes"] += 1
+            return True
+
+    def _refresh(self, key, method, fetch):
+        try:
+            self.store(key, method, fetch())
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, key, method, fetch):
+        """未过期时直接返回；过期但仍在 stale_ttl 内时返回旧结果并在后台线程刷新；否则调用 fetch()"""
+        result, fresh = self.lookup(key)
+        if result is not None:
+            if fresh:
+                self._count("hits")
+                return result
+            if self.stale_ttl:
+                self._count("stale_hits")
+                if self._claim_refresh(key):
+                    threading.Thread(
+                        target=self._refresh, args=(key, method, fetch), daemon=True
+                    ).start()
+                return result
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count("shared")
+            return future.result()
+        self._count("misses")
+        try:
+            result = fetch()
+            self.store(key, method, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    async def _async_refresh(self, key, method, fetch):
+        try:
+            self.store(key, method, await fetch())
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def async_get_or_fetch(self, key, method, fetch):
+        """get_or_fetch 的协程版本，fetch 为无参协程函数，后台刷新以任务执行"""
+        result, fresh = self.lookup(key)
+        if result is not None:
+            if fresh:
+                self._count("hits")
+                return result
+            if self.stale_ttl:
+                self._count("stale_hits")
+                if self._claim_refresh(key):
+                    task = asyncio.ensure_future(
+                        self._async_refresh(key, method, fetch)
+                    )
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return result
+        inflight_key = (id(asyncio.get_running_loop()), key)
+        future = self._async_inflight.get(inflight_key)
+        if future is not None:
+            self._count("shared")
+            return await asyncio.shield(future)
+        future = self._async_inflight[inflight_key] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._count("misses")
+        try:
+            result = await fetch()
+            self.store(key, method, result)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._async_inflight[inflight_key]
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = sum(counters.values()) - counters["refreshes"]
+        return {
+            **counters,
+            "lookups": lookups,
+            "hit_rate": (lookups - counters["misses"]) / lookups if lookups else None,
+            "entries": len(self.backend),
+        }
+
+    def clear(self):
+        self.backend.clear()
+
+
+course_category_cache = CourseCategoryCache()
+public_key_cache = PublicKeyCache()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class ClassroomIndex:
+    """
+    空教室位图索引，键为 (base_url, 学年, 学期, 校区)，可在所有 Client 间共享
+    每间教室保存一个整数位图，第 ((周-1)*7 + 星期-1)*sessions + 节-1 位为1表示该节空闲
+    教务系统的数据按天批量写入，之后同一天的查询在本地完成；超过 ttl 秒的天重新获取
+    ttl: 每天数据的有效秒数，None 表示不过期
+    sessions: 每天最大节数
+    """
+
+    def __init__(self, ttl=3600, sessions=16):
+        self.ttl = ttl
+        self.sessions = sessions
+        self._day_mask = (1 << sessions) - 1
+        self._lock = threading.Lock()
+        self._terms = {}
+
+    @classmethod
+    def key(cls, base_url, year, term, campus):
+        return (base_url, int(year), int(term), str(campus))
+
+    def _offset(self, week, weekday):
+        if week < 1 or not 1 <= weekday <= 7:
+            raise ValueError(f"周次或星期超出范围：第{week}周 星期{weekday}")
+        return ((week - 1) * 7 + weekday - 1) * self.sessions
+
+    def _session_mask(self, sessions):
+        mask = 0
+        for session in sessions:
+            if not 1 <= session <= self.sessions:
+                raise ValueError(f"节次超出范围：第{session}节")
+            mask |= 1 << (session - 1)
+        return mask
+
+    def is_fresh(self, key, week, weekday, sessions=()):
+        """某天的数据是否已加载、未过期且包含 sessions 中的所有节次"""
+        with self._lock:
+            loaded = self._terms.get(key, {}).get("loaded", {}).get((week, weekday))
+        if loaded is None:
+            return False
+        loaded_at, loaded_sessions = loaded
+        if max(sessions, default=0) > loaded_sessions:
+            return False
+        return self.ttl is None or time.time() - loaded_at < self.ttl
+
+    def update(self, key, week, weekday, day):
+        """
+        写入某天的数据，day 为 {节次: [空闲教室]}，未出现在列表中的教室视为占用
+        day 中最大的节次记为当天已加载的节数，查询更晚的节次时视为未加载
+        """
+        offset = self._offset(week, weekday)
+        self._session_mask(day)
+        clear = ~(self._day_mask << offset)
+        with self._lock:
+            term = self._terms.setdefault(key, {"rooms": {}, "free": {}, "loaded": {}})
+            for room_id in term["free"]:
+                term["free"][room_id] &= clear
+            for session, rooms in day.items():
+                bit = 1 << (offset + session - 1)
+                for room in rooms:
+                    term["rooms"][room["room_id"]] = room
+                    term["free"][room["room_id"]] = (
+                        term["free"].get(room["room_id"], 0) | bit
+                    )
+            term["loaded"][(week, weekday)] = (time.time(), max(day, default=0))
+
+    def query(self, key, week, weekday, sessions):
+        """查询所有给定节次均空闲的教室"""
+        mask = self._session_mask(sessions) << self._offset(week, weekday)
+        with self._lock:
+            term = self._terms.get(key)
+            if term is None:
+                return []
+            return [
+                term["rooms"][room_id]
+                for room_id, free in term["free"].items()
+                if free & mask == mask
+            ]
+
+    def invalidate(self, key, week=None, weekday=None):
+        """使某学期（或其中某天）的数据失效，下次查询时重新获取"""
+        with self._lock:
+            term = self._terms.get(key)
+            if term is None:
+                return
+            if week is None:
+                term["loaded"].clear()
+            else:
+                term["loaded"].pop((week, weekday), None)
+
+    def clear(self):
+        with self._lock:
+            self._terms.clear()
+
+
+classroom_index = ClassroomIndex()
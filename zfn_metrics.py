@@ -0,0 +1,327 @@
+import contextvars
+import re
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import requests
+from requests import exceptions
+
+# 当前逻辑操作（Client 的方法名），由 metered 装饰器设置，请求按此打标签
+current_operation = contextvars.ContextVar("zfn_operation", default="other")
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def endpoint_of(url):
+    """
+    请求地址最后一段去掉 .html，如 cjcx_cxXsgrcj
+    pdf 等文件的名称每次不同，统一记为 file，避免标签取值无限增长
+    """
+    path = unquote(urlsplit(str(url)).path).rstrip("/\\")
+    name = re.split(r"[/\\]", path)[-1].split(";", 1)[0]
+    if name.endswith(".html"):
+        return name[: -len(".html")]
+    if "." in name:
+        return "file"
+    return name or "/"
+
+
+def error_of(e):
+    if isinstance(e, (exceptions.Timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(e, (exceptions.ConnectionError, ConnectionError)):
+        return "connection"
+    return type(e).__name__
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    教务系统请求指标，可在所有 Client 间共享
+    请求级：按 (学校, 操作, 接口) 记录耗时直方图、HTTP 状态码、网络错误及收发字节数
+    调用级：按 (学校, 操作) 记录耗时直方图及返回的 code（1000/1003/1006/2333 等）
+    学校为 base_url 的主机名；hooks 中的函数在每次记录时以事件字典调用，可用于告警
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.request_seconds = defaultdict(lambda: Histogram(self.buckets))
+            self.request_statuses = defaultdict(int)
+            self.request_errors = defaultdict(int)
+            self.request_bytes = defaultdict(int)
+            self.result_seconds = defaultdict(lambda: Histogram(self.buckets))
+            self.result_codes = defaultdict(int)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _emit(self, event):
+        for hook in list(self.hooks):
+            try:
+                hook(event)
+            except Exception:
+                traceback.print_exc()
+
+    def observe_request(
+        self, school, endpoint, method, status, elapsed, sent=0, received=0, error=None
+    ):
+        operation = current_operation.get()
+        labels = (school, operation, endpoint)
+        with self._lock:
+            self.request_seconds[labels].observe(elapsed)
+            if error is None:
+                self.request_statuses[(*labels, str(status))] += 1
+            else:
+                self.request_errors[(*labels, error)] += 1
+            self.request_bytes[(*labels, "sent")] += sent
+            self.request_bytes[(*labels, "received")] += received
+        self._emit(
+            {
+                "type": "request",
+                "school": school,
+                "operation": operation,
+                "endpoint": endpoint,
+                "method": method,
+                "status": status,
+                "error": error,
+                "elapsed": elapsed,
+                "sent": sent,
+                "received": received,
+            }
+        )
+
+    def observe_received(self, school, operation, endpoint, received):
+        """流式响应的内容在读取时才计入接收字节数"""
+        with self._lock:
+            self.request_bytes[(school, operation, endpoint, "received")] += received
+
+    def observe_result(self, school, operation, code, elapsed):
+        with self._lock:
+            self.result_seconds[(school, operation)].observe(elapsed)
+            self.result_codes[(school, operation, str(code))] += 1
+        self._emit(
+            {
+                "type": "result",
+                "school": school,
+                "operation": operation,
+                "code": code,
+                "elapsed": elapsed,
+            }
+        )
+
+    @classmethod
+    def _labels(cls, names, values):
+        pairs = []
+        for name, value in zip(names, values):
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+            pairs.append(f'{name}="{value}"')
+        return ",".join(pairs)
+
+    def _histogram_lines(self, name, names, histograms):
+        lines = [f"# TYPE {name} histogram"]
+        for values, histogram in sorted(histograms.items()):
+            labels = self._labels(names, values)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return lines
+
+    def _counter_lines(self, name, names, counters):
+        lines = [f"# TYPE {name} counter"]
+        for values, count in sorted(counters.items()):
+            lines.append(f"{name}{{{self._labels(names, values)}}} {count}")
+        return lines
+
+    def render(self):
+        """Prometheus 文本格式"""
+        request = ("school", "operation", "endpoint")
+        result = ("school", "operation")
+        with self._lock:
+            lines = [
+                *self._histogram_lines(
+                    "zfn_request_duration_seconds", request, self.request_seconds
+                ),
+                *self._counter_lines(
+                    "zfn_requests_total", (*request, "status"), self.request_statuses
+                ),
+                *self._counter_lines(
+                    "zfn_request_errors_total", (*request, "error"), self.request_errors
+                ),
+                *self._counter_lines(
+                    "zfn_request_bytes_total", (*request, "direction"), self.request_bytes
+                ),
+                *self._histogram_lines(
+                    "zfn_call_duration_seconds", result, self.result_seconds
+                ),
+                *self._counter_lines(
+                    "zfn_calls_total", (*result, "code"), self.result_codes
+                ),
+            ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """
+        在后台线程启动 HTTP 服务，GET /metrics 返回 render() 的内容，返回服务对象
+        默认只监听本机，需要被其他主机抓取时传入 host="0.0.0.0"
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class MeteredSession(requests.Session):
+    """发出的每个请求都记录到 metrics 的 Session，metrics 为None时不记录"""
+
+    def __init__(self, metrics=None, school=""):
+        super().__init__()
+        self.metrics = metrics
+        self.school = school
+
+    def send(self, request, **kwargs):
+        if self.metrics is None:
+            return super().send(request, **kwargs)
+        endpoint = endpoint_of(request.url)
+        body = request.body or b""
+        sent = len(body.encode("utf-8") if isinstance(body, str) else body)
+        start = time.perf_counter()
+        try:
+            resp = super().send(request, **kwargs)
+        except exceptions.RequestException as e:
+            self.metrics.observe_request(
+                self.school,
+                endpoint,
+                request.method,
+                None,
+                time.perf_counter() - start,
+                sent,
+                error=error_of(e),
+            )
+            raise
+        if kwargs.get("stream"):
+            # 流式下载此时尚未读取内容（分块传输也没有 Content-Length），读取时再计入接收字节数
+            received = 0
+            self._count_stream(resp, endpoint)
+        else:
+            received = len(resp.content)
+        self.metrics.observe_request(
+            self.school,
+            endpoint,
+            request.method,
+            resp.status_code,
+            time.perf_counter() - start,
+            sent,
+            received,
+        )
+        return resp
+
+    def _count_stream(self, resp, endpoint):
+        operation = current_operation.get()
+        iter_content = resp.iter_content
+
+        def counted(*args, **kwargs):
+            for chunk in iter_content(*args, **kwargs):
+                self.metrics.observe_received(
+                    self.school, operation, endpoint, len(chunk)
+                )
+                yield chunk
+
+        # Response.content 同样通过 iter_content 读取
+        resp.iter_content = counted
+
+
+class DegradationAlert:
+    """
+    告警钩子：按学校统计最近 window 次调用，失败（code 不为1000/1005）比例超过 error_rate
+    或 p95 耗时超过 p95 秒时调用 callback(school, status)；恢复时再次调用，status["degraded"] 为 False
+    用法：metrics.add_hook(DegradationAlert(callback))
+    """
+
+    OK_CODES = {"1000", "1005"}
+
+    def __init__(self, callback, window=100, error_rate=0.2, p95=None, min_calls=20):
+        self.callback = callback
+        self.window = window
+        self.error_rate = error_rate
+        self.p95 = p95
+        self.min_calls = min_calls
+        self._lock = threading.Lock()
+        self._calls = defaultdict(lambda: deque(maxlen=window))
+        self.degraded = set()
+
+    def __call__(self, event):
+        if event["type"] != "result":
+            return
+        school = event["school"]
+        with self._lock:
+            calls = self._calls[school]
+            calls.append((str(event["code"]) in self.OK_CODES, event["elapsed"]))
+            if len(calls) < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in calls if not ok)
+            latencies = sorted(elapsed for _, elapsed in calls)
+            status = {
+                "calls": len(calls),
+                "error_rate": failures / len(calls),
+                "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+            }
+            degraded = status["error_rate"] > self.error_rate or (
+                self.p95 is not None and status["p95"] > self.p95
+            )
+            status["degraded"] = degraded
+            changed = degraded != (school in self.degraded)
+            if degraded:
+                self.degraded.add(school)
+            else:
+                self.degraded.discard(school)
+        if changed:
+            self.callback(school, status)
+
+
+metrics = Metrics()
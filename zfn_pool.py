@@ -0,0 +1,236 @@
+import asyncio
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
+
+
+class SharedAdapter(HTTPAdapter):
+    """
+    跨 Client 共享的长连接适配器
+    每个 Client 仍使用独立的 requests.Session（cookies 互相隔离），只复用底层 socket
+    max_requests: 同时在途的请求数上限，None 表示不限制；响应体读取完毕或关闭后才释放名额
+    """
+
+    def __init__(self, max_idle=60, max_requests=None, **kwargs):
+        self.max_idle = max_idle
+        self.max_requests = max_requests
+        self._limit = self._semaphore(max_requests)
+        self.last_used = time.monotonic()
+        self._stats_lock = threading.Lock()
+        # 已被回收的连接池的累计计数
+        self._closed_requests = 0
+        self._closed_connections = 0
+        super().__init__(**kwargs)
+
+    @classmethod
+    def _semaphore(cls, max_requests):
+        if max_requests is None:
+            return None
+        return threading.BoundedSemaphore(max_requests)
+
+    def send(self, request, **kwargs):
+        limit = self._limit
+        if limit is None:
+            return self._send(request, **kwargs)
+        limit.acquire()
+        try:
+            resp = self._send(request, **kwargs)
+        except BaseException:
+            limit.release()
+            raise
+        self._release_on_close(resp, limit)
+        return resp
+
+    def _send(self, request, **kwargs):
+        now = time.monotonic()
+        if self.max_idle is not None and now - self.last_used > self.max_idle:
+            # 空闲过久的连接大概率已被服务端断开，直接丢弃重建
+            self.reset()
+        self.last_used = now
+        return super().send(request, **kwargs)
+
+    @classmethod
+    def _release_on_close(cls, resp, limit):
+        """
+        响应体读完（urllib3 自动归还连接）或 Response.close() 时释放名额，
+        两者都会调用 raw.release_conn；响应未读完即被回收时由 finalize 兜底释放
+        """
+        raw = resp.raw
+        original = raw.release_conn
+        released = threading.Lock()
+
+        def release():
+            if released.acquire(blocking=False):
+                limit.release()
+
+        def release_conn():
+            try:
+                original()
+            finally:
+                release()
+
+        raw.release_conn = release_conn
+        weakref.finalize(resp, release)
+
+    def close(self):
+        # Session.close() 会关闭挂载的适配器，共享适配器只允许由注册表回收
+        pass
+
+    def reset(self):
+        """关闭所有空闲连接并保留计数"""
+        with self._stats_lock:
+            requests_count, connections_count = self._live_counts()
+            self._closed_requests += requests_count
+            self._closed_connections += connections_count
+            self.poolmanager.clear()
+            for proxy in self.proxy_manager.values():
+                proxy.clear()
+
+    def reconfigure(
+        self, pool_connections, pool_maxsize, pool_block, max_idle, max_requests
+    ):
+        """按新配置重建连接池，已挂载该适配器的会话无需重新挂载"""
+        self.reset()
+        self.max_idle = max_idle
+        if max_requests != self.max_requests:
+            # 在途请求仍释放到旧的信号量
+            self.max_requests = max_requests
+            self._limit = self._semaphore(max_requests)
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self.init_poolmanager(pool_connections, pool_maxsize, block=pool_block)
+
+    def _live_counts(self):
+        pools = [
+            pool
+            for pool in map(self.poolmanager.pools.get, self.poolmanager.pools.keys())
+            if pool is not None
+        ]
+        return (
+            sum(pool.num_requests for pool in pools),
+            sum(pool.num_connections for pool in pools),
+        )
+
+    @property
+    def stats(self):
+        """hits: 复用已有连接的请求数，misses: 新建连接数"""
+        with self._stats_lock:
+            requests_count, connections_count = self._live_counts()
+            requests_count += self._closed_requests
+            connections_count += self._closed_connections
+        return {
+            "hits": max(requests_count - connections_count, 0),
+            "misses": connections_count,
+            "requests": requests_count,
+        }
+
+
+class PoolRegistry:
+    """
+    进程级连接池注册表，按 base_url 的 scheme://host:port 共享连接
+    pool_connections: 每个适配器缓存的主机连接池数量
+    pool_maxsize: 每个主机保持的最大连接数
+    pool_block: 为True时连接数达到pool_maxsize后阻塞等待，即严格限制单主机连接数
+    max_idle: 连接池最长空闲秒数，超过后丢弃旧连接，None表示不限制
+    max_requests: 单主机同时在途的请求数上限，进程内所有 Client 共用，None表示不限制；
+        AsyncClient 的请求通过 async_limit 在每个事件循环内按同一上限限制
+    """
+
+    def __init__(
+        self,
+        pool_connections=DEFAULT_POOLSIZE,
+        pool_maxsize=DEFAULT_POOLSIZE,
+        pool_block=DEFAULT_POOLBLOCK,
+        max_idle=60,
+        max_requests=None,
+    ):
+        self.defaults = {
+            "pool_connections": pool_connections,
+            "pool_maxsize": pool_maxsize,
+            "pool_block": pool_block,
+            "max_idle": max_idle,
+            "max_requests": max_requests,
+        }
+        self.overrides = {}
+        self.adapters = {}
+        # {事件循环: {origin: (上限, asyncio.Semaphore)}}
+        self._async_limits = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def origin(cls, base_url):
+        parts = urlsplit(base_url)
+        return f"{parts.scheme}://{parts.netloc}/"
+
+    def configure(self, base_url=None, **kwargs):
+        """修改默认配置，传入base_url时仅修改该主机的配置；已创建的连接池按新配置重建"""
+        unknown = set(kwargs) - set(self.defaults)
+        if unknown:
+            raise TypeError(f"未知的连接池配置：{', '.join(sorted(unknown))}")
+        with self._lock:
+            if base_url is None:
+                self.defaults.update(kwargs)
+                origins = list(self.adapters)
+            else:
+                origin = self.origin(base_url)
+                self.overrides.setdefault(origin, {}).update(kwargs)
+                origins = [origin] if origin in self.adapters else []
+            for origin in origins:
+                self.adapters[origin].reconfigure(**self._config(origin))
+
+    def _config(self, origin):
+        return {**self.defaults, **self.overrides.get(origin, {})}
+
+    def get(self, base_url):
+        """获取base_url对应的共享适配器"""
+        origin = self.origin(base_url)
+        with self._lock:
+            adapter = self.adapters.get(origin)
+            if adapter is None:
+                adapter = SharedAdapter(**self._config(origin))
+                self.adapters[origin] = adapter
+            return adapter
+
+    def async_limit(self, base_url):
+        """
+        当前事件循环内 base_url 所在主机的 asyncio.Semaphore，未设置 max_requests 时返回None
+        需在事件循环内调用；修改上限后新建信号量，在途请求仍释放到旧的信号量
+        """
+        origin = self.origin(base_url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            max_requests = self._config(origin)["max_requests"]
+            if max_requests is None:
+                return None
+            limits = self._async_limits.setdefault(loop, {})
+            current = limits.get(origin)
+            if current is None or current[0] != max_requests:
+                current = (max_requests, asyncio.Semaphore(max_requests))
+                limits[origin] = current
+            return current[1]
+
+    def mount(self, sess, base_url):
+        """将共享适配器挂载到会话上"""
+        sess.mount(self.origin(base_url), self.get(base_url))
+        return sess
+
+    def stats(self):
+        """各主机连接池命中统计"""
+        with self._lock:
+            adapters = dict(self.adapters)
+        return {origin: adapter.stats for origin, adapter in adapters.items()}
+
+    def clear(self):
+        """关闭并移除所有连接池"""
+        with self._lock:
+            adapters = list(self.adapters.values())
+            self.adapters.clear()
+        for adapter in adapters:
+            adapter.reset()
+
+
+pool_registry = PoolRegistry()
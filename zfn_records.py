@@ -0,0 +1,174 @@
+class Record:
+    """
+    以 __slots__ 保存字段的结果记录，字段名与对应 format_* 返回的字典键一致
+    支持 record.title 与 record["title"]、record.get("title") 两种访问方式，to_dict() 返回原来的字典
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def keys(self):
+        return self.__slots__
+
+    def get(self, name, default=None):
+        return getattr(self, name, default) if name in self.__slots__ else default
+
+    def __getitem__(self, name):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def __contains__(self, name):
+        return name in self.__slots__
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return type(self) is type(other) and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Grade(Record):
+    """成绩，同 Client.format_grade"""
+
+    __slots__ = (
+        "course_id",
+        "title",
+        "teacher",
+        "class_name",
+        "credit",
+        "category",
+        "nature",
+        "grade",
+        "grade_point",
+        "grade_nature",
+        "start_college",
+        "mark",
+    )
+
+
+class ExamEntry(Record):
+    """考试信息，同 Client.format_exam"""
+
+    __slots__ = (
+        "course_id",
+        "title",
+        "time",
+        "location",
+        "xq",
+        "zwh",
+        "cxbj",
+        "exam_name",
+        "teacher",
+        "class_name",
+        "kkxy",
+        "credit",
+        "ksfs",
+        "sjbh",
+        "bz",
+    )
+
+
+class ScheduleEntry(Record):
+    """课表课程，同 Client.format_schedule"""
+
+    __slots__ = (
+        "course_id",
+        "title",
+        "teacher",
+        "class_name",
+        "credit",
+        "weekday",
+        "time",
+        "sessions",
+        "list_sessions",
+        "weeks",
+        "list_weeks",
+        "evaluation_mode",
+        "campus",
+        "place",
+        "hours_composition",
+        "weekly_hours",
+        "total_hours",
+    )
+
+
+class SelectedCourse(Record):
+    """已选课程，同 Client.format_selected"""
+
+    __slots__ = (
+        "course_id",
+        "class_id",
+        "do_id",
+        "title",
+        "teacher_id",
+        "teacher",
+        "credit",
+        "category",
+        "capacity",
+        "selected_number",
+        "place",
+        "time",
+        "optional",
+        "waiting",
+    )
+
+
+class AcademiaCourse(Record):
+    """学业情况课程，同 Client.format_academia"""
+
+    __slots__ = (
+        "course_id",
+        "title",
+        "situation",
+        "display_term",
+        "credit",
+        "category",
+        "nature",
+        "max_grade",
+        "grade_point",
+    )
+
+
+def to_records(result, record_type):
+    """
+    将查询结果中的课程字典转换为 record_type，返回新的结果字典，不修改传入的结果（可能来自缓存）
+    学业情况的课程位于 data["details"][*]["courses"]，其余位于 data["courses"]
+    """
+    if not isinstance(result, dict) or result.get("code") != 1000:
+        return result
+    data = result["data"]
+    if "details" in data:
+        data = {
+            **data,
+            "details": [
+                {**i, "courses": [record_type.from_dict(j) for j in i["courses"]]}
+                for i in data["details"]
+            ],
+        }
+    else:
+        data = {
+            **data,
+            "courses": [record_type.from_dict(i) for i in data["courses"]],
+        }
+    return {**result, "data": data}
@@ -0,0 +1,687 @@
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+from http.client import HTTPMessage
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from itertools import chain
+from types import SimpleNamespace
+from urllib.parse import parse_qsl, urljoin, urlsplit
+
+import requests
+from pyquery import PyQuery as pq
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from zfn_metrics import endpoint_of
+from zfn_pool import PoolRegistry
+
+LOGIN_PATH = "xtgl/login_slogin.html"
+KEY_PATH = "xtgl/login_getPublicKey.html"
+INDEX_PATH = "xtgl/index_initMenu.html"
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>教学管理信息服务平台</title></head>
+<body>
+<h5>用户登录</h5>
+<form id="form1" action="login_slogin.html" method="post">
+<input type="hidden" id="csrftoken" name="csrftoken" value="{token}"/>
+<input type="text" id="yhm" name="yhm"/>
+<input type="password" id="mm" name="mm"/>
+</form>
+</body>
+</html>"""
+INDEX_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>教学管理信息服务平台</title></head>
+<body></body>
+</html>"""
+ERROR_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>错误提示</title></head>
+<body><p class="error_title">系统繁忙，请稍后再试</p></body>
+</html>"""
+# 录制时 PDF 替换为该最小文件，保留 %PDF 文件头供 get_schedule_pdf 校验
+PDF_STUB = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n% scrubbed\n%%EOF\n"
+
+
+def parse_form(body):
+    """请求体按 application/x-www-form-urlencoded 解析，其他类型返回空字典"""
+    if not body:
+        return {}
+    if isinstance(body, bytes):
+        try:
+            body = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return {}
+    if not isinstance(body, str) or "=" not in body:
+        return {}
+    return dict(parse_qsl(body, keep_blank_values=True))
+
+
+class FixtureStore:
+    """
+    录制的请求/响应对，按 (方法, 相对 base_url 的路径) 索引
+    每条为 {"method", "path", "query", "form", "status", "headers", "body", "base64"}，
+    headers 为 [名称, 值] 列表，Location 保存为相对 base_url 的地址；body 为文本，base64 为True时为编码后的二进制
+    同一路径有多条时，选择 query 和 form 中取值相同的字段最多的一条，相同时取先录制的
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self._index = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        entry = {
+            "query": {},
+            "form": {},
+            "status": 200,
+            "headers": [],
+            "body": "",
+            "base64": False,
+            **entry,
+        }
+        entry["method"] = entry["method"].upper()
+        self.entries.append(entry)
+        self._index.setdefault((entry["method"], entry["path"]), []).append(entry)
+        return entry
+
+    def add_response(
+        self, method, path, body, content_type="text/html;charset=utf-8", **kwargs
+    ):
+        """添加一条构造的响应，如 store.add_response("POST", "cjcx/cjcx_cxXsgrcj.html", data)"""
+        if isinstance(body, bytes):
+            body, encoded = base64.b64encode(body).decode(), True
+        else:
+            encoded = False
+        return self.add(
+            {
+                "method": method,
+                "path": path,
+                "headers": [["Content-Type", content_type]],
+                "body": body,
+                "base64": encoded,
+                **kwargs,
+            }
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["entries"])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": 1, "entries": self.entries}, f, ensure_ascii=False, indent=1
+            )
+
+    @classmethod
+    def relative(cls, url, base_url):
+        """请求地址转换为相对 base_url 的路径及查询参数"""
+        parts = urlsplit(url)
+        base_path = urlsplit(base_url or "").path or "/"
+        path = parts.path
+        if path.startswith(base_path):
+            path = path[len(base_path) :]
+        return path, dict(parse_qsl(parts.query, keep_blank_values=True))
+
+    def match(self, method, path, query=None, form=None):
+        candidates = self._index.get((method.upper(), path))
+        if not candidates:
+            return None
+        params = {**(query or {}), **(form or {})}
+
+        def score(entry):
+            fields = chain(entry["query"].items(), entry["form"].items())
+            return sum(1 for key, value in fields if params.get(key) == value)
+
+        return max(candidates, key=score)
+
+    @classmethod
+    def body(cls, entry):
+        if entry["base64"]:
+            return base64.b64decode(entry["body"])
+        return entry["body"].encode("utf-8")
+
+    @classmethod
+    def headers(cls, entry, base_url):
+        """响应头，Location 还原为 base_url 下的绝对地址"""
+        return [
+            [name, urljoin(base_url, value) if name.lower() == "location" else value]
+            for name, value in entry["headers"]
+        ]
+
+
+class Scrubber:
+    """
+    脱敏：学号、姓名替换为固定的占位值，密码、证件号、联系方式等替换为 ***
+    字段按名称脱敏（表单及 JSON），个人信息 HTML 页面按标签识别；
+    学到的原值（不短于 MIN_SECRET 个字符）还会在 URL、HTML 等所有文本中整体替换
+    values 为额外需要替换的 {原文: 替换值}
+    """
+
+    SID = "2000000000"
+    NAME = "某同学"
+    MASK = "***"
+    SID_KEYS = {"yhm", "xh", "xh_id", "XH", "XH_ID"}
+    NAME_KEYS = {"xm", "XM", "xmpy", "ywxm", "cym"}
+    SECRET_KEYS = {
+        "mm",
+        "yzm",
+        "csrftoken",
+        "zjhm",
+        "sfzjh",
+        "csrq",
+        "sjhm",
+        "gddh",
+        "dzyx",
+        "ksh",
+        "jtdz",
+        "txdz",
+        "yzbm",
+        "byzx",
+    }
+    # 个人信息页面（xsgrxxwh_cxXsgrxx）中的标签
+    SID_LABELS = {"学号："}
+    NAME_LABELS = {"姓名：", "姓名拼音：", "英文姓名：", "曾用名："}
+    SECRET_LABELS = {
+        "证件号码：",
+        "身份证号：",
+        "出生日期：",
+        "考生号：",
+        "毕业中学：",
+        "手机号码：",
+        "联系电话：",
+        "固定电话：",
+        "电子邮箱：",
+        "家庭地址：",
+        "通讯地址：",
+        "邮政编码：",
+    }
+    # 过短的原值（如"无"）在文本中整体替换会误伤其他内容
+    MIN_SECRET = 4
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    def replacement(self, key):
+        if key in self.SID_KEYS:
+            return self.SID
+        if key in self.NAME_KEYS:
+            return self.NAME
+        if key in self.SECRET_KEYS:
+            return self.MASK
+        return None
+
+    def label_replacement(self, label):
+        if label in self.SID_LABELS:
+            return self.SID
+        if label in self.NAME_LABELS:
+            return self.NAME
+        if label in self.SECRET_LABELS:
+            return self.MASK
+        return None
+
+    def remember(self, value, replacement):
+        if isinstance(value, int) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str) or replacement is None:
+            return
+        value = value.strip()
+        if len(value) >= self.MIN_SECRET or (value and replacement != self.MASK):
+            self.values.setdefault(value, replacement)
+
+    def learn(self, data):
+        """从表单或 JSON 中收集学号、姓名及证件号、联系方式等的原值，之后在文本中也替换"""
+        if isinstance(data, dict):
+            for key, value in data.items():
+                replacement = self.replacement(key)
+                if replacement is not None:
+                    self.remember(value, replacement)
+                else:
+                    self.learn(value)
+        elif isinstance(data, list):
+            for item in data:
+                self.learn(item)
+
+    def learn_html(self, text):
+        """从个人信息等 HTML 页面的 label / p.form-control-static 键值对中收集原值"""
+        if "form-control-static" not in text:
+            return
+        for group in pq(text)("div.form-group").items():
+            label = group.find("label").text()
+            value = group.find("p.form-control-static").text()
+            self.remember(value, self.label_replacement(label))
+
+    def text(self, text):
+        for original in sorted(self.values, key=len, reverse=True):
+            text = text.replace(original, self.values[original])
+        return text
+
+    def data(self, data):
+        if isinstance(data, dict):
+            scrubbed = {}
+            for key, value in data.items():
+                replacement = self.replacement(key)
+                if replacement is not None and value not in (None, ""):
+                    scrubbed[key] = replacement
+                else:
+                    scrubbed[key] = self.data(value)
+            return scrubbed
+        if isinstance(data, list):
+            return [self.data(i) for i in data]
+        if isinstance(data, str):
+            return self.text(data)
+        return data
+
+
+class Recorder:
+    """
+    录制 Client 发出的全部请求及响应，保存为 FixtureStore
+    recorder.attach(client) 后正常调用 client 的方法，最后 recorder.save("fixtures.json")
+    保存时统一脱敏（见 Scrubber），scrub 为额外需要替换的 {原文: 替换值}，如学院、班级名称
+    Cookie 请求头不保存，Set-Cookie 的值替换为 replay；PDF 替换为 PDF_STUB，
+    其他二进制响应（验证码、照片）默认清空，keep_binary=True 时原样保存
+    """
+
+    def __init__(self, scrub=None, keep_binary=False):
+        self.scrub = dict(scrub or {})
+        self.keep_binary = keep_binary
+        self.base_url = None
+        self._captured = []
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        self.base_url = self.base_url or client.base_url
+        client.sess.hooks["response"].append(self._capture)
+        return client
+
+    def detach(self, client):
+        client.sess.hooks["response"].remove(self._capture)
+
+    def _capture(self, resp, *args, **kwargs):
+        request = resp.request
+        # 流式响应在此读取全部内容，之后 iter_content 仍可正常使用
+        captured = (
+            request.method,
+            request.url,
+            parse_form(request.body),
+            resp.status_code,
+            list(resp.raw.headers.items())
+            if hasattr(resp.raw, "headers")
+            else list(resp.headers.items()),
+            resp.content,
+        )
+        with self._lock:
+            self._captured.append(captured)
+
+    def _json(self, content):
+        try:
+            return json.loads(content.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            return None
+
+    def _headers(self, headers, scrubber):
+        kept = []
+        for name, value in headers:
+            lower = name.lower()
+            if lower == "set-cookie":
+                cookie = value.split(";", 1)[0].split("=", 1)[0]
+                kept.append([name, f"{cookie}=replay; Path=/"])
+            elif lower == "location":
+                path, _ = FixtureStore.relative(value, self.base_url)
+                query = urlsplit(value).query
+                kept.append([name, scrubber.text(path + (f"?{query}" if query else ""))])
+            elif lower in ("content-type", "content-disposition"):
+                kept.append([name, scrubber.text(value)])
+        return kept
+
+    def _body(self, content, scrubber):
+        if content.startswith(b"%PDF"):
+            return base64.b64encode(PDF_STUB).decode(), True
+        data = self._json(content)
+        if data is not None:
+            return json.dumps(scrubber.data(data), ensure_ascii=False), False
+        try:
+            return scrubber.text(content.decode("utf-8")), False
+        except UnicodeDecodeError:
+            if self.keep_binary:
+                return base64.b64encode(content).decode(), True
+            return "", False
+
+    def fixtures(self):
+        with self._lock:
+            captured = list(self._captured)
+        scrubber = Scrubber(self.scrub)
+        for _, _, form, _, _, content in captured:
+            scrubber.learn(form)
+            data = self._json(content)
+            if data is not None:
+                scrubber.learn(data)
+            elif not content.startswith(b"%PDF"):
+                scrubber.learn_html(content.decode("utf-8", "replace"))
+        store = FixtureStore()
+        for method, url, form, status, headers, content in captured:
+            path, query = FixtureStore.relative(url, self.base_url)
+            body, encoded = self._body(content, scrubber)
+            store.add(
+                {
+                    "method": method,
+                    "path": scrubber.text(path),
+                    "query": scrubber.data(query),
+                    "form": scrubber.data(form),
+                    "status": status,
+                    "headers": self._headers(headers, scrubber),
+                    "body": body,
+                    "base64": encoded,
+                }
+            )
+        return store
+
+    def save(self, path):
+        store = self.fixtures()
+        store.save(path)
+        return store
+
+
+class _ReplayBody(BytesIO):
+    """响应体，附带 requests 提取 Set-Cookie 时读取的 _original_response.msg"""
+
+    def __init__(self, body, headers):
+        super().__init__(body)
+        msg = HTTPMessage()
+        for name, value in headers:
+            msg[name] = value
+        self._original_response = SimpleNamespace(msg=msg)
+
+    def release_conn(self):
+        pass
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    直接以 FixtureStore 中的记录响应请求的传输适配器，不建立任何连接
+    用法：ReplayAdapter.mount(client, FixtureStore.load("fixtures.json"))
+    没有匹配的记录时返回404
+    """
+
+    def __init__(self, fixtures, base_url):
+        super().__init__()
+        self.fixtures = fixtures
+        self.base_url = base_url
+
+    @classmethod
+    def mount(cls, client, fixtures):
+        """替换 client 对 base_url 所在主机的适配器"""
+        adapter = cls(fixtures, client.base_url)
+        client.sess.mount(PoolRegistry.origin(client.base_url), adapter)
+        return adapter
+
+    def send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ):
+        start = time.perf_counter()
+        path, query = FixtureStore.relative(request.url, self.base_url)
+        entry = self.fixtures.match(
+            request.method, path, query, parse_form(request.body)
+        )
+        if entry is None:
+            status, headers, body = 404, [], b""
+        else:
+            status = entry["status"]
+            headers = FixtureStore.headers(entry, self.base_url)
+            body = FixtureStore.body(entry)
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers = CaseInsensitiveDict()
+        for name, value in headers:
+            if name in resp.headers:
+                resp.headers[name] = f"{resp.headers[name]}, {value}"
+            else:
+                resp.headers[name] = value
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.raw = _ReplayBody(body, headers)
+        resp.reason = "OK" if status < 400 else "Replay"
+        resp.url = request.url
+        resp.request = request
+        resp.connection = self
+        resp.elapsed = timedelta(seconds=time.perf_counter() - start)
+        return resp
+
+    def close(self):
+        pass
+
+
+class MockServer:
+    """
+    本地模拟教务系统，Client(base_url=server.base_url) 即可脱离真实系统运行
+    fixtures: FixtureStore 或其保存的文件路径，请求按 FixtureStore.match 匹配，没有匹配的记录时返回404
+    登录流程由服务器自身处理：登录页和公钥优先使用记录，没有时使用内置页面和临时生成的公钥；
+    POST 登录接受任意账号密码并签发新的 JSESSIONID，require_login 为True时其他接口只接受已登录的会话，否则返回登录页
+    故障注入：
+    latency: 每个请求的额外延迟秒数，可为数值、(最小, 最大) 区间或 {接口: 数值或区间}，接口名同 zfn_metrics.endpoint_of
+    error_rate: 以该概率返回 error_status 及错误页
+    login_page_rate: 以该概率使当前会话失效并返回登录页，用于测试 1006 及重新登录
+    """
+
+    def __init__(
+        self,
+        fixtures=None,
+        host="127.0.0.1",
+        port=0,
+        path="/jwglxt/",
+        latency=0,
+        error_rate=0,
+        error_status=502,
+        login_page_rate=0,
+        require_login=True,
+        seed=None,
+    ):
+        if isinstance(fixtures, str):
+            fixtures = FixtureStore.load(fixtures)
+        self.fixtures = fixtures if fixtures is not None else FixtureStore()
+        self.host = host
+        self.port = port
+        self.path = "/" + path.strip("/") + "/" if path.strip("/") else "/"
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.login_page_rate = login_page_rate
+        self.require_login = require_login
+        self.random = random.Random(seed)
+        self.sessions = set()
+        self.counts = {"requests": 0, "logins": 0, "errors": 0, "login_pages": 0}
+        self._lock = threading.Lock()
+        self._public_key = None
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 响应头与响应体分两次写出，开启 Nagle 算法时长连接上每个请求会多等待约40ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.handle(self)
+
+            def do_POST(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def expire(self):
+        """使所有已登录的会话失效"""
+        with self._lock:
+            self.sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self.counts, "sessions": len(self.sessions)}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _delay(self, endpoint):
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(endpoint, 0)
+        if isinstance(latency, (tuple, list)):
+            return self.random.uniform(*latency)
+        return latency or 0
+
+    def public_key(self):
+        """内置公钥（modulus, exponent 的 base64），首次使用时生成"""
+        with self._lock:
+            if self._public_key is None:
+                import rsa
+
+                key, _ = rsa.newkeys(512)
+                self._public_key = json.dumps(
+                    {
+                        "modulus": base64.b64encode(
+                            key.n.to_bytes((key.n.bit_length() + 7) // 8, "big")
+                        ).decode(),
+                        "exponent": base64.b64encode(
+                            key.e.to_bytes((key.e.bit_length() + 7) // 8, "big")
+                        ).decode(),
+                    }
+                )
+            return self._public_key
+
+    def _send(self, handler, status, body, headers=(), content_type=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        handler.send_response(status)
+        names = {name.lower() for name, _ in headers}
+        if content_type and "content-type" not in names:
+            handler.send_header("Content-Type", content_type)
+        for name, value in headers:
+            if name.lower() != "content-length":
+                handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _send_login_page(self, handler):
+        self._send(
+            handler,
+            200,
+            LOGIN_PAGE.format(token=uuid.uuid4().hex),
+            (),
+            "text/html;charset=utf-8",
+        )
+
+    def _session(self, handler):
+        cookie = SimpleCookie(handler.headers.get("Cookie", ""))
+        return cookie["JSESSIONID"].value if "JSESSIONID" in cookie else None
+
+    def handle(self, handler):
+        self._count("requests")
+        method = handler.command
+        length = int(handler.headers.get("Content-Length") or 0)
+        form = parse_form(handler.rfile.read(length) if length else b"")
+        path, query = FixtureStore.relative(handler.path, self.path)
+        delay = self._delay(endpoint_of(handler.path))
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self._count("errors")
+            self._send(
+                handler, self.error_status, ERROR_PAGE, (), "text/html;charset=utf-8"
+            )
+            return
+        if path == LOGIN_PATH:
+            if method == "POST":
+                session = uuid.uuid4().hex.upper()
+                with self._lock:
+                    self.sessions.add(session)
+                    self.counts["logins"] += 1
+                handler.send_response(302)
+                handler.send_header("Location", urljoin(self.base_url, INDEX_PATH))
+                handler.send_header("Set-Cookie", f"JSESSIONID={session}; Path=/")
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+            token = uuid.uuid4().hex
+            entry = self.fixtures.match("GET", LOGIN_PATH)
+            body = FixtureStore.body(entry) if entry else LOGIN_PAGE.format(token=token)
+            self._send(
+                handler,
+                200,
+                body,
+                [["Set-Cookie", f"JSESSIONID={token.upper()}; Path=/"]],
+                "text/html;charset=utf-8",
+            )
+            return
+        if path == KEY_PATH:
+            entry = self.fixtures.match("GET", KEY_PATH)
+            body = FixtureStore.body(entry) if entry else self.public_key()
+            self._send(handler, 200, body, (), "application/json;charset=utf-8")
+            return
+        session = self._session(handler)
+        if self.require_login:
+            with self._lock:
+                valid = session in self.sessions
+            if not valid:
+                self._count("login_pages")
+                self._send_login_page(handler)
+                return
+        if self.login_page_rate and self.random.random() < self.login_page_rate:
+            with self._lock:
+                self.sessions.discard(session)
+                self.counts["login_pages"] += 1
+            self._send_login_page(handler)
+            return
+        entry = self.fixtures.match(method, path, query, form)
+        if entry is None:
+            if path == INDEX_PATH:
+                self._send(handler, 200, INDEX_PAGE, (), "text/html;charset=utf-8")
+            else:
+                self._send(handler, 404, b"", (), "text/plain")
+            return
+        # 会话由服务器自身管理，不使用记录中的 Set-Cookie
+        headers = [
+            header
+            for header in FixtureStore.headers(entry, self.base_url)
+            if header[0].lower() != "set-cookie"
+        ]
+        self._send(handler, entry["status"], FixtureStore.body(entry), headers)
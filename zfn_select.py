@@ -0,0 +1,210 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin
+
+import requests
+from requests import exceptions
+
+from zfn_batch import BatchStats
+
+# 返回信息中包含这些关键字时视为暂时失败，继续重试；其他失败视为明确拒绝
+RETRY_KEYWORDS = ("已满", "繁忙", "稍后", "未开始", "未开放", "尚未")
+
+
+class SelectionEngine:
+    """
+    低延迟选课
+    client: 已登录的 Client
+    wishlist: [(course_id, do_id, kklxdm), ...]，各课程独立重试
+    parallelism: 每门课同时在途的请求数
+    interval: 同一门课相邻两次请求的最小发出间隔（秒）
+    max_attempts: 每门课最多请求次数
+    连接池大小需不小于 parallelism * 课程数，可通过 pool_registry.configure(pool_maxsize=...) 调整
+    """
+
+    def __init__(
+        self,
+        client,
+        sid,
+        wishlist,
+        year,
+        term,
+        parallelism=2,
+        interval=0.2,
+        max_attempts=50,
+        retry_keywords=RETRY_KEYWORDS,
+    ):
+        self.client = client
+        self.sid = sid
+        self.wishlist = [tuple(wish) for wish in wishlist]
+        self.year = year
+        self.term = term
+        self.parallelism = parallelism
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.retry_keywords = retry_keywords
+        self.url = urljoin(
+            client.base_url, "xsxk/zzxkyzb_xkBcZyZzxkYzb.html?gnmkdm=N253512"
+        )
+        self.prepared = {}
+        self.attempts = []
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """预先构建每门课的选课请求，发出时只需复制"""
+        for wish in self.wishlist:
+            course_id, do_id, kklxdm = wish
+            request = requests.Request(
+                "POST",
+                self.url,
+                headers=self.client.headers,
+                cookies=self.client.cookies,
+                data=self.client.get_select_data(
+                    self.sid, course_id, do_id, kklxdm, self.year, self.term
+                ),
+            )
+            self.prepared[wish] = self.client.sess.prepare_request(request)
+
+    def warm_up(self, connections=None):
+        """并发发出 HEAD 请求，使连接池中预先建立足够的长连接"""
+        connections = connections or self.parallelism * len(self.wishlist)
+
+        def head(_):
+            try:
+                self.client.sess.head(
+                    self.client.login_url, timeout=self.client.timeout
+                )
+            except exceptions.RequestException:
+                pass
+
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            list(executor.map(head, range(connections)))
+
+    @classmethod
+    def wait_until(cls, at):
+        """等待到 at（time.time() 时间戳），最后一段忙等以减小误差"""
+        while True:
+            remaining = at - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(remaining - 0.02 if remaining > 0.03 else 0)
+
+    def classify(self, resp):
+        """返回 (结果, 代码, 信息)，结果为 success/retry/rejected"""
+        if resp.status_code != 200:
+            return "retry", 2333, f"教务系统返回{resp.status_code}"
+        if self.client.is_login_response(resp):
+            return "rejected", 1006, "未登录或已过期，请重新登录"
+        data = resp.json()
+        msg = str(data.get("msg") or "")
+        if str(data.get("flag")) == "1":
+            return "success", 1000, "选课成功"
+        if any(keyword in msg for keyword in self.retry_keywords):
+            return "retry", 1000, msg
+        return "rejected", 1000, msg
+
+    def attempt(self, wish, number):
+        """发出一次选课请求并记录耗时"""
+        sent_at = time.time()
+        start = time.perf_counter()
+        try:
+            resp = self.client.sess.send(
+                self.prepared[wish].copy(), timeout=self.client.timeout
+            )
+            outcome, code, msg = self.classify(resp)
+        except exceptions.Timeout:
+            outcome, code, msg = "retry", 1003, "选课超时"
+        except (exceptions.RequestException, ValueError) as e:
+            outcome, code, msg = "retry", 2333, str(e)
+        record = {
+            "course_id": wish[0],
+            "do_id": wish[1],
+            "attempt": number,
+            "sent_at": sent_at,
+            "latency": time.perf_counter() - start,
+            "outcome": outcome,
+            "code": code,
+            "msg": msg,
+        }
+        with self._lock:
+            self.attempts.append(record)
+        return record
+
+    def run(self, at=None, warm_lead=3):
+        """
+        在 at（time.time() 时间戳，None 表示立即）开始选课，提前 warm_lead 秒预热连接并构建请求
+        各课程成功或被明确拒绝后停止，返回每门课的最终结果
+        """
+        if at is not None:
+            self.wait_until(at - warm_lead)
+        self.prepare()
+        self.warm_up()
+        if at is not None:
+            self.wait_until(at)
+        state = {
+            wish: {"attempts": 0, "in_flight": 0, "next": 0.0, "final": None}
+            for wish in self.wishlist
+        }
+        workers = self.parallelism * len(self.wishlist)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            while True:
+                now = time.perf_counter()
+                for wish, item in state.items():
+                    while (
+                        item["final"] is None
+                        and item["attempts"] < self.max_attempts
+                        and item["in_flight"] < self.parallelism
+                        and now >= item["next"]
+                    ):
+                        item["attempts"] += 1
+                        item["in_flight"] += 1
+                        item["next"] = now + self.interval
+                        future = executor.submit(self.attempt, wish, item["attempts"])
+                        pending[future] = wish
+                upcoming = [
+                    item["next"]
+                    for item in state.values()
+                    if item["final"] is None
+                    and item["attempts"] < self.max_attempts
+                    and item["in_flight"] < self.parallelism
+                ]
+                if not pending and not upcoming:
+                    break
+                timeout = max(min(upcoming) - now, 0) if upcoming else None
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    wish = pending.pop(future)
+                    record = future.result()
+                    item = state[wish]
+                    item["in_flight"] -= 1
+                    if record["outcome"] != "retry" and item["final"] is None:
+                        item["final"] = record
+        return [
+            {
+                "course_id": wish[0],
+                "do_id": wish[1],
+                "kklxdm": wish[2],
+                "outcome": item["final"]["outcome"] if item["final"] else "exhausted",
+                "attempts": item["attempts"],
+                "result": item["final"],
+            }
+            for wish, item in state.items()
+        ]
+
+    def report(self):
+        """各次请求的耗时统计"""
+        latencies = sorted(record["latency"] for record in self.attempts)
+        if not latencies:
+            return None
+        return {
+            "attempts": len(latencies),
+            "avg": sum(latencies) / len(latencies),
+            "p50": BatchStats.percentile(latencies, 50),
+            "p95": BatchStats.percentile(latencies, 95),
+            "max": latencies[-1],
+        }
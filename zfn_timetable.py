@@ -0,0 +1,93 @@
+from functools import reduce
+from operator import or_
+
+from zfn_api import Client
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，仅 to_array/stack 需要
+    np = None
+
+
+class Timetable:
+    """
+    课表占用位图
+    整张课表压缩为一个整数，第 ((周-1)*7 + 星期-1)*sessions + 节-1 位为1表示该节有课，
+    单节查询为一次移位，多名学生的课表按位或即可得到共同空闲时间
+    max_week: 最大周数
+    sessions: 每天最大节数
+    """
+
+    def __init__(self, max_week=30, sessions=12, bits=0):
+        self.max_week = max_week
+        self.sessions = sessions
+        self.bits = bits
+        self._day_mask = (1 << sessions) - 1
+
+    @classmethod
+    def from_schedule(cls, schedule, max_week=30, sessions=12):
+        """由 get_schedule 返回的 data 构建"""
+        timetable = cls(max_week, sessions)
+        for course in schedule["courses"]:
+            timetable.add(course)
+        return timetable
+
+    @classmethod
+    def merge(cls, timetables):
+        """合并多张课表，结果中任一人有课即为占用，free_slots 即为共同空闲节次"""
+        timetables = list(timetables)
+        first = timetables[0]
+        return cls(
+            first.max_week,
+            first.sessions,
+            reduce(or_, (i.bits for i in timetables), 0),
+        )
+
+    def _offset(self, week, weekday):
+        if not 1 <= week <= self.max_week or not 1 <= weekday <= 7:
+            raise ValueError(f"周次或星期超出范围：第{week}周 星期{weekday}")
+        return ((week - 1) * 7 + weekday - 1) * self.sessions
+
+    def add(self, course):
+        """加入一条 format_schedule 格式的课程"""
+        weekday = course.get("weekday")
+        if not weekday or not 1 <= weekday <= 7:
+            return
+        session_mask = Client.session_mask(course.get("sessions")) & self._day_mask
+        week_mask = Client.week_mask(course.get("weeks"))
+        for week in range(1, min(week_mask.bit_length(), self.max_week) + 1):
+            if week_mask >> (week - 1) & 1:
+                self.bits |= session_mask << self._offset(week, weekday)
+
+    def busy_mask(self, week, weekday):
+        """某周某天的节次位图，第 n 节对应第 n-1 位"""
+        return self.bits >> self._offset(week, weekday) & self._day_mask
+
+    def is_busy(self, week, weekday, sessions):
+        """sessions 为节次整数、节次列表或 "3-4节" 形式的字符串"""
+        mask = sum(1 << (i - 1) for i in Client.parse_sessions(sessions))
+        return bool(self.busy_mask(week, weekday) & mask)
+
+    def free_slots(self, week, weekday):
+        """某周某天的空闲节次列表"""
+        busy = self.busy_mask(week, weekday)
+        return [i + 1 for i in range(self.sessions) if not busy >> i & 1]
+
+    def to_array(self):
+        """转换为 (周, 星期, 节) 形状的 numpy 布尔数组，需要安装 numpy"""
+        if np is None:
+            raise ImportError("to_array 需要安装 numpy")
+        size = self.max_week * 7 * self.sessions
+        raw = np.frombuffer(self.bits.to_bytes((size + 7) // 8, "little"), np.uint8)
+        bits = np.unpackbits(raw, bitorder="little")[:size]
+        return bits.astype(bool).reshape(self.max_week, 7, self.sessions)
+
+    @classmethod
+    def stack(cls, timetables):
+        """多张课表堆叠为 (人, 周, 星期, 节) 数组，any(axis=0) 取反即为共同空闲时间"""
+        if np is None:
+            raise ImportError("stack 需要安装 numpy")
+        return np.stack([i.to_array() for i in timetables])
+
+    def __or__(self, other):
+        return self.merge([self, other])
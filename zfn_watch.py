@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class SeatWatcher:
+    """
+    板块课余量监控
+    client: 已登录的 Client
+    class_ids: 需要监控的教学班id，首次轮询前通过一次 get_all_block_courses 确定所属板块和课程
+    之后每轮只请求这些课程的 JxbWithKch 接口，只有余量状态变化（有空位/满员）时才产生事件
+    interval: 最短轮询间隔（秒），有变化时恢复为该值
+    max_interval: 无变化时按 backoff 倍数逐次放慢，最长不超过该值
+    release_times: 已知的放课时间（time.time() 时间戳），前后 release_window 秒内始终按最短间隔轮询
+    max_errors: errors 中保留的最近出错结果数，error_count 为累计出错次数
+    """
+
+    def __init__(
+        self,
+        client,
+        year,
+        term,
+        class_ids,
+        interval=1,
+        max_interval=30,
+        backoff=1.5,
+        release_times=(),
+        release_window=60,
+        max_errors=100,
+    ):
+        self.client = client
+        self.year = year
+        self.term = term
+        self.class_ids = set(class_ids)
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.release_times = sorted(release_times)
+        self.release_window = release_window
+        self.current_interval = interval
+        self.targets = None
+        self.missing = set()
+        self.errors = deque(maxlen=max_errors)
+        self.error_count = 0
+        self._seats = {}
+        self._stop = threading.Event()
+
+    def _resolve(self, result):
+        """由 get_all_block_courses 的结果得到 {(板块, 课程id): {教学班id}}"""
+        if result["code"] != 1000:
+            raise RuntimeError(f"获取板块课失败：{result['msg']}")
+        targets = {}
+        for block in result["data"]["blocks"]:
+            for course in block["courses"]:
+                if course["class_id"] in self.class_ids:
+                    key = (block["block"], course["course_id"])
+                    targets.setdefault(key, set()).add(course["class_id"])
+        self.targets = targets
+        self.missing = self.class_ids - set().union(*targets.values())
+
+    def _diff(self, block, course_id, result):
+        """对比一门课程的最新余量，返回变化事件列表，并报告人数是否有变动"""
+        if result["code"] != 1000:
+            self.errors.append({"time": time.time(), **result})
+            self.error_count += 1
+            return [], False
+        events = []
+        changed = False
+        now = time.time()
+        for item in result["data"]["classes"]:
+            class_id = item["class_id"]
+            if class_id not in self.targets[(block, course_id)]:
+                continue
+            seats = (item["capacity"], item["selected_number"])
+            previous = self._seats.get(class_id)
+            self._seats[class_id] = seats
+            if previous == seats:
+                continue
+            changed = True
+            available = seats[1] < seats[0]
+            if previous is None:
+                if not available:
+                    continue
+            elif (previous[1] < previous[0]) == available:
+                continue
+            events.append(
+                {
+                    "type": "opened" if available else "closed",
+                    "time": now,
+                    "block": block,
+                    "course_id": course_id,
+                    "class_id": class_id,
+                    "capacity": seats[0],
+                    "selected_number": seats[1],
+                }
+            )
+        return events, changed
+
+    def _near_release(self, now):
+        return any(abs(now - at) <= self.release_window for at in self.release_times)
+
+    def next_interval(self, changed, now=None):
+        """计算下一次轮询前的等待时间"""
+        now = time.time() if now is None else now
+        if changed:
+            self.current_interval = self.interval
+        else:
+            self.current_interval = min(
+                self.current_interval * self.backoff, self.max_interval
+            )
+        if self._near_release(now):
+            return self.interval
+        wait = self.current_interval
+        upcoming = [at - self.release_window - now for at in self.release_times]
+        upcoming = [i for i in upcoming if i > 0]
+        if upcoming:
+            # 放慢后不要越过即将到来的放课时间窗口
+            wait = min(wait, min(upcoming))
+        return max(wait, self.interval)
+
+    def seats(self):
+        """最近一次轮询得到的 {教学班id: (容量, 已选人数)}"""
+        return dict(self._seats)
+
+    def poll(self):
+        """轮询一次，返回 (事件列表, 是否有人数变动)"""
+        if self.targets is None:
+            self._resolve(self.client.get_all_block_courses(self.year, self.term))
+        events = []
+        changed = False
+        for block, course_id in self.targets:
+            result = self.client.get_block_classes(
+                self.year, self.term, block, course_id
+            )
+            course_events, course_changed = self._diff(block, course_id, result)
+            events.extend(course_events)
+            changed = changed or course_changed
+        return events, changed
+
+    def run(self, callback, duration=None):
+        """持续轮询，每个事件调用一次 callback(event)；duration 秒后或 stop() 后结束"""
+        self._stop.clear()
+        end = None if duration is None else time.time() + duration
+        while not self._stop.is_set():
+            events, changed = self.poll()
+            for event in events:
+                callback(event)
+            wait = self.next_interval(changed)
+            if end is not None:
+                if time.time() >= end:
+                    break
+                wait = min(wait, max(end - time.time(), 0))
+            self._stop.wait(wait)
+
+    def stop(self):
+        self._stop.set()
+
+
+class AsyncSeatWatcher(SeatWatcher):
+    """
+    配合 AsyncClient 使用的余量监控，参数同 SeatWatcher
+    同一轮中各课程的请求并发发出，可直接 async for event in watcher 逐个获取变化事件
+    """
+
+    def __init__(self, client, year, term, class_ids, **kwargs):
+        super().__init__(client, year, term, class_ids, **kwargs)
+        self._stop = asyncio.Event()
+
+    async def poll(self):
+        if self.targets is None:
+            self._resolve(await self.client.get_all_block_courses(self.year, self.term))
+        keys = list(self.targets)
+        results = await asyncio.gather(
+            *(
+                self.client.get_block_classes(self.year, self.term, block, course_id)
+                for block, course_id in keys
+            )
+        )
+        events = []
+        changed = False
+        for (block, course_id), result in zip(keys, results):
+            course_events, course_changed = self._diff(block, course_id, result)
+            events.extend(course_events)
+            changed = changed or course_changed
+        return events, changed
+
+    async def run(self, callback, duration=None):
+        """callback 可以是普通函数或协程函数"""
+        async for event in self.events(duration):
+            result = callback(event)
+            if asyncio.iscoroutine(result):
+                await result
+
+    async def events(self, duration=None):
+        """异步迭代变化事件"""
+        self._stop.clear()
+        end = None if duration is None else time.time() + duration
+        while not self._stop.is_set():
+            events, changed = await self.poll()
+            for event in events:
+                yield event
+            wait = self.next_interval(changed)
+            if end is not None:
+                if time.time() >= end:
+                    break
+                wait = min(wait, max(end - time.time(), 0))
+            try:
+                await asyncio.wait_for(self._stop.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def __aiter__(self):
+        return self.events()